@@ -0,0 +1 @@
+"""Micro-benchmarks for the scoring code and the questionnaire handler pipeline."""
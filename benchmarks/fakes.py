@@ -0,0 +1,69 @@
+"""Stand-ins for the aiogram objects a handler receives from Telegram."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+
+@dataclass(frozen=True)
+class FakeUser:
+    id: int
+    username: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class FakeChat:
+    id: int
+
+
+@dataclass(frozen=True)
+class FakeAnimation:
+    file_id: str
+
+
+@dataclass
+class FakeMessage:
+    """Incoming message whose replies are collected instead of sent.
+
+    Only the attributes and methods the questionnaire handlers use are
+    provided.
+    """
+
+    from_user: FakeUser
+    text: Optional[str] = None
+    message_id: int = 1
+    sent: list[tuple[str, Any]] = field(default_factory=list)
+
+    @property
+    def chat(self) -> FakeChat:
+        return FakeChat(self.from_user.id)
+
+    async def answer(self, text: str, reply_markup: Any = None, **kwargs: Any) -> FakeMessage:
+        self.sent.append((text, reply_markup))
+        return self
+
+    async def answer_animation(self, animation: Any = None, **kwargs: Any) -> FakeAnimationMessage:
+        return FakeAnimationMessage(FakeAnimation("benchmark-animation"))
+
+    async def edit_text(self, text: str, reply_markup: Any = None, **kwargs: Any) -> FakeMessage:
+        self.sent.append((text, reply_markup))
+        return self
+
+
+@dataclass(frozen=True)
+class FakeAnimationMessage:
+    animation: FakeAnimation
+
+
+@dataclass
+class FakeCallbackQuery:
+    """Inline button press on ``message``; acknowledgements are collected."""
+
+    from_user: FakeUser
+    message: FakeMessage
+    data: str
+    answers: list[Optional[str]] = field(default_factory=list)
+
+    async def answer(self, text: Optional[str] = None, **kwargs: Any) -> bool:
+        self.answers.append(text)
+        return True
@@ -0,0 +1,448 @@
+"""Time the scoring hot paths and the answer handler against stored baselines.
+
+Usage: ``python -m benchmarks.run [--paths N] [--rounds N] [--answers-db PATH]
+[--threshold FRACTION] [--output PATH] [--save-baseline]``
+
+Each case runs over the same sample of complete questionnaire paths. Paths
+are random walks through ``DEFAULT_FLOW`` with a fixed seed; by default every
+option of a question is equally likely, and ``--answers-db`` weights options
+by how often they were chosen in a SQLite database instead. The handler cases
+feed every answer of a path to ``on_question_answer`` as a text message and
+to ``on_inline_answer`` as a button press, with fake messages, a real
+``FSMContext`` on ``PersistentFSMStorage`` and the ``memory://``
+storage backend, so it covers the whole per-answer pipeline without network
+or disk.
+
+Every case is run ``--rounds`` times and the fastest round is reported in
+nanoseconds per operation. Results are written as JSON to ``--output``. When
+``benchmarks/baseline.json`` was recorded with the same distribution and
+path count, a case slower than its baseline by more than ``--threshold`` is
+timed once more and, if still slow, fails the run with exit status 1. Baselines are machine-specific: record
+them with ``--save-baseline`` on the machine that runs the gate.
+"""
+from __future__ import annotations
+
+import os
+
+# The handler case must not touch the configured database; this has to be set
+# before storage.repo creates the shared repository.
+os.environ["DB_URL"] = "memory://"
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Final, Optional
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+
+from padel_wizard_bot.handlers.questionnaire import on_inline_answer, on_question_answer
+from padel_wizard_bot.keyboards.questionnaire import (
+    AnswerCallback,
+    build_question_keyboard,
+    get_question_markup,
+)
+from padel_wizard_bot.services.experience import calculate_player_experience
+from padel_wizard_bot.services.final_rating import calculate_final_rating
+from padel_wizard_bot.services.flow_registry import FLOWS
+from padel_wizard_bot.services.questionnaire_flow import DEFAULT_FLOW
+from padel_wizard_bot.services.scoring_engine import derive_skill_ratings
+from padel_wizard_bot.services.scoring_state import ScoringState
+from padel_wizard_bot.states.questionnaire import QuestionnaireStates
+from storage.fsm import PersistentFSMStorage
+from storage.repo import repository
+
+from .fakes import FakeCallbackQuery, FakeMessage, FakeUser
+
+BASELINE_PATH: Final[Path] = Path(__file__).with_name("baseline.json")
+DEFAULT_OUTPUT: Final[Path] = Path(__file__).with_name("last_run.json")
+PATH_COUNT: Final[int] = 500
+ROUNDS: Final[int] = 5
+# Allowed slowdown against the baseline before a case counts as a regression.
+REGRESSION_THRESHOLD: Final[float] = 0.25
+SEED: Final[int] = 20240611
+
+Answers = list[dict[str, str]]
+OptionWeights = dict[tuple[str, str], float]
+
+
+@dataclass(frozen=True)
+class CaseResult:
+    name: str
+    ops: int
+    ns_per_op: float
+    median_ns_per_op: float
+
+
+@dataclass(frozen=True)
+class Regression:
+    name: str
+    baseline_ns: float
+    current_ns: float
+
+    @property
+    def slowdown(self) -> float:
+        return self.current_ns / self.baseline_ns - 1.0
+
+
+def sample_paths(
+    count: int, weights: Optional[OptionWeights] = None, seed: int = SEED
+) -> list[Answers]:
+    """Walk the flow ``count`` times, picking options in proportion to ``weights``.
+
+    Options missing from ``weights`` get weight 1; without ``weights`` every
+    option is equally likely.
+    """
+
+    rng = random.Random(seed)
+    paths: list[Answers] = []
+    for _ in range(count):
+        answers: Answers = []
+        question_id: Optional[str] = DEFAULT_FLOW.first_question_id
+        while question_id is not None:
+            question = DEFAULT_FLOW.get_question(question_id)
+            option_weights = [
+                weights.get((question.id, option.id), 1.0) if weights else 1.0
+                for option in question.options
+            ]
+            option = rng.choices(question.options, weights=option_weights)[0]
+            answers.append({"question_id": question.id, "option_id": option.id})
+            question_id = option.next_question_id
+        paths.append(answers)
+    return paths
+
+
+def load_answer_weights(database_path: Path) -> OptionWeights:
+    """Count how often each option was chosen in a bot database."""
+
+    uri = f"{database_path.resolve().as_uri()}?mode=ro"
+    with closing(sqlite3.connect(uri, uri=True)) as connection:
+        rows = connection.execute(
+            "SELECT question_id, option_id, COUNT(*) FROM session_answers "
+            "GROUP BY question_id, option_id"
+        ).fetchall()
+    return {(question_id, option_id): float(count) for question_id, option_id, count in rows}
+
+
+@dataclass(frozen=True)
+class Case:
+    """A named workload of ``ops`` operations.
+
+    ``measure`` runs the workload once and returns the nanoseconds to count.
+    """
+
+    name: str
+    ops: int
+    measure: Callable[[], Awaitable[int]]
+
+
+def timed(body: Callable[[], None]) -> Callable[[], Awaitable[int]]:
+    async def measure() -> int:
+        started = time.perf_counter_ns()
+        body()
+        return time.perf_counter_ns() - started
+
+    return measure
+
+
+async def time_case(case: Case, rounds: int) -> CaseResult:
+    timings = sorted([await case.measure() for _ in range(rounds)])
+    return CaseResult(
+        name=case.name,
+        ops=case.ops,
+        ns_per_op=timings[0] / case.ops,
+        median_ns_per_op=timings[len(timings) // 2] / case.ops,
+    )
+
+
+def scoring_cases(paths: list[Answers]) -> list[Case]:
+    steps = [(answer["question_id"], answer["option_id"]) for path in paths for answer in path]
+    questions = [DEFAULT_FLOW.get_question(question_id) for question_id, _ in steps]
+
+    def experience() -> None:
+        for answers in paths:
+            calculate_player_experience(answers)
+
+    def skills() -> None:
+        for answers in paths:
+            derive_skill_ratings(answers)
+
+    def final_rating() -> None:
+        for answers in paths:
+            calculate_final_rating(answers)
+
+    def resolve_next() -> None:
+        for question_id, option_id in steps:
+            DEFAULT_FLOW.resolve_next(question_id, option_id)
+
+    def keyboard() -> None:
+        for question in questions:
+            build_question_keyboard(question).as_markup(
+                resize_keyboard=True, one_time_keyboard=True
+            )
+
+    def cached_keyboard() -> None:
+        for question in questions:
+            get_question_markup(question)
+
+    return [
+        Case("calculate_player_experience", len(paths), timed(experience)),
+        Case("derive_skill_ratings", len(paths), timed(skills)),
+        Case("calculate_final_rating", len(paths), timed(final_rating)),
+        Case("resolve_next", len(steps), timed(resolve_next)),
+        Case("build_question_keyboard", len(questions), timed(keyboard)),
+        Case("get_question_markup", len(questions), timed(cached_keyboard)),
+    ]
+
+
+def handler_case(
+    paths: list[Answers], storage: PersistentFSMStorage, *, inline: bool = False
+) -> Case:
+    """Answer every question of every path through the answer handler.
+
+    Reply mode sends the option texts to ``on_question_answer``; ``inline``
+    presses the option buttons through ``on_inline_answer``, including
+    unpacking their callback data. Only the handler calls are timed;
+    starting the session and seeding the FSM the way ``on_wizard_launch``
+    does is setup.
+    """
+
+    flow = DEFAULT_FLOW
+    steps = [
+        [
+            (flow.get_question(answer["question_id"]), answer["option_id"])
+            for answer in answers
+        ]
+        for answers in paths
+    ]
+    texts = [
+        [question.get_option(option_id).text for question, option_id in path]
+        for path in steps
+    ]
+    codes = [
+        [
+            AnswerCallback(
+                q=flow.question_ordinal(question.id), o=question.option_ordinal(option_id)
+            ).pack()
+            for question, option_id in path
+        ]
+        for path in steps
+    ]
+    next_user_id = 1
+    flow_key = FLOWS.default_key
+
+    async def start(user: FakeUser) -> FSMContext:
+        session = await repository.start_session(
+            user.id, user.username, flow_id=flow_key.id, flow_version=flow_key.version
+        )
+        state = FSMContext(
+            storage=storage, key=StorageKey(bot_id=0, chat_id=user.id, user_id=user.id)
+        )
+        await state.set_state(QuestionnaireStates.waiting_for_answer)
+        data = {
+            "current_question_id": flow.first_question_id,
+            "scoring": ScoringState().to_dict(),
+            "flow_id": flow_key.id,
+            "flow_version": flow_key.version,
+            "session_id": session.id,
+            "session_number": session.session_number,
+        }
+        if inline:
+            data["answer_mode"] = "inline"
+            data["question_message_id"] = FakeMessage(from_user=user).message_id
+        await state.set_data(data)
+        return state
+
+    async def measure() -> int:
+        nonlocal next_user_id
+        elapsed = 0
+        for path_texts, path_codes in zip(texts, codes):
+            user = FakeUser(next_user_id, f"bench{next_user_id}")
+            next_user_id += 1
+            state = await start(user)
+            if inline:
+                message = FakeMessage(from_user=user)
+                presses = [
+                    FakeCallbackQuery(from_user=user, message=message, data=code)
+                    for code in path_codes
+                ]
+                started = time.perf_counter_ns()
+                for press in presses:
+                    await on_inline_answer(
+                        press, AnswerCallback.unpack(press.data), state  # type: ignore[arg-type]
+                    )
+            else:
+                messages = [FakeMessage(from_user=user, text=text) for text in path_texts]
+                started = time.perf_counter_ns()
+                for message in messages:
+                    await on_question_answer(message, state)  # type: ignore[arg-type]
+            elapsed += time.perf_counter_ns() - started
+            if await state.get_state() is not None:
+                raise RuntimeError(f"Path {path_texts} did not finish the questionnaire")
+        return elapsed
+
+    name = "on_inline_answer" if inline else "on_question_answer"
+    return Case(name, sum(len(path) for path in texts), measure)
+
+
+def find_regressions(
+    results: list[CaseResult], baseline: dict[str, Any], threshold: float
+) -> list[Regression]:
+    regressions = []
+    for result in results:
+        recorded = baseline["results"].get(result.name)
+        if recorded is None:
+            continue
+        baseline_ns = float(recorded["ns_per_op"])
+        if result.ns_per_op > baseline_ns * (1.0 + threshold):
+            regressions.append(Regression(result.name, baseline_ns, result.ns_per_op))
+    return regressions
+
+
+async def run(
+    *,
+    paths: int,
+    rounds: int,
+    weights: Optional[OptionWeights],
+    baseline: Optional[dict[str, Any]] = None,
+    threshold: float = REGRESSION_THRESHOLD,
+) -> tuple[list[CaseResult], list[Regression]]:
+    """Time every case and check the results against ``baseline``.
+
+    A case over the threshold is timed again with twice the rounds and
+    keeps its better result, so one noisy pass does not fail the gate.
+    """
+
+    sample = sample_paths(paths, weights)
+    storage = PersistentFSMStorage(repository)
+    try:
+        cases = scoring_cases(sample) + [
+            handler_case(sample, storage),
+            handler_case(sample, storage, inline=True),
+        ]
+        results = [await time_case(case, rounds) for case in cases]
+        regressions: list[Regression] = []
+        if baseline is not None:
+            suspects = {
+                regression.name
+                for regression in find_regressions(results, baseline, threshold)
+            }
+            for position, case in enumerate(cases):
+                if case.name in suspects:
+                    retry = await time_case(case, rounds * 2)
+                    if retry.ns_per_op < results[position].ns_per_op:
+                        results[position] = retry
+            regressions = find_regressions(results, baseline, threshold)
+    finally:
+        await storage.close()
+        await repository.close()
+    return results, regressions
+
+
+def _document(
+    results: list[CaseResult], *, distribution: str, paths: int, rounds: int
+) -> dict[str, Any]:
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "distribution": distribution,
+        "paths": paths,
+        "rounds": rounds,
+        "results": {
+            result.name: {key: value for key, value in asdict(result).items() if key != "name"}
+            for result in results
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Time the scoring hot paths and the answer handler against stored baselines."
+    )
+    parser.add_argument("--paths", type=int, default=PATH_COUNT, help="answer paths to sample")
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help="timed rounds per case")
+    parser.add_argument(
+        "--answers-db",
+        type=Path,
+        help="weight options by the answers stored in this SQLite database",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="allowed slowdown against the baseline, e.g. 0.25 for 25%%",
+    )
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help=f"also write the results to {BASELINE_PATH}"
+    )
+    args = parser.parse_args()
+    if args.paths < 1 or args.rounds < 1:
+        parser.error("--paths and --rounds must be at least 1")
+
+    weights: Optional[OptionWeights] = None
+    distribution = "uniform"
+    if args.answers_db is not None:
+        weights = load_answer_weights(args.answers_db)
+        distribution = f"answers:{args.answers_db.name}"
+
+    baseline: Optional[dict[str, Any]] = None
+    if BASELINE_PATH.exists() and not args.save_baseline:
+        stored: dict[str, Any] = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+        if (stored["distribution"], stored["paths"]) == (distribution, args.paths):
+            baseline = stored
+        else:
+            print(
+                f"Baseline was recorded for {stored['distribution']} x {stored['paths']} "
+                "paths; not comparing"
+            )
+
+    results, regressions = asyncio.run(
+        run(
+            paths=args.paths,
+            rounds=args.rounds,
+            weights=weights,
+            baseline=baseline,
+            threshold=args.threshold,
+        )
+    )
+    document = _document(
+        results, distribution=distribution, paths=args.paths, rounds=args.rounds
+    )
+    args.output.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+
+    print(f"{distribution} distribution, {args.paths} paths, best of {args.rounds} rounds")
+    for result in results:
+        line = f"  {result.name:<28} {result.ns_per_op:>12,.0f} ns/op"
+        if baseline is not None and result.name in baseline["results"]:
+            recorded = float(baseline["results"][result.name]["ns_per_op"])
+            line += f"  ({result.ns_per_op / recorded - 1.0:+.1%} vs baseline)"
+        print(line)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        BASELINE_PATH.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline saved to {BASELINE_PATH}")
+        return
+
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression.name}: {regression.current_ns:,.0f} ns/op, "
+            f"{regression.slowdown:+.1%} vs {regression.baseline_ns:,.0f} ns/op"
+        )
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
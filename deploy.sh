@@ -12,7 +12,7 @@ echo "→ Installing dependencies..."
 $PROJECT_DIR/venv/bin/pip install -r requirements.txt
 
 echo "→ Applying migrations (if any)..."
-# python3 -m padel_wizard_bot.migrate  # пример
+$VENV -m storage.migrate
 
 echo "→ Restarting bot..."
 supervisorctl restart padel
@@ -2,26 +2,92 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import signal
+from typing import Optional
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
 from padel_wizard_bot.config import settings
-from padel_wizard_bot.handlers import errors, questionnaire, start, testgif
+from padel_wizard_bot.handlers import admin, errors, questionnaire, start, testgif
+from padel_wizard_bot.keyboards.questionnaire import warm_keyboards
 from padel_wizard_bot.logging_config import setup_logging
+from padel_wizard_bot.services.flow_registry import FLOWS
+from padel_wizard_bot.services.levels import Level
+from padel_wizard_bot.services.rating_table import get_rating_table
+from padel_wizard_bot.services.scoring_rules import (
+    ScoringRulesError,
+    get_scoring_rules,
+    reload_scoring_rules,
+)
+from storage.fsm import PersistentFSMStorage
+from storage.repo import repository
 
 
 setup_logging(settings.log_level)
 logger = logging.getLogger(__name__)
 
+STORAGE_STATS_INTERVAL_SECONDS = 600
+
+
+async def report_storage_stats(fsm_storage: PersistentFSMStorage) -> None:
+    """Periodically log the FSM cache gauge so memory growth is visible."""
+
+    while True:
+        await asyncio.sleep(STORAGE_STATS_INTERVAL_SECONDS)
+        stats = fsm_storage.stats()
+        logger.info(
+            "FSM cache: %s entries (~%s KiB), %s hits, %s misses, %s expired, %s evicted",
+            stats.entries,
+            stats.approximate_bytes // 1024,
+            stats.hits,
+            stats.misses,
+            stats.expired,
+            stats.evicted,
+        )
+
+
+async def reload_rules_on_signal() -> None:
+    try:
+        rules = await reload_scoring_rules()
+    except ScoringRulesError as exc:
+        logger.error("Scoring rules reload failed, keeping the current rules: %s", exc)
+        return
+    logger.info(
+        "Scoring rules v%s loaded on SIGHUP, checksum %s",
+        rules.version,
+        rules.checksum[:12],
+    )
+
+
+def install_reload_signal(reload_tasks: set[asyncio.Task[None]]) -> None:
+    """Reload the scoring rules on ``SIGHUP`` where the platform supports it.
+
+    aiogram handles SIGINT and SIGTERM itself; SIGHUP is left to us.
+    """
+
+    def on_signal() -> None:
+        task = asyncio.create_task(reload_rules_on_signal())
+        reload_tasks.add(task)
+        task.add_done_callback(reload_tasks.discard)
+
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            getattr(signal, "SIGHUP"), on_signal
+        )
+    except (AttributeError, NotImplementedError):
+        logger.info("SIGHUP is not available; use /reload_rules to reload scoring rules")
+
 
 def create_dispatcher() -> Dispatcher:
-    dispatcher = Dispatcher()
+    dispatcher = Dispatcher(storage=PersistentFSMStorage(repository))
     dispatcher.include_router(errors.router)
     dispatcher.include_router(start.router)
+    dispatcher.include_router(admin.router)
     dispatcher.include_router(questionnaire.router)
     dispatcher.include_router(testgif.router)
+    dispatcher.shutdown.register(repository.flush)
     return dispatcher
 
 
@@ -33,7 +99,28 @@ async def main() -> None:
         )
         raise RuntimeError("Missing bot token")
 
+    rules = get_scoring_rules()
+    logger.info(
+        "Scoring rules v%s loaded, checksum %s", rules.version, rules.checksum[:12]
+    )
+    rating_table = get_rating_table()
+    logger.info(
+        "Rating table ready: %s entries, checksum %s",
+        len(rating_table.levels),
+        rating_table.checksum[:12],
+    )
+
+    keyboards = warm_keyboards(FLOWS.get(FLOWS.default_key))
+    # Renders the result texts of every level for the current rules.
+    questionnaire.get_final_text(Level.E_MINUS)
+    logger.info("Prebuilt %s question keyboards and the final screen", keyboards)
+
     dispatcher = create_dispatcher()
+    stats_task: Optional[asyncio.Task[None]] = None
+    if isinstance(dispatcher.storage, PersistentFSMStorage):
+        stats_task = asyncio.create_task(report_storage_stats(dispatcher.storage))
+    reload_tasks: set[asyncio.Task[None]] = set()
+    install_reload_signal(reload_tasks)
 
     logger.info("Starting bot polling")
     try:
@@ -46,6 +133,9 @@ async def main() -> None:
         logger.exception("Bot polling stopped due to an unexpected error")
         raise
     finally:
+        if stats_task is not None:
+            stats_task.cancel()
+        await repository.close()
         logger.info("Bot polling stopped")
 
 
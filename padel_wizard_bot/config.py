@@ -1,15 +1,26 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
-    bot_token: str
-    db_url: str = "sqlite:///padel_wizard.db"
+    bot_token: str = ""
+    # Relative sqlite paths are resolved against the project directory; see
+    # storage.db.parse_database_url for the supported URLs.
+    db_url: str = "sqlite:///storage/padel_wizard.sqlite3"
     log_level: str = "INFO"
     env: str = "dev"
+    # Telegram ids allowed to run admin commands such as /reload_rules,
+    # e.g. ADMIN_IDS=[12345678].
+    admin_ids: list[int] = []
+    # How questions are answered: "reply" sends every question as a new
+    # message with a reply keyboard, "inline" edits one message that carries
+    # inline answer buttons.
+    answer_mode: Literal["reply", "inline"] = "reply"
 
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
     }
 
-settings = Settings()  # pyright: ignore[reportCallIssue]
+settings = Settings()
 print("BOT_TOKEN:", settings.bot_token[:10], "...")   # защита от полного отображения токена
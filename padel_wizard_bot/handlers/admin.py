@@ -0,0 +1,42 @@
+"""Maintenance commands available to the bot administrators."""
+from __future__ import annotations
+
+import logging
+
+from aiogram import F, Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from padel_wizard_bot.config import settings
+from padel_wizard_bot.services.scoring_rules import (
+    ScoringRulesError,
+    reload_scoring_rules,
+)
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+router.message.filter(F.from_user.id.in_(set(settings.admin_ids)))
+
+
+@router.message(Command("reload_rules"))
+async def cmd_reload_rules(message: Message) -> None:
+    """Re-read the scoring rules file without restarting polling."""
+
+    user = message.from_user
+    if user is None:
+        # The router filter cannot match anonymous senders; stay explicit anyway.
+        return
+    try:
+        rules = await reload_scoring_rules()
+    except ScoringRulesError as exc:
+        logger.error("Scoring rules reload requested by %s failed: %s", user.id, exc)
+        await message.answer(f"Правила не обновлены, действуют прежние:\n{exc}")
+        return
+    logger.info(
+        "Scoring rules v%s (checksum %s) loaded by %s",
+        rules.version,
+        rules.checksum[:12],
+        user.id,
+    )
+    await message.answer(f"Правила подсчёта обновлены: версия {rules.version}.")
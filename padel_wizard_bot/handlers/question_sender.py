@@ -4,9 +4,13 @@ from __future__ import annotations
 import logging
 from pathlib import Path
 
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import Message
 
-from padel_wizard_bot.keyboards.questionnaire import build_question_keyboard
+from padel_wizard_bot.keyboards.questionnaire import (
+    get_question_inline_markup,
+    get_question_markup,
+)
 from padel_wizard_bot.services.media_cache import AnimationCache
 from padel_wizard_bot.services.questionnaire_flow import Question
 
@@ -43,29 +47,67 @@ Q3_ANIMATION_CACHE = AnimationCache(_resolve_q3_animation_path())
 async def send_question(message: Message, question: Question) -> None:
     """Send question text and, for q3, an accompanying MP4 animation."""
 
-    keyboard = build_question_keyboard(question)
-    await message.answer(
+    await message.answer(question.text, reply_markup=get_question_markup(question))
+    await _send_animation(message, question)
+
+
+async def send_inline_question(
+    message: Message, question: Question, question_ordinal: int
+) -> int:
+    """Send ``question`` with inline answer buttons; returns the new message id."""
+
+    sent = await message.answer(
         question.text,
-        reply_markup=keyboard.as_markup(resize_keyboard=True, one_time_keyboard=True),
+        reply_markup=get_question_inline_markup(question, question_ordinal),
     )
+    await _send_animation(message, question)
+    return sent.message_id
+
+
+async def edit_inline_question(
+    message: Message, question: Question, question_ordinal: int
+) -> int:
+    """Turn the questionnaire message into ``question``; returns its message id.
+
+    A message that can no longer be edited is replaced by a new one.
+    """
 
-    if question.id == "q3":
-        try:
-            animation_input = Q3_ANIMATION_CACHE.get_input()
-        except FileNotFoundError:
-            logger.error(
-                "Q3 animation file is missing: %s", Q3_ANIMATION_CACHE.file_path
-            )
-            return
-
-        try:
-            animation_message = await message.answer_animation(animation=animation_input)
-        except Exception:
-            logger.exception(
-                "Failed to send animation for question %s from %s",
-                question.id,
-                Q3_ANIMATION_CACHE.file_path,
-            )
-        else:
-            if animation_message.animation:
-                Q3_ANIMATION_CACHE.remember(animation_message.animation.file_id)
+    try:
+        await message.edit_text(
+            question.text,
+            reply_markup=get_question_inline_markup(question, question_ordinal),
+        )
+    except TelegramBadRequest as exc:
+        logger.warning(
+            "Cannot edit questionnaire message %s, sending %s anew: %s",
+            message.message_id,
+            question.id,
+            exc,
+        )
+        return await send_inline_question(message, question, question_ordinal)
+    await _send_animation(message, question)
+    return message.message_id
+
+
+async def _send_animation(message: Message, question: Question) -> None:
+    if question.id != "q3":
+        return
+    try:
+        animation_input = Q3_ANIMATION_CACHE.get_input()
+    except FileNotFoundError:
+        logger.error(
+            "Q3 animation file is missing: %s", Q3_ANIMATION_CACHE.file_path
+        )
+        return
+
+    try:
+        animation_message = await message.answer_animation(animation=animation_input)
+    except Exception:
+        logger.exception(
+            "Failed to send animation for question %s from %s",
+            question.id,
+            Q3_ANIMATION_CACHE.file_path,
+        )
+    else:
+        if animation_message.animation:
+            Q3_ANIMATION_CACHE.remember(animation_message.animation.file_id)
@@ -1,35 +1,94 @@
 """Handlers that operate the questionnaire FSM."""
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any
+from dataclasses import dataclass
+from typing import Any, Optional
+from weakref import WeakValueDictionary
 
 from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, Message
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import CallbackQuery, InaccessibleMessage, Message, User
 
 from padel_wizard_bot.keyboards.questionnaire import (
+    AnswerCallback,
     FinalScreenCallback,
-    build_final_keyboard,
+    get_final_markup,
 )
 from padel_wizard_bot.handlers.start import cmd_start
-from padel_wizard_bot.handlers.question_sender import send_question
+from padel_wizard_bot.handlers.question_sender import edit_inline_question, send_question
 from padel_wizard_bot.services.advice import get_advice_for_level
-from padel_wizard_bot.services.experience import calculate_player_experience
 from padel_wizard_bot.services.final_rating import (
-    calculate_final_rating,
     get_level_description,
     get_target_level,
 )
-from padel_wizard_bot.services.questionnaire_flow import DEFAULT_FLOW
+from padel_wizard_bot.services.flow_registry import FLOWS
+from padel_wizard_bot.services.levels import Level
+from padel_wizard_bot.services.questionnaire_flow import (
+    AnswerOption,
+    Question,
+    QuestionnaireFlow,
+)
+from padel_wizard_bot.services.scoring_rules import ScoringRules, get_scoring_rules
+from padel_wizard_bot.services.scoring_state import ScoringState
 from padel_wizard_bot.states.questionnaire import QuestionnaireStates
-from storage.repo import repository
+from storage.repo import ExperienceUpdate, repository
 
 router = Router()
 logger = logging.getLogger(__name__)
 
 
-def _build_level_interpretation(current_level: str, target_level: str) -> str:
+NO_RATING_TEXT = (
+    "Спасибо! Это финальный экран-заглушка. Здесь появится результат и рекомендации.\n\n"
+)
+INLINE_HINT_TEXT = "Пожалуйста, выберите вариант кнопкой под вопросом."
+STALE_ANSWER_TEXT = "Этот вопрос уже неактуален — ответь на последний вопрос."
+FINAL_PROMPT_TEXT = (
+    "Спасибо, за прохождение опросника!\n"
+    "Поделиться фидбеком или сообщить о проблемах: @dikarevp \n\n"
+    "Выберите дальнейшее действие:"
+)
+
+# Final texts of every level, rendered for the scoring rules object they
+# were built from; a rules reload swaps the object and triggers a re-render.
+_final_texts: tuple[Optional[ScoringRules], dict[Level, str]] = (None, {})
+
+
+def get_final_text(level: Level) -> str:
+    """Return the result message for ``level``."""
+
+    global _final_texts
+    rules = get_scoring_rules()
+    rendered_for, texts = _final_texts
+    if rendered_for is not rules:
+        texts = {candidate: _render_final_text(candidate) for candidate in Level}
+        _final_texts = (rules, texts)
+    return texts[level]
+
+
+def _render_final_text(level: Level) -> str:
+    if level == Level.C_PLUS:
+        return (
+            "Твой уровень игры в Падел-теннис C+ или выше.\n"
+            "К сожалению, я пока не умею определять уровень более сильных игроков.\n"
+        )
+    target_level = get_target_level(level)
+    level_progression = f"<b>{level}</b> => <b>{target_level}</b>"
+    interpretation = _build_level_interpretation(level, target_level)
+    final_lines = [
+        f"Твой уровень игры в Падел-теннис: {level_progression}",
+    ]
+    if interpretation:
+        final_lines.append(interpretation)
+    final_lines.append("")
+    final_lines.append("@PadelWizard_bot")
+    return "\n".join(final_lines) + "\n"
+
+
+def _build_level_interpretation(current_level: Level, target_level: Level) -> str:
     """Return human-readable progression between two padel levels."""
 
     current_description = get_level_description(current_level)
@@ -46,9 +105,36 @@ def _build_level_interpretation(current_level: str, target_level: str) -> str:
     return ""
 
 
+# Answer handlers of one conversation run one at a time: aiogram handles
+# updates as concurrent tasks, and two taps on the same button would both
+# see the question before either answer is stored. A lock disappears once
+# no update of its conversation holds or waits for it.
+_answer_locks: WeakValueDictionary[StorageKey, asyncio.Lock] = WeakValueDictionary()
+
+
+def _answer_lock(state: FSMContext) -> asyncio.Lock:
+    lock = _answer_locks.get(state.key)
+    if lock is None:
+        lock = asyncio.Lock()
+        _answer_locks[state.key] = lock
+    return lock
+
+
+@dataclass(frozen=True)
+class _AnswerResult:
+    """What to show after an answer: the next question or the final text."""
+
+    next_question: Optional[Question]
+    final_text: str = ""
+
+
 @router.message(QuestionnaireStates.waiting_for_answer)
 async def on_question_answer(message: Message, state: FSMContext) -> None:
-    user = message.from_user
+    async with _answer_lock(state):
+        await _handle_text_answer(message, state)
+
+
+async def _handle_text_answer(message: Message, state: FSMContext) -> None:
     state_data = await state.get_data()
     current_question_id = state_data.get("current_question_id")
 
@@ -59,18 +145,144 @@ async def on_question_answer(message: Message, state: FSMContext) -> None:
         )
         return
 
-    question = DEFAULT_FLOW.get_question(str(current_question_id))
+    if state_data.get("answer_mode") == "inline":
+        await message.answer(INLINE_HINT_TEXT)
+        return
+
+    flow = FLOWS.resolve(state_data.get("flow_id"), state_data.get("flow_version"))
+    question = flow.get_question(str(current_question_id))
     user_answer = (message.text or "").strip()
 
-    option = next(
-        (opt for opt in question.options if opt.text == user_answer), None
-    )
+    option = question.find_option_by_text(user_answer)
     if option is None:
         await message.answer(
             "Пожалуйста, выберите один из вариантов с клавиатуры ниже."
         )
         return
 
+    result = await _apply_answer(
+        message.from_user, state, state_data, flow, question, option
+    )
+    if result.next_question is not None:
+        await send_question(message, result.next_question)
+        return
+
+    await message.answer(result.final_text)
+    await message.answer(FINAL_PROMPT_TEXT, reply_markup=get_final_markup())
+    _log_final_screen(message.from_user)
+
+
+@router.callback_query(QuestionnaireStates.waiting_for_answer, AnswerCallback.filter())
+async def on_inline_answer(
+    callback: CallbackQuery, callback_data: AnswerCallback, state: FSMContext
+) -> None:
+    """Handle an inline answer button and edit the question message in place.
+
+    Buttons of an earlier question or of another questionnaire message are
+    rejected by their codes, so an old keyboard cannot answer the current
+    question. Answers of one conversation are handled one at a time, so the
+    second press of a double tap is rejected as well.
+    """
+
+    async with _answer_lock(state):
+        await _handle_inline_answer(callback, callback_data, state)
+
+
+async def _handle_inline_answer(
+    callback: CallbackQuery, callback_data: AnswerCallback, state: FSMContext
+) -> None:
+    message = callback.message
+    state_data = await state.get_data()
+    current_question_id = state_data.get("current_question_id")
+    if current_question_id is None or message is None or isinstance(
+        message, InaccessibleMessage
+    ):
+        await callback.answer(STALE_ANSWER_TEXT)
+        return
+
+    flow = FLOWS.resolve(state_data.get("flow_id"), state_data.get("flow_version"))
+    question = flow.get_question(str(current_question_id))
+    if (
+        callback_data.q != flow.question_ordinal(question.id)
+        or message.message_id != state_data.get("question_message_id")
+        or not 0 <= callback_data.o < len(question.options)
+    ):
+        await callback.answer(STALE_ANSWER_TEXT)
+        return
+
+    result = await _apply_answer(
+        callback.from_user,
+        state,
+        state_data,
+        flow,
+        question,
+        question.options[callback_data.o],
+    )
+    await callback.answer()
+    if result.next_question is not None:
+        message_id = await edit_inline_question(
+            message,
+            result.next_question,
+            flow.question_ordinal(result.next_question.id),
+        )
+        if message_id != message.message_id:
+            await state.update_data({"question_message_id": message_id})
+        return
+
+    try:
+        await message.edit_text(result.final_text)
+    except TelegramBadRequest:
+        await message.answer(result.final_text)
+    await message.answer(FINAL_PROMPT_TEXT, reply_markup=get_final_markup())
+    _log_final_screen(callback.from_user)
+
+
+@router.callback_query(AnswerCallback.filter())
+async def on_stale_inline_answer(callback: CallbackQuery) -> None:
+    """Answer buttons pressed after the questionnaire was finished or reset."""
+
+    await callback.answer(STALE_ANSWER_TEXT)
+
+
+async def _restore_scoring(state_data: dict[str, Any]) -> ScoringState:
+    """Return the scoring state saved in the FSM data.
+
+    Conversations started by older versions kept the answers list or the
+    months and levels of the answers; their option ids are recovered from the
+    answers list or from the answers recorded for the session.
+    """
+
+    data = state_data.get("scoring")
+    if data is None and "answers" not in state_data:
+        return ScoringState()
+    if data is not None and ScoringState.is_restorable(data):
+        return ScoringState.from_dict(data)
+    answers = state_data.get("answers")
+    session_id = state_data.get("session_id")
+    if answers is None and session_id is not None:
+        try:
+            session = await repository.get_session(int(session_id))
+        except Exception:
+            logger.exception("Failed to load answers of session %s", session_id)
+            session = None
+        answers = session.answers if session is not None else None
+    return ScoringState.from_answers(answers or [])
+
+
+async def _apply_answer(
+    user: Optional[User],
+    state: FSMContext,
+    state_data: dict[str, Any],
+    flow: QuestionnaireFlow,
+    question: Question,
+    option: AnswerOption,
+) -> _AnswerResult:
+    """Score and persist one answer and move the FSM to the next question.
+
+    When the questionnaire is finished the FSM is cleared and the result
+    carries the final text instead of a next question.
+    """
+
     if user:
         logger.info(
             "User %s answered %s with option %s",
@@ -85,135 +297,108 @@ async def on_question_answer(message: Message, state: FSMContext) -> None:
             option.id,
         )
 
-    answers: list[dict[str, Any]] = list(state_data.get("answers", []))
-    answers.append(
-        {
-            "question_id": question.id,
-            "option_id": option.id,
-        }
+    scoring = (await _restore_scoring(state_data)).apply(question.id, option.id)
+
+    next_question_id = flow.resolve_next(
+        current_question_id=question.id,
+        option_id=option.id,
     )
-    await state.update_data(answers=answers)
+    finished = next_question_id is None
+    # One rules object for every result of this answer, so a reload cannot
+    # split them between versions; the session is stamped with it below.
+    rules = get_scoring_rules()
+    final_rating = scoring.final_rating(rules) if finished else None
 
     session_id = state_data.get("session_id")
     if session_id is not None:
+        experience = scoring.experience(rules)
+        experience_update: Optional[ExperienceUpdate] = None
+        if experience is not None:
+            logger.info(
+                "Session %s experience calculated: q1=%.1f months, q2=%.1f months, total=%.1f months, level=%s",
+                session_id,
+                experience.q1_months,
+                experience.q2_months,
+                experience.total_months,
+                experience.level,
+            )
+            experience_update = ExperienceUpdate(
+                q1_months=experience.q1_months,
+                q2_months=experience.q2_months,
+                total_months=experience.total_months,
+                primary_racket_sport=experience.primary_racket_sport,
+                experience_level=experience.level,
+            )
         try:
-            await repository.update_answers(int(session_id), answers)
-            experience = calculate_player_experience(answers)
-            if experience is not None:
-                logger.info(
-                    "Session %s experience calculated: q1=%.1f months, q2=%.1f months, total=%.1f months, level=%s",
-                    session_id,
-                    experience.q1_months,
-                    experience.q2_months,
-                    experience.total_months,
-                    experience.level,
-                )
-                await repository.upsert_player_experience(
-                    int(session_id),
-                    q1_months=experience.q1_months,
-                    q2_months=experience.q2_months,
-                    total_months=experience.total_months,
-                    primary_racket_sport=experience.primary_racket_sport,
-                    experience_level=experience.level,
-                )
+            await repository.record_answer(
+                int(session_id),
+                question.id,
+                option.id,
+                experience=experience_update,
+                interim_rating=(
+                    final_rating.score if final_rating else scoring.interim_rating(rules)
+                ),
+                finished=finished,
+                final_level=final_rating.level if final_rating else None,
+                rules_version=rules.version if final_rating else None,
+            )
         except Exception:
             logger.exception(
                 "Failed to persist answers for session %s", session_id
             )
-
-    next_question_id = DEFAULT_FLOW.resolve_next(
-        current_question_id=question.id,
-        option_id=option.id,
-    )
+    elif finished and user:
+        try:
+            await repository.set_user_questionnaire_status(
+                telegram_id=user.id,
+                completed=True,
+                final_rating=final_rating.level if final_rating else None,
+                username=user.username,
+            )
+        except Exception:
+            logger.exception(
+                "Failed to update questionnaire status for user %s",
+                f"id={user.id}, username={user.username!r}",
+            )
 
     if next_question_id is None:
         if user:
             logger.info(
-                "User %s completed questionnaire with answers %s",
+                "User %s completed questionnaire with scoring state %s",
                 f"id={user.id}, username={user.username!r}",
-                answers,
+                scoring,
             )
         else:
-            logger.info("Questionnaire completed by unknown user: %s", answers)
-        if session_id is not None:
-            try:
-                await repository.mark_finished(int(session_id))
-            except Exception:
-                logger.exception(
-                    "Failed to mark session %s as finished", session_id
-                )
-
-        final_rating = calculate_final_rating(answers)
-        if user:
-            try:
-                await repository.set_user_questionnaire_status(
-                    telegram_id=user.id,
-                    completed=True,
-                    final_rating=final_rating.level if final_rating else None,
-                    username=user.username,
-                )
-            except Exception:
-                logger.exception(
-                    "Failed to update questionnaire status for user %s",
-                    f"id={user.id}, username={user.username!r}",
-                )
+            logger.info("Questionnaire completed by unknown user: %s", scoring)
         if final_rating is not None:
-            target_level = get_target_level(final_rating.level)
-            if final_rating.level == "C+":
-                final_text = (
-                    "Твой уровень игры в Падел-теннис C+ или выше.\n"
-                    "К сожалению, я пока не умею определять уровень более сильных игроков.\n"
-                )
-            else:
-                level_progression = (
-                    f"<b>{final_rating.level}</b> => <b>{target_level}</b>"
-                )
-                interpretation = _build_level_interpretation(
-                    final_rating.level, target_level
-                )
-                final_lines = [
-                    f"Твой уровень игры в Падел-теннис: {level_progression}",
-                ]
-                if interpretation:
-                    final_lines.append(interpretation)
-                final_lines.append("")
-                final_lines.append("@PadelWizard_bot")
-                final_text = "\n".join(final_lines) + "\n"
+            final_text = get_final_text(final_rating.level)
             logger.info(
                 "Final rating calculated: level=%s, target_level=%s, score=%.2f, experience_level=%s, skills=%s",
                 final_rating.level,
-                target_level,
+                get_target_level(final_rating.level),
                 final_rating.score,
                 final_rating.experience_level,
                 final_rating.skill_levels,
             )
         else:
-            final_text = (
-                "Спасибо! Это финальный экран-заглушка. Здесь появится результат и рекомендации.\n\n"
-            )
+            final_text = NO_RATING_TEXT
 
         await state.clear()
-        final_keyboard = build_final_keyboard()
-        await message.answer(final_text)
-        await message.answer(
-            "Спасибо, за прохождение опросника!\n"
-            "Поделиться фидбеком или сообщить о проблемах: @dikarevp \n\n"
-            "Выберите дальнейшее действие:",
-            reply_markup=final_keyboard.as_markup(),
-        )
-        if user:
-            logger.info(
-                "User %s saw the final screen", f"id={user.id}, username={user.username!r}"
-            )
-        else:
-            logger.info("Final screen shown to unknown user")
-        return
+        return _AnswerResult(next_question=None, final_text=final_text)
 
-    next_question = DEFAULT_FLOW.get_question(next_question_id)
+    next_question = flow.get_question(next_question_id)
     await state.update_data(
-        current_question_id=next_question.id,
+        {"current_question_id": next_question.id, "scoring": scoring.to_dict()}
     )
-    await send_question(message, next_question)
+    return _AnswerResult(next_question=next_question)
+
+
+def _log_final_screen(user: Optional[User]) -> None:
+    if user:
+        logger.info(
+            "User %s saw the final screen", f"id={user.id}, username={user.username!r}"
+        )
+    else:
+        logger.info("Final screen shown to unknown user")
 
 
 @router.callback_query(FinalScreenCallback.filter())
@@ -261,11 +446,16 @@ async def on_final_screen_action(
             user_record = await repository.get_or_create_user(
                 telegram_id=user.id, username=user.username
             )
-            advice_text = get_advice_for_level(user_record.final_rating)
+            level = (
+                Level(user_record.final_rating)
+                if user_record.final_rating is not None
+                else None
+            )
+            advice_text = get_advice_for_level(level)
             logger.info(
                 "Advice requested by user %s with level %s",
                 f"id={user.id}, username={user.username!r}",
-                user_record.final_rating,
+                level,
             )
         except Exception:
             logger.exception(
@@ -14,14 +14,27 @@ from aiogram.types import (
     Message,
 )
 
-from padel_wizard_bot.handlers.question_sender import send_question
-from padel_wizard_bot.services.questionnaire_flow import DEFAULT_FLOW
+from padel_wizard_bot.config import settings
+from padel_wizard_bot.handlers.question_sender import send_inline_question, send_question
+from padel_wizard_bot.services.flow_registry import FLOWS
+from padel_wizard_bot.services.scoring_state import ScoringState
 from padel_wizard_bot.states.questionnaire import QuestionnaireStates
 from storage.repo import repository
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+LAUNCH_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="Начать",
+                callback_data="wizard_launch",
+            )
+        ]
+    ]
+)
+
 
 @router.message(CommandStart())
 async def cmd_start(message: Message) -> None:
@@ -34,37 +47,35 @@ async def cmd_start(message: Message) -> None:
     else:
         logger.info("Bot opened via /start by an unknown user")
 
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="Начать",
-                    callback_data="wizard_launch",
-                )
-            ]
-        ]
-    )
-
     await message.answer(
         (
             "Привет! Я — <b>Padel Wizard</b> 🪄\n\n"
             "Я задам тебе <b>6 вопросов</b>, чтобы ты узнал свой уровень игры в падел и получил персональные советы для улучшения.\n\n"
             "Старайся отвечать честно - от этого зависит точность результата"
         ),
-        reply_markup=keyboard,
+        reply_markup=LAUNCH_KEYBOARD,
     )
 
 
 @router.callback_query(F.data == "wizard_launch")
 async def on_wizard_launch(callback: CallbackQuery, state: FSMContext) -> None:
     user = callback.from_user
+    flow_key = FLOWS.assign(user.id) if user else FLOWS.default_key
+    flow = FLOWS.get(flow_key)
     if user:
         logger.info(
-            "User %s pressed 'Начать опросник'",
+            "User %s pressed 'Начать опросник', flow %s v%s",
             f"id={user.id}, username={user.username!r}",
+            flow_key.id,
+            flow_key.version,
         )
         try:
-            session = await repository.start_session(user.id, user.username)
+            session = await repository.start_session(
+                user.id,
+                user.username,
+                flow_id=flow_key.id,
+                flow_version=flow_key.version,
+            )
         except Exception:
             logger.exception(
                 "Failed to start questionnaire session for user %s",
@@ -87,18 +98,26 @@ async def on_wizard_launch(callback: CallbackQuery, state: FSMContext) -> None:
         await callback.answer()
         return
 
-    first_question = DEFAULT_FLOW.get_question(DEFAULT_FLOW.first_question_id)
+    first_question = flow.get_question(flow.first_question_id)
 
     await state.set_state(QuestionnaireStates.waiting_for_answer)
     state_payload: dict[str, Any] = {
         "current_question_id": first_question.id,
-        "answers": [],
+        "scoring": ScoringState().to_dict(),
+        "flow_id": flow_key.id,
+        "flow_version": flow_key.version,
     }
     if session is not None:
         state_payload["session_id"] = session.id
         state_payload["session_number"] = session.session_number
 
-    await state.update_data(state_payload)
-
-    await send_question(message, first_question)
+    if settings.answer_mode == "inline":
+        state_payload["answer_mode"] = "inline"
+        state_payload["question_message_id"] = await send_inline_question(
+            message, first_question, flow.question_ordinal(first_question.id)
+        )
+        await state.update_data(state_payload)
+    else:
+        await state.update_data(state_payload)
+        await send_question(message, first_question)
     await callback.answer()
@@ -1,10 +1,25 @@
-"""Reply keyboards for questionnaire flow."""
+"""Reply keyboards for questionnaire flow.
+
+Handlers send the ready markups from :func:`get_question_markup`,
+:func:`get_question_inline_markup` and :func:`get_final_markup`. aiogram
+markups are frozen models, so one instance is built per question and reused
+for every send. Questions are keyed by value: a question changed in a new
+flow version gets its own keyboard, and an unchanged one keeps sharing the
+existing markup.
+"""
 from __future__ import annotations
 
+from typing import Optional
+
 from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 
-from padel_wizard_bot.services.questionnaire_flow import Question
+from padel_wizard_bot.services.questionnaire_flow import Question, QuestionnaireFlow
+
+_question_markups: dict[Question, ReplyKeyboardMarkup] = {}
+_inline_markups: dict[tuple[Question, int], InlineKeyboardMarkup] = {}
+_final_markup: Optional[InlineKeyboardMarkup] = None
 
 
 def build_question_keyboard(question: Question) -> ReplyKeyboardBuilder:
@@ -13,17 +28,43 @@ def build_question_keyboard(question: Question) -> ReplyKeyboardBuilder:
     builder = ReplyKeyboardBuilder()
     for option in question.options:
         builder.button(text=option.text)
+    builder.adjust(_row_width(question))
+    return builder
 
-    if question.id in {"q4", "q5", "q6"}:
-        builder.adjust(1)
-    elif len(question.options) >= 3:
-        builder.adjust(2)
-    else:
-        builder.adjust(1)
 
+def build_question_inline_keyboard(
+    question: Question, question_ordinal: int
+) -> InlineKeyboardBuilder:
+    """Build an inline keyboard whose buttons carry :class:`AnswerCallback` codes."""
+
+    builder = InlineKeyboardBuilder()
+    for option_ordinal, option in enumerate(question.options):
+        builder.button(
+            text=option.text,
+            callback_data=AnswerCallback(q=question_ordinal, o=option_ordinal),
+        )
+    builder.adjust(_row_width(question))
     return builder
 
 
+def _row_width(question: Question) -> int:
+    if question.id in {"q4", "q5", "q6"}:
+        return 1
+    if len(question.options) >= 3:
+        return 2
+    return 1
+
+
+class AnswerCallback(CallbackData, prefix="a"):
+    """Inline answer button: ordinals of the question in its flow and of the option.
+
+    Packs to a few bytes such as ``a:4:2``, far below Telegram's 64-byte limit.
+    """
+
+    q: int
+    o: int
+
+
 class FinalScreenCallback(CallbackData, prefix="final"):
     """Callback payload for actions on the final screen."""
 
@@ -42,3 +83,46 @@ def build_final_keyboard() -> InlineKeyboardBuilder:
     )
     builder.adjust(1)
     return builder
+
+
+def get_question_markup(question: Question) -> ReplyKeyboardMarkup:
+    """Return the reply keyboard for ``question``, building it on first use."""
+
+    markup = _question_markups.get(question)
+    if markup is None:
+        markup = build_question_keyboard(question).as_markup(
+            resize_keyboard=True, one_time_keyboard=True
+        )
+        _question_markups[question] = markup
+    return markup
+
+
+def get_question_inline_markup(
+    question: Question, question_ordinal: int
+) -> InlineKeyboardMarkup:
+    """Return the inline keyboard for ``question``, building it on first use."""
+
+    key = (question, question_ordinal)
+    markup = _inline_markups.get(key)
+    if markup is None:
+        markup = build_question_inline_keyboard(question, question_ordinal).as_markup()
+        _inline_markups[key] = markup
+    return markup
+
+
+def get_final_markup() -> InlineKeyboardMarkup:
+    global _final_markup
+    if _final_markup is None:
+        _final_markup = build_final_keyboard().as_markup()
+    return _final_markup
+
+
+def warm_keyboards(flow: QuestionnaireFlow) -> int:
+    """Build the keyboards of every question in ``flow``; returns their number."""
+
+    for question_id in flow.question_ids:
+        question = flow.get_question(question_id)
+        get_question_markup(question)
+        get_question_inline_markup(question, flow.question_ordinal(question_id))
+    get_final_markup()
+    return len(flow.question_ids)
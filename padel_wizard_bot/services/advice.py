@@ -3,6 +3,8 @@ from __future__ import annotations
 
 from typing import Optional
 
+from padel_wizard_bot.services.levels import Level
+
 _ADVICE_BY_LEVEL_GROUP: dict[str, str] = {
     "E": (
         "Для твоего уровня важней всего закладывать базу, на основе которой ты будешь улучшать разные аспекты своей игры.\n\n"
@@ -49,24 +51,10 @@ _ADVICE_BY_LEVEL_GROUP: dict[str, str] = {
 }
 
 
-def _map_level_to_group(level: str) -> Optional[str]:
-    if level.startswith("E"):
-        return "E"
-    if level.startswith("D"):
-        return "D"
-    if level.startswith("C"):
-        return "C"
-    return None
-
-
-def get_advice_for_level(level: Optional[str]) -> Optional[str]:
+def get_advice_for_level(level: Optional[Level]) -> Optional[str]:
     """Return advice text for the provided padel level, if known."""
 
     if level is None:
         return None
 
-    group = _map_level_to_group(level)
-    if group is None:
-        return None
-
-    return _ADVICE_BY_LEVEL_GROUP.get(group)
+    return _ADVICE_BY_LEVEL_GROUP.get(level.group)
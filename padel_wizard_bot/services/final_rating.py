@@ -2,83 +2,65 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Iterable, Optional
+from typing import TYPE_CHECKING, Any, Iterable, Optional
 
-from padel_wizard_bot.services.experience import calculate_player_experience
-from padel_wizard_bot.services.scoring_engine import (
-    SkillRatings,
-    derive_skill_ratings,
+from padel_wizard_bot.services.experience import (
+    PlayerExperience,
+    calculate_player_experience,
 )
+from padel_wizard_bot.services.levels import Level
+from padel_wizard_bot.services.questionnaire_flow import DEFAULT_FLOW
+from padel_wizard_bot.services.scoring_engine import SkillRatings, derive_skill_ratings
+from padel_wizard_bot.services.scoring_rules import ScoringRules, get_scoring_rules
 
+if TYPE_CHECKING:
+    import numpy
 
-LEVEL_TO_SCORE: dict[str, float] = {
-    "E-": 0.66,
-    "E": 1.0,
-    "E+": 1.33,
-    "D-": 1.66,
-    "D": 2.0,
-    "D+": 2.33,
-    "C-": 2.66,
-    "C": 3.0,
-    "C+": 3.33,
-}
 
-LEVEL_ORDER: tuple[str, ...] = (
-    "E-",
-    "E",
-    "E+",
-    "D-",
-    "D",
-    "D+",
-    "C-",
-    "C",
-    "C+",
-)
+LEVEL_ORDER: tuple[Level, ...] = tuple(Level)
 
-MIN_EXPERIENCE_LEVEL = "E-"
-MAX_EXPERIENCE_LEVEL = "C+"
-
-LEVEL_DESCRIPTIONS: dict[str, str] = {
-    "E-": "Новичок",
-    "E": "Начинающий",
-    "E+": "Продвинутый начинающий",
-    "D-": "Базовый уровень",
-    "D": "Любитель",
-    "D+": "Продвинутый любитель",
-    "C-": "Начинающих средний",
-    "C": "Средний уровень",
-    "C+": "Продвинутый средний",
-}
+MIN_EXPERIENCE_LEVEL = Level.E_MINUS
+MAX_EXPERIENCE_LEVEL = Level.C_PLUS
 
 
 @dataclass(frozen=True)
 class FinalRating:
     """Combined questionnaire rating mapped back to a padel level."""
 
-    level: str
+    level: Level
     score: float
-    experience_level: str
+    experience_level: Level
     skill_levels: SkillRatings
 
 
 def calculate_final_rating(
-    answers: Iterable[dict[str, Any]]
+    answers: Iterable[dict[str, Any]], rules: Optional[ScoringRules] = None
 ) -> Optional[FinalRating]:
     """Return final aggregated rating from questionnaire answers.
 
-    The algorithm weights the experience score (q1 + q2) based on the player's
-    experience band (×3 for E-/E/E+/D-, ×2.5 for D/D+/C-, ×2 for C/C+), adds the
-    skill scores from q3–q6, divides the sum by the total weight (experience
-    weight + four skill weights), and maps the result back to the nearest
-    level.
-    
+    The algorithm weights the experience score (q1 + q2) by the multiplier of
+    the player's experience level, adds the skill scores from q3–q6, divides
+    the sum by the total weight (experience weight + four skill weights), and
+    maps the result back to the nearest level, at most ``clamp_steps`` levels
+    away from the experience level. All constants come from the scoring rules.
     """
 
-    experience = calculate_player_experience(answers)
+    rules = rules or get_scoring_rules()
+    experience = calculate_player_experience(answers, rules)
     if experience is None:
         return None
 
-    skill_ratings = derive_skill_ratings(answers)
+    return rate_player(experience, derive_skill_ratings(answers, rules), rules)
+
+
+def rate_player(
+    experience: PlayerExperience,
+    skill_ratings: SkillRatings,
+    rules: Optional[ScoringRules] = None,
+) -> Optional[FinalRating]:
+    """Return the final rating for an experience and a full set of skill levels."""
+
+    rules = rules or get_scoring_rules()
     reliability_level = skill_ratings.reliability
     net_play_level = skill_ratings.net_play
     glass_play_level = skill_ratings.glass_play
@@ -92,14 +74,15 @@ def calculate_final_rating(
     ):
         return None
 
+    level_scores = rules.level_scores
     try:
-        experience_score = LEVEL_TO_SCORE[experience.level]
-        experience_multiplier = _get_experience_multiplier(experience.level)
+        experience_score = level_scores[experience.level]
+        experience_multiplier = _get_experience_multiplier(experience.level, rules)
         skill_scores = [
-            _level_to_score(reliability_level),
-            _level_to_score(net_play_level),
-            _level_to_score(glass_play_level),
-            _level_to_score(strokes_level),
+            level_scores[reliability_level],
+            level_scores[net_play_level],
+            level_scores[glass_play_level],
+            level_scores[strokes_level],
         ]
     except (KeyError, ValueError):
         return None
@@ -107,8 +90,8 @@ def calculate_final_rating(
     total_score = experience_score * experience_multiplier + sum(skill_scores)
     total_weight = experience_multiplier + len(skill_scores)
     average_score = total_score / total_weight
-    final_level = _score_to_level(average_score)
-    final_level = _clamp_level_by_experience(final_level, experience.level)
+    final_level = _score_to_level(average_score, rules)
+    final_level = _clamp_level_by_experience(final_level, experience.level, rules)
     return FinalRating(
         level=final_level,
         score=average_score,
@@ -117,61 +100,273 @@ def calculate_final_rating(
     )
 
 
-def _level_to_score(level: str) -> float:
-    return LEVEL_TO_SCORE[level]
+def calculate_interim_score(
+    experience: PlayerExperience,
+    skill_ratings: SkillRatings,
+    rules: Optional[ScoringRules] = None,
+) -> Optional[float]:
+    """Return the weighted average of the experience and the skills rated so far.
 
+    Uses the same weights as :func:`calculate_final_rating`, so once every
+    skill question is answered the result equals ``FinalRating.score``.
+    """
 
-def _score_to_level(score: float) -> str:
-    return min(LEVEL_TO_SCORE.items(), key=lambda item: abs(item[1] - score))[0]
+    rules = rules or get_scoring_rules()
+    level_scores = rules.level_scores
+    try:
+        experience_multiplier = _get_experience_multiplier(experience.level, rules)
+        total_score = level_scores[experience.level] * experience_multiplier
+        skill_scores = [
+            level_scores[level]
+            for level in (
+                skill_ratings.reliability,
+                skill_ratings.net_play,
+                skill_ratings.glass_play,
+                skill_ratings.strokes,
+            )
+            if level is not None
+        ]
+    except (KeyError, ValueError):
+        return None
+    return (total_score + sum(skill_scores)) / (experience_multiplier + len(skill_scores))
 
 
-def _get_experience_multiplier(experience_level: str) -> float:
-    if experience_level in ("E-", "E", "E+", "D-"):
-        return 3.0
-    if experience_level in ("D", "D+", "C-"):
-        return 2.5
-    if experience_level in ("C", "C+"):
-        return 2.0
-    raise ValueError(f"Unknown experience level: {experience_level}")
+def _score_to_level(score: float, rules: ScoringRules) -> Level:
+    return min(rules.level_scores.items(), key=lambda item: abs(item[1] - score))[0]
 
 
-def _clamp_level_by_experience(final_level: str, experience_level: str) -> str:
+def _get_experience_multiplier(experience_level: Level, rules: ScoringRules) -> float:
     try:
-        experience_index = LEVEL_ORDER.index(experience_level)
-        final_index = LEVEL_ORDER.index(final_level)
-    except ValueError:
-        return final_level
-
-    min_experience_index = LEVEL_ORDER.index(MIN_EXPERIENCE_LEVEL)
-    max_experience_index = LEVEL_ORDER.index(MAX_EXPERIENCE_LEVEL)
+        return rules.experience_multipliers[experience_level]
+    except KeyError:
+        raise ValueError(f"Unknown experience level: {experience_level}") from None
 
-    min_index = max(min_experience_index, experience_index - 3)
-    max_index = min(max_experience_index, experience_index + 3)
 
-    if final_index < min_index:
-        return LEVEL_ORDER[min_index]
-    if final_index > max_index:
-        return LEVEL_ORDER[max_index]
-    return final_level
+def _clamp_level_by_experience(
+    final_level: Level, experience_level: Level, rules: ScoringRules
+) -> Level:
+    lower = max(MIN_EXPERIENCE_LEVEL, experience_level - rules.clamp_steps)
+    upper = min(MAX_EXPERIENCE_LEVEL, experience_level + rules.clamp_steps)
+    return Level(min(max(final_level, lower), upper))
 
 
-def get_target_level(level: str) -> str:
+def get_target_level(level: Level) -> Level:
     """Return the next level the player can aim for."""
 
-    try:
-        current_index = LEVEL_ORDER.index(level)
-    except ValueError:
-        return level
+    return level.shifted(1)
 
-    next_index = current_index + 1
-    if next_index >= len(LEVEL_ORDER):
-        return level
 
-    return LEVEL_ORDER[next_index]
+def get_level_description(level: Level) -> Optional[str]:
+    """Return human-readable description for a padel level if known."""
 
+    return get_scoring_rules().level_descriptions.get(level)
 
-def get_level_description(level: str) -> Optional[str]:
-    """Return human-readable description for a padel level if known."""
 
-    return LEVEL_DESCRIPTIONS.get(level)
+# ---------- BATCH SCORING ----------
+
+# Column order of the option matrix accepted by ``score_batch``. Each cell is
+# the position of the chosen option among the options of its question in
+# ``DEFAULT_FLOW`` (q1.1, q1.sports, q2, q3..q6) or ``-1`` when the question
+# was not answered.
+BATCH_COLUMNS: tuple[str, ...] = ("q1_1", "racket_sport", "q2", "q3", "q4", "q5", "q6")
+MISSING_OPTION = -1
+NO_LEVEL = -1
+
+_SKILL_QUESTION_IDS: tuple[str, ...] = ("q3", "q4", "q5", "q6")
+
+
+@dataclass(frozen=True)
+class BatchParameters:
+    """Scoring constants used by :func:`score_batch`, replaceable for what-if runs.
+
+    ``rules`` supplies everything not listed separately. ``option_levels``
+    maps each skill question to ``{option_id: level}``; the option ids
+    themselves (and so the matrix encoding) stay fixed.
+    """
+
+    rules: ScoringRules
+    sport_coefficients: dict[str, float]
+    experience_thresholds: tuple[tuple[float, Level], ...]
+    experience_multipliers: dict[Level, float]
+    option_levels: dict[str, dict[str, Level]]
+
+    @classmethod
+    def current(cls, rules: Optional[ScoringRules] = None) -> BatchParameters:
+        """Return the constants the scalar scoring code uses right now."""
+
+        rules = rules or get_scoring_rules()
+        return cls(
+            rules=rules,
+            sport_coefficients=dict(rules.racket_sport_coefficients),
+            experience_thresholds=rules.experience_thresholds,
+            experience_multipliers=dict(rules.experience_multipliers),
+            option_levels={
+                question_id: dict(rules.skill_features[question_id][1])
+                for question_id in _SKILL_QUESTION_IDS
+            },
+        )
+
+
+@dataclass(frozen=True)
+class BatchRatings:
+    """Results of :func:`score_batch`, one array element per input row.
+
+    Levels are :class:`Level` codes; rows that ``calculate_final_rating`` would
+    answer with ``None`` have ``level_codes == NO_LEVEL`` and a NaN score.
+    """
+
+    level_codes: "numpy.ndarray"
+    scores: "numpy.ndarray"
+    experience_level_codes: "numpy.ndarray"
+    total_months: "numpy.ndarray"
+    clamped: "numpy.ndarray"
+
+    def levels(self) -> list[Optional[Level]]:
+        return [
+            Level(code) if code != NO_LEVEL else None
+            for code in self.level_codes.tolist()
+        ]
+
+
+def encode_answers(answers: Iterable[dict[str, Any]]) -> list[int]:
+    """Return one ``score_batch`` row for a list of questionnaire answers."""
+
+    row = [MISSING_OPTION] * len(BATCH_COLUMNS)
+    for answer in answers:
+        question_id = str(answer.get("question_id"))
+        option_id = str(answer.get("option_id"))
+        if option_id in _Q1_CODES:
+            row[0] = _Q1_CODES[option_id]
+        elif option_id in _Q2_CODES:
+            row[2] = _Q2_CODES[option_id]
+        elif option_id in _SPORT_CODES:
+            row[1] = _SPORT_CODES[option_id]
+        if question_id in _SKILL_CODES:
+            column, codes = _SKILL_CODES[question_id]
+            row[column] = codes.get(option_id, MISSING_OPTION)
+    return row
+
+
+def score_batch(
+    option_matrix: Any, parameters: Optional[BatchParameters] = None
+) -> BatchRatings:
+    """Score many answer sets at once with NumPy.
+
+    ``option_matrix`` is an integer array of shape ``(n, 7)`` laid out as
+    :data:`BATCH_COLUMNS` (see :func:`encode_answers`). Every step of
+    :func:`calculate_final_rating` is reproduced with array operations in the
+    same floating-point order, so with the default ``parameters`` scores and
+    levels are identical to the scalar path (``tests/test_score_batch.py``).
+    NumPy is an optional dependency needed only here; it is listed in
+    ``requirements-dev.txt``.
+    """
+
+    try:
+        import numpy as np
+    except ImportError as exc:
+        raise ImportError(
+            "score_batch requires numpy: pip install -r requirements-dev.txt"
+        ) from exc
+
+    if parameters is None:
+        parameters = BatchParameters.current()
+    rules = parameters.rules
+    matrix = np.asarray(option_matrix, dtype=np.int64)
+    if matrix.ndim != 2 or matrix.shape[1] != len(BATCH_COLUMNS):
+        raise ValueError(
+            f"option_matrix must have shape (n, {len(BATCH_COLUMNS)}), got {matrix.shape}"
+        )
+
+    def pick(values: list[float], column: Any, missing: float) -> Any:
+        # Appending the value for "missing" lets code -1 index it directly.
+        table = np.array(values + [missing], dtype=np.float64)
+        return table[np.where(column < 0, len(values), column)]
+
+    q1_months = pick(
+        [rules.q1_option_months[option_id] for option_id in _Q1_CODES], matrix[:, 0], 0.0
+    )
+    coefficients = pick(
+        [
+            parameters.sport_coefficients.get(rules.racket_sport_names[option_id], 1.0)
+            for option_id in _SPORT_CODES
+        ],
+        matrix[:, 1],
+        1.0,
+    )
+    q2_months = pick(
+        [rules.q2_option_months[option_id] for option_id in _Q2_CODES],
+        matrix[:, 2],
+        np.nan,
+    )
+    total_months = q1_months * coefficients + q2_months
+
+    thresholds = np.array([bound for bound, _ in parameters.experience_thresholds])
+    threshold_codes = np.array(
+        [int(level) for _, level in parameters.experience_thresholds]
+        + [int(rules.top_experience_level)]
+    )
+    has_experience = matrix[:, 2] >= 0
+    experience_codes = threshold_codes[
+        np.searchsorted(thresholds, np.where(has_experience, total_months, 0.0), side="right")
+    ]
+
+    def by_code(values: dict[Level, float]) -> Any:
+        table = np.full(max(Level) + 1, np.nan)
+        for level, value in values.items():
+            table[level] = value
+        return table
+
+    multiplier = by_code(parameters.experience_multipliers)[experience_codes]
+
+    skills_known = has_experience.copy()
+    skill_sum: Any = None
+    for column, question_id in enumerate(_SKILL_QUESTION_IDS, start=3):
+        codes = matrix[:, column]
+        skills_known &= codes >= 0
+        option_levels = parameters.option_levels[question_id]
+        scores = pick(
+            [
+                rules.level_scores[option_levels[option_id]]
+                for option_id in _SKILL_CODES[question_id][1]
+            ],
+            codes,
+            np.nan,
+        )
+        skill_sum = scores if skill_sum is None else skill_sum + scores
+
+    total_score = by_code(rules.level_scores)[experience_codes] * multiplier + skill_sum
+    average = total_score / (multiplier + len(_SKILL_QUESTION_IDS))
+
+    # min() over the level scores keeps the first of equally close levels, and
+    # so does argmin.
+    candidates = list(rules.level_scores.items())
+    candidate_scores = np.array([score for _, score in candidates])
+    candidate_codes = np.array([int(level) for level, _ in candidates])
+    nearest = np.abs(candidate_scores[None, :] - np.where(skills_known, average, 0.0)[:, None])
+    level_codes = candidate_codes[np.argmin(nearest, axis=1)]
+
+    lower = np.maximum(int(MIN_EXPERIENCE_LEVEL), experience_codes - rules.clamp_steps)
+    upper = np.minimum(int(MAX_EXPERIENCE_LEVEL), experience_codes + rules.clamp_steps)
+    clamped_codes = np.clip(level_codes, lower, upper)
+
+    return BatchRatings(
+        level_codes=np.where(skills_known, clamped_codes, NO_LEVEL),
+        scores=np.where(skills_known, average, np.nan),
+        experience_level_codes=np.where(has_experience, experience_codes, NO_LEVEL),
+        total_months=np.where(has_experience, total_months, np.nan),
+        clamped=skills_known & (clamped_codes != level_codes),
+    )
+
 
+def _option_codes(question_id: str) -> dict[str, int]:
+    question = DEFAULT_FLOW.get_question(question_id)
+    return {option.id: code for code, option in enumerate(question.options)}
+
+
+_Q1_CODES: dict[str, int] = _option_codes("q1.1")
+_Q2_CODES: dict[str, int] = _option_codes("q2")
+_SPORT_CODES: dict[str, int] = _option_codes("q1.sports")
+_SKILL_CODES: dict[str, tuple[int, dict[str, int]]] = {
+    question_id: (column, _option_codes(question_id))
+    for column, question_id in enumerate(_SKILL_QUESTION_IDS, start=3)
+}
@@ -0,0 +1,149 @@
+"""Registry of questionnaire flows, so variants can run side by side.
+
+Each flow is registered under an id and an integer version with a builder
+that is only called the first time the flow is needed. A new session is
+assigned a flow by hashing the Telegram user id into the registered
+weights, so a user keeps landing in the same variant, and the chosen id and
+version are stored with the session and in the FSM data. Handlers resolve
+the pinned flow with :meth:`FlowRegistry.resolve`, a single dictionary
+lookup once the flow has been built.
+
+Variants must reuse question and option ids that ``scoring_rules.json``
+knows, otherwise their answers are not scored.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Callable, Final, Optional
+
+from padel_wizard_bot.services.questionnaire_flow import DEFAULT_FLOW, QuestionnaireFlow
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLOW_ID: Final[str] = "default"
+DEFAULT_FLOW_VERSION: Final[int] = 1
+# Changing the salt reshuffles every user between the weighted flows.
+ASSIGNMENT_SALT: Final[str] = "padel-wizard-flows"
+
+
+@dataclass(frozen=True)
+class FlowKey:
+    id: str
+    version: int
+
+
+@dataclass(frozen=True)
+class FlowRegistration:
+    key: FlowKey
+    builder: Callable[[], QuestionnaireFlow]
+    # Share of new sessions assigned to this flow; 0 keeps it for pinned
+    # sessions only.
+    weight: int
+
+
+class FlowRegistry:
+    """Flows by id and version, built lazily and cached."""
+
+    def __init__(self, default: FlowKey) -> None:
+        self._default = default
+        self._registrations: dict[FlowKey, FlowRegistration] = {}
+        # Keyed by the (id, version) pair stored with sessions, which may be
+        # (None, None) for sessions started before flows were pinned.
+        self._flows: dict[tuple[Optional[str], Optional[int]], QuestionnaireFlow] = {}
+        self._assignable: list[FlowKey] = []
+        self._cumulative_weights: list[int] = []
+
+    @property
+    def default_key(self) -> FlowKey:
+        return self._default
+
+    def register(
+        self,
+        flow_id: str,
+        version: int,
+        builder: Callable[[], QuestionnaireFlow],
+        *,
+        weight: int = 0,
+    ) -> FlowKey:
+        if weight < 0:
+            raise ValueError("weight must not be negative")
+        key = FlowKey(flow_id, version)
+        if key in self._registrations:
+            raise ValueError(f"Flow {flow_id!r} version {version} is already registered")
+        self._registrations[key] = FlowRegistration(key, builder, weight)
+        if weight:
+            self._assignable.append(key)
+            total = self._cumulative_weights[-1] if self._cumulative_weights else 0
+            self._cumulative_weights.append(total + weight)
+        return key
+
+    def assign(self, telegram_id: int) -> FlowKey:
+        """Pick the flow for a new session of this user by weighted hashing."""
+
+        if not self._cumulative_weights:
+            return self._default
+        digest = hashlib.blake2b(
+            f"{ASSIGNMENT_SALT}:{telegram_id}".encode(), digest_size=8
+        ).digest()
+        bucket = int.from_bytes(digest, "big") % self._cumulative_weights[-1]
+        return self._assignable[bisect_right(self._cumulative_weights, bucket)]
+
+    def get(self, key: FlowKey) -> QuestionnaireFlow:
+        """Return a registered flow, building it on first use."""
+
+        return self.resolve(key.id, key.version)
+
+    def resolve(
+        self, flow_id: Optional[str], version: Optional[int]
+    ) -> QuestionnaireFlow:
+        """Return the flow pinned to a session.
+
+        ``None`` stands for the default flow, which is what sessions started
+        before flows were pinned used. A flow that is no longer registered
+        falls back to the newest version of the same id, then to the default,
+        and the substitute is cached under the requested key.
+        """
+
+        flow = self._flows.get((flow_id, version))
+        if flow is None:
+            flow = self._load(flow_id, version)
+        return flow
+
+    def _load(self, flow_id: Optional[str], version: Optional[int]) -> QuestionnaireFlow:
+        requested = (flow_id, version)
+        key = (
+            FlowKey(flow_id, version)
+            if flow_id is not None and version is not None
+            else self._default
+        )
+        if key not in self._registrations:
+            same_id = [known for known in self._registrations if known.id == flow_id]
+            substitute = max(same_id, key=lambda known: known.version, default=self._default)
+            logger.warning(
+                "Flow %s version %s is not registered; using %s version %s",
+                flow_id,
+                version,
+                substitute.id,
+                substitute.version,
+            )
+            key = substitute
+        flow = self._flows.get((key.id, key.version))
+        if flow is None:
+            flow = self._registrations[key].builder()
+            self._flows[(key.id, key.version)] = flow
+            logger.info(
+                "Built questionnaire flow %s version %s: %s questions, at most %s per pass",
+                key.id,
+                key.version,
+                len(flow.question_ids),
+                flow.max_path_length,
+            )
+        self._flows[requested] = flow
+        return flow
+
+
+FLOWS = FlowRegistry(FlowKey(DEFAULT_FLOW_ID, DEFAULT_FLOW_VERSION))
+FLOWS.register(DEFAULT_FLOW_ID, DEFAULT_FLOW_VERSION, lambda: DEFAULT_FLOW, weight=100)
@@ -0,0 +1,60 @@
+"""Padel levels as small ordered integer codes."""
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import Union
+
+
+class Level(IntEnum):
+    """Padel level from E- to C+.
+
+    The values are the codes stored in the database and follow the level
+    order, so neighbours and clamping are plain integer arithmetic. ``str()``
+    and f-strings give the familiar label such as ``"D+"``; convert back with
+    :meth:`parse`.
+    """
+
+    E_MINUS = 1
+    E = 2
+    E_PLUS = 3
+    D_MINUS = 4
+    D = 5
+    D_PLUS = 6
+    C_MINUS = 7
+    C = 8
+    C_PLUS = 9
+
+    @property
+    def label(self) -> str:
+        return _LABELS[self]
+
+    @property
+    def group(self) -> str:
+        """Letter of the level without the modifier: ``"E"``, ``"D"`` or ``"C"``."""
+
+        return _LABELS[self][0]
+
+    def shifted(self, steps: int) -> Level:
+        """Return the level ``steps`` positions away, stopping at E- and C+."""
+
+        return Level(min(max(self + steps, Level.E_MINUS), Level.C_PLUS))
+
+    @classmethod
+    def parse(cls, value: Union[str, int]) -> Level:
+        """Return the level for a label like ``"D+"`` or a stored integer code."""
+
+        if isinstance(value, str):
+            try:
+                return _BY_LABEL[value]
+            except KeyError:
+                raise ValueError(f"Unknown padel level: {value!r}") from None
+        return cls(value)
+
+    def __str__(self) -> str:
+        return _LABELS[self]
+
+
+_LABELS: dict[Level, str] = {
+    level: level.name.replace("_MINUS", "-").replace("_PLUS", "+") for level in Level
+}
+_BY_LABEL: dict[str, Level] = {label: level for level, label in _LABELS.items()}
@@ -1,6 +1,10 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Dict, Iterable, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class QuestionnaireFlowError(ValueError):
+    """The questions do not form a valid questionnaire."""
 
 
 # ---------- MODELS ----------
@@ -15,44 +19,189 @@ class AnswerOption:
 
 @dataclass(frozen=True)
 class Question:
-    """A questionnaire question with predefined answer options."""
+    """A questionnaire question with predefined answer options.
+
+    Options are indexed by id and by button text on construction; the
+    ordinal of an option is its position in ``options``. The hash is
+    computed once as well, so questions are cheap dictionary keys.
+    """
     id: str
     text: str
     options: Tuple[AnswerOption, ...]
+    _by_id: Dict[str, int] = field(init=False, repr=False, compare=False)
+    _by_text: Dict[str, int] = field(init=False, repr=False, compare=False)
+    _hash: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # On duplicates the first option wins; QuestionnaireFlow rejects them.
+        by_id: Dict[str, int] = {}
+        by_text: Dict[str, int] = {}
+        for ordinal, option in enumerate(self.options):
+            by_id.setdefault(option.id, ordinal)
+            by_text.setdefault(option.text, ordinal)
+        object.__setattr__(self, "_by_id", by_id)
+        object.__setattr__(self, "_by_text", by_text)
+        object.__setattr__(self, "_hash", hash((self.id, self.text, self.options)))
+
+    def __hash__(self) -> int:
+        return self._hash
 
     def get_option(self, option_id: str) -> AnswerOption:
-        for option in self.options:
-            if option.id == option_id:
-                return option
-        raise KeyError(f"Option {option_id!r} is not defined for question {self.id!r}")
+        try:
+            return self.options[self._by_id[option_id]]
+        except KeyError:
+            raise KeyError(
+                f"Option {option_id!r} is not defined for question {self.id!r}"
+            ) from None
+
+    def find_option_by_text(self, text: str) -> Optional[AnswerOption]:
+        """Return the option whose button text is ``text``, if any."""
+
+        ordinal = self._by_text.get(text)
+        return self.options[ordinal] if ordinal is not None else None
+
+    def option_ordinal(self, option_id: str) -> int:
+        """Return the position of the option in ``options``."""
+
+        try:
+            return self._by_id[option_id]
+        except KeyError:
+            raise KeyError(
+                f"Option {option_id!r} is not defined for question {self.id!r}"
+            ) from None
 
 
 # ---------- FLOW ----------
 
 class QuestionnaireFlow:
-    """Stores questionnaire structure and navigation helpers."""
+    """Stores questionnaire structure and navigation helpers.
+
+    The graph is checked when the flow is built: every question must be
+    reachable from the first one, every ``next_question_id`` must exist, no
+    path may loop, and option ids and button texts must be unique within a
+    question. All problems are reported together in one
+    :class:`QuestionnaireFlowError`.
+    """
 
     def __init__(self, questions: Iterable[Question], first_question_id: str) -> None:
+        questions = tuple(questions)
         self._questions: Dict[str, Question] = {q.id: q for q in questions}
         if first_question_id not in self._questions:
-            raise ValueError("First question id must exist in the questionnaire")
+            raise QuestionnaireFlowError("First question id must exist in the questionnaire")
         self._first_question_id = first_question_id
+        self._ordinals: Dict[str, int] = {q.id: ordinal for ordinal, q in enumerate(questions)}
+
+        problems = _check_questions(questions)
+        problems.extend(self._check_references())
+        if not problems:
+            problems.extend(self._check_graph())
+        if problems:
+            raise QuestionnaireFlowError(
+                "Invalid questionnaire flow:\n" + "\n".join(f"- {p}" for p in problems)
+            )
+        self._max_path_length = self._longest_path(first_question_id, {})
 
     @property
     def first_question_id(self) -> str:
         return self._first_question_id
 
+    @property
+    def question_ids(self) -> Tuple[str, ...]:
+        """Question ids in ordinal order."""
+
+        return tuple(self._questions)
+
+    @property
+    def max_path_length(self) -> int:
+        """Largest number of questions a user can be asked in one pass."""
+
+        return self._max_path_length
+
     def get_question(self, question_id: str) -> Question:
         try:
             return self._questions[question_id]
         except KeyError as exc:
             raise KeyError(f"Question {question_id!r} is not registered in the flow") from exc
 
+    def question_ordinal(self, question_id: str) -> int:
+        """Return the position of the question in the flow definition."""
+
+        try:
+            return self._ordinals[question_id]
+        except KeyError as exc:
+            raise KeyError(f"Question {question_id!r} is not registered in the flow") from exc
+
     def resolve_next(self, current_question_id: str, option_id: str) -> Optional[str]:
         question = self.get_question(current_question_id)
         option = question.get_option(option_id)
         return option.next_question_id
 
+    def _check_references(self) -> List[str]:
+        return [
+            f"{question.id}/{option.id} leads to unknown question {option.next_question_id!r}"
+            for question in self._questions.values()
+            for option in question.options
+            if option.next_question_id is not None
+            and option.next_question_id not in self._questions
+        ]
+
+    def _check_graph(self) -> List[str]:
+        """Find cycles and questions that cannot be reached from the first one."""
+
+        problems: List[str] = []
+        visiting: List[str] = []
+        done: Set[str] = set()
+
+        def visit(question_id: str) -> None:
+            if question_id in done:
+                return
+            if question_id in visiting:
+                cycle = visiting[visiting.index(question_id):] + [question_id]
+                problems.append("cycle " + " -> ".join(cycle))
+                return
+            visiting.append(question_id)
+            for option in self._questions[question_id].options:
+                if option.next_question_id is not None:
+                    visit(option.next_question_id)
+            visiting.pop()
+            done.add(question_id)
+
+        visit(self._first_question_id)
+        problems.extend(
+            f"{question_id} is unreachable from {self._first_question_id}"
+            for question_id in self._questions
+            if question_id not in done
+        )
+        return problems
+
+    def _longest_path(self, question_id: str, lengths: Dict[str, int]) -> int:
+        if question_id not in lengths:
+            lengths[question_id] = 1 + max(
+                (
+                    self._longest_path(option.next_question_id, lengths)
+                    for option in self._questions[question_id].options
+                    if option.next_question_id is not None
+                ),
+                default=0,
+            )
+        return lengths[question_id]
+
+
+def _check_questions(questions: Tuple[Question, ...]) -> List[str]:
+    problems: List[str] = []
+    seen_questions: Set[str] = set()
+    for question in questions:
+        if question.id in seen_questions:
+            problems.append(f"question id {question.id!r} is used twice")
+        seen_questions.add(question.id)
+        if not question.options:
+            problems.append(f"{question.id} has no options")
+        if len(question._by_id) != len(question.options):
+            problems.append(f"{question.id} has duplicate option ids")
+        if len(question._by_text) != len(question.options):
+            problems.append(f"{question.id} has duplicate button texts")
+    return problems
+
 
 # ---------- DEFAULT FLOW ----------
 
@@ -164,18 +313,6 @@ def build_default_flow() -> QuestionnaireFlow:
         ),
     )
 
-    q1_2 = Question(
-        id="q1.2",
-        text="Какой опыт игры в этот вид?"
-        ,
-        options=(
-            AnswerOption("hours_10", "10", "q2"),
-            AnswerOption("hours_100", "100", "q2"),
-            AnswerOption("hours_500", "500", "q2"),
-            AnswerOption("hours_1000", "1000", "q2"),
-        ),
-    )
-
     q1_sports = Question(
         id="q1.sports",
         text=f"Вопрос 1️⃣.1️⃣ \ 6️⃣:\n\n"
@@ -205,7 +342,7 @@ def build_default_flow() -> QuestionnaireFlow:
     )
 
     return QuestionnaireFlow(
-        questions=(q1, q1_sports, q1_1, q1_2, q2, q3, q4, q5, q6),
+        questions=(q1, q1_sports, q1_1, q2, q3, q4, q5, q6),
         first_question_id="q1",
     )
 
@@ -0,0 +1,245 @@
+"""Precomputed final ratings for every reachable combination of levels.
+
+``rate_player`` only looks at the experience level and the four skill levels,
+and each of those comes from a short fixed list, so all 26 244 outcomes are
+computed once and kept in two flat arrays. A lookup is a mixed-radix index
+computation instead of a run of the scoring arithmetic.
+
+The table records the version and checksum of the scoring rules it was built
+from and is replaced together with them when the rules are reloaded.
+``python -m padel_wizard_bot.services.rating_table [--full]`` checks the
+checksum and compares the table with the reference implementation, entry by
+entry or for every possible questionnaire path.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from array import array
+from dataclasses import dataclass
+from itertools import product
+from typing import Iterable, Optional, Sequence
+
+from padel_wizard_bot.services.experience import PlayerExperience
+from padel_wizard_bot.services.final_rating import LEVEL_ORDER, FinalRating, rate_player
+from padel_wizard_bot.services.levels import Level
+from padel_wizard_bot.services.scoring_engine import SkillRatings
+from padel_wizard_bot.services.scoring_rules import ScoringRules, get_scoring_rules
+
+_NO_RATING = 255
+_SKILL_QUESTIONS = ("q3", "q4", "q5", "q6")
+
+
+@dataclass(frozen=True)
+class RatingTable:
+    """Final level code and score for each (experience, q3..q6) level tuple."""
+
+    rules_version: int
+    checksum: str
+    experience_levels: dict[Level, int]
+    skill_levels: tuple[dict[Level, int], ...]
+    levels: array
+    scores: array
+
+    def lookup(
+        self, experience_level: Level, skill_ratings: SkillRatings
+    ) -> Optional[FinalRating]:
+        """Return the same result as ``rate_player`` for these levels."""
+
+        index = self._index(
+            experience_level,
+            (
+                skill_ratings.reliability,
+                skill_ratings.net_play,
+                skill_ratings.glass_play,
+                skill_ratings.strokes,
+            ),
+        )
+        if index is None:
+            return _reference_rating(experience_level, skill_ratings)
+        level = self.levels[index]
+        if level == _NO_RATING:
+            return None
+        return FinalRating(
+            level=Level(level),
+            score=self.scores[index],
+            experience_level=experience_level,
+            skill_levels=skill_ratings,
+        )
+
+    def _index(
+        self, experience_level: Level, skills: Sequence[Optional[Level]]
+    ) -> Optional[int]:
+        index = self.experience_levels.get(experience_level)
+        if index is None:
+            return None
+        for axis, level in zip(self.skill_levels, skills):
+            position = axis.get(level) if level is not None else None
+            if position is None:
+                return None
+            index = index * len(axis) + position
+        return index
+
+
+def build_rating_table(rules: Optional[ScoringRules] = None) -> RatingTable:
+    """Evaluate ``rate_player`` for every combination of reachable levels."""
+
+    rules = rules or get_scoring_rules()
+    experience_levels = _positions(LEVEL_ORDER)
+    skill_levels = tuple(
+        _positions(rules.skill_features[question_id][1].values())
+        for question_id in _SKILL_QUESTIONS
+    )
+    levels = array("B")
+    scores = array("d")
+    for experience_level, *skills in product(experience_levels, *skill_levels):
+        rating = _reference_rating(experience_level, SkillRatings(*skills), rules)
+        if rating is None:
+            levels.append(_NO_RATING)
+            scores.append(0.0)
+        else:
+            levels.append(rating.level)
+            scores.append(rating.score)
+    return RatingTable(
+        rules_version=rules.version,
+        checksum=rules.checksum,
+        experience_levels=experience_levels,
+        skill_levels=skill_levels,
+        levels=levels,
+        scores=scores,
+    )
+
+
+_table: Optional[RatingTable] = None
+
+
+def get_rating_table() -> RatingTable:
+    """Return the shared table, building it on first use."""
+
+    global _table
+    if _table is None:
+        _table = build_rating_table()
+    return _table
+
+
+def install_rating_table(table: RatingTable) -> None:
+    """Make ``table`` the shared table; see ``install_scoring_rules``."""
+
+    global _table
+    _table = table
+
+
+def invalidate_rating_table() -> None:
+    """Drop the shared table so the next lookup rebuilds it."""
+
+    global _table
+    _table = None
+
+
+def verify_rating_table(
+    table: Optional[RatingTable] = None, *, full: bool = False
+) -> list[str]:
+    """Compare the table with the reference scoring and return the mismatches.
+
+    Checks the rules checksum and every table entry against ``rate_player``. With
+    ``full`` it also walks every answer combination of the default flow
+    (about 1.4 million) and compares ``calculate_final_rating`` with the
+    table-backed :class:`ScoringState`, which takes a while.
+    """
+
+    table = table if table is not None else get_rating_table()
+    problems: list[str] = []
+    if table.checksum != get_scoring_rules().checksum:
+        problems.append("checksum does not match the current scoring rules")
+
+    for experience_level, *skills in product(table.experience_levels, *table.skill_levels):
+        skill_ratings = SkillRatings(*skills)
+        expected = _reference_rating(experience_level, skill_ratings)
+        actual = table.lookup(experience_level, skill_ratings)
+        if actual != expected:
+            problems.append(
+                f"{experience_level} {skill_ratings}: expected {expected}, got {actual}"
+            )
+    if full:
+        problems.extend(_verify_paths(table))
+    return problems
+
+
+def _verify_paths(table: RatingTable) -> list[str]:
+    from padel_wizard_bot.services.final_rating import calculate_final_rating
+    from padel_wizard_bot.services.questionnaire_flow import DEFAULT_FLOW
+    from padel_wizard_bot.services.scoring_state import ScoringState
+
+    problems: list[str] = []
+
+    def walk(
+        question_id: Optional[str],
+        answers: list[dict[str, str]],
+        state: ScoringState,
+    ) -> None:
+        if question_id is None:
+            expected = calculate_final_rating(answers)
+            experience = state.experience()
+            actual = (
+                table.lookup(experience.level, state.skill_ratings)
+                if experience is not None
+                else None
+            )
+            if actual != expected:
+                problems.append(f"{answers}: expected {expected}, got {actual}")
+            return
+        question = DEFAULT_FLOW.get_question(question_id)
+        for option in question.options:
+            answers.append({"question_id": question.id, "option_id": option.id})
+            walk(option.next_question_id, answers, state.apply(question.id, option.id))
+            answers.pop()
+
+    walk(DEFAULT_FLOW.first_question_id, [], ScoringState())
+    return problems
+
+
+def _positions(levels: Iterable[Level]) -> dict[Level, int]:
+    return {level: position for position, level in enumerate(dict.fromkeys(levels))}
+
+
+def _reference_rating(
+    experience_level: Level,
+    skill_ratings: SkillRatings,
+    rules: Optional[ScoringRules] = None,
+) -> Optional[FinalRating]:
+    experience = PlayerExperience(
+        q1_months=0.0,
+        q2_months=0.0,
+        total_months=0.0,
+        level=experience_level,
+        primary_racket_sport=None,
+    )
+    return rate_player(experience, skill_ratings, rules)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Check the precomputed rating table against the reference scoring."
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="also replay every questionnaire path through the reference scoring",
+    )
+    args = parser.parse_args()
+    table = get_rating_table()
+    print(
+        f"Rating table: {len(table.levels)} entries, "
+        f"rules version {table.rules_version}, checksum {table.checksum}"
+    )
+    problems = verify_rating_table(table, full=args.full)
+    for problem in problems[:20]:
+        print(problem)
+    if problems:
+        print(f"{len(problems)} mismatches")
+        sys.exit(1)
+    print("The rating table matches the reference implementation")
+
+
+if __name__ == "__main__":
+    main()
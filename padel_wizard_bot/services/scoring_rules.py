@@ -0,0 +1,321 @@
+"""Scoring rules loaded from the versioned ``scoring_rules.json`` file.
+
+Every constant the experience and final rating calculations use — level
+scores and descriptions, experience multipliers, option months, racket sport
+coefficients, experience thresholds and the level of each skill option —
+lives in one JSON document with an integer ``version``. It is validated
+against the questionnaire flow and compiled into the lookup tables of
+:class:`ScoringRules` once per load.
+
+The running bot re-reads the file on ``SIGHUP`` or the ``/reload_rules``
+admin command through :func:`reload_scoring_rules`. A changed file must
+carry a new version, and every finished session records the version it was
+scored with. ``python -m padel_wizard_bot.services.scoring_rules [PATH]``
+checks a file, including its level list against the level draft it cites as
+``source``, before it is deployed.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import sys
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+from padel_wizard_bot.services.levels import Level
+from padel_wizard_bot.services.questionnaire_flow import DEFAULT_FLOW
+
+if TYPE_CHECKING:
+    from padel_wizard_bot.services.rating_table import RatingTable
+
+DEFAULT_RULES_PATH = Path(__file__).with_name("scoring_rules.json")
+_PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# Rules sections keyed by option id and the flow question they describe.
+_EXPERIENCE_QUESTIONS: dict[str, str] = {
+    "q1_1_months": "q1.1",
+    "q2_months": "q2",
+    "racket_sports": "q1.sports",
+}
+_SKILL_ATTRIBUTES: tuple[str, ...] = ("reliability", "net_play", "glass_play", "strokes")
+
+
+class ScoringRulesError(ValueError):
+    """The rules file is missing, malformed or inconsistent with the flow."""
+
+
+@dataclass(frozen=True)
+class ScoringRules:
+    """Compiled scoring rules; treat every mapping as read-only."""
+
+    version: int
+    checksum: str
+    source: Optional[str]
+    level_names: dict[Level, str]
+    level_descriptions: dict[Level, str]
+    level_scores: dict[Level, float]
+    experience_multipliers: dict[Level, float]
+    clamp_steps: int
+    q1_option_months: dict[str, float]
+    q2_option_months: dict[str, float]
+    racket_sport_names: dict[str, str]
+    racket_sport_coefficients: dict[str, float]
+    experience_thresholds: tuple[tuple[float, Level], ...]
+    top_experience_level: Level
+    # question id -> (SkillRatings attribute, {option id: level})
+    skill_features: dict[str, tuple[str, dict[str, Level]]]
+    _threshold_bounds: tuple[float, ...] = field(init=False, repr=False, compare=False)
+    _threshold_levels: tuple[Level, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(
+            self,
+            "_threshold_bounds",
+            tuple(bound for bound, _ in self.experience_thresholds),
+        )
+        object.__setattr__(
+            self,
+            "_threshold_levels",
+            tuple(level for _, level in self.experience_thresholds)
+            + (self.top_experience_level,),
+        )
+
+    def experience_level(self, total_months: float) -> Level:
+        """Map total months of experience to a level with a binary search."""
+
+        return self._threshold_levels[bisect_right(self._threshold_bounds, total_months)]
+
+
+def parse_scoring_rules(document: Any, *, checksum: str = "") -> ScoringRules:
+    """Validate a decoded rules document and compile it."""
+
+    try:
+        return _compile(document, checksum)
+    except ScoringRulesError:
+        raise
+    except (KeyError, TypeError, ValueError, AttributeError) as exc:
+        raise ScoringRulesError(f"Malformed scoring rules: {exc!r}") from exc
+
+
+def load_scoring_rules(path: Path = DEFAULT_RULES_PATH) -> ScoringRules:
+    """Read, validate and compile a rules file."""
+
+    try:
+        raw = path.read_bytes()
+        document = json.loads(raw)
+    except (OSError, ValueError) as exc:
+        raise ScoringRulesError(f"Cannot read scoring rules {path}: {exc}") from exc
+    return parse_scoring_rules(document, checksum=hashlib.sha256(raw).hexdigest())
+
+
+_rules: Optional[ScoringRules] = None
+
+
+def get_scoring_rules() -> ScoringRules:
+    """Return the rules in effect, loading the default file on first use."""
+
+    global _rules
+    if _rules is None:
+        _rules = load_scoring_rules()
+    return _rules
+
+
+def prepare_scoring_rules(
+    path: Path = DEFAULT_RULES_PATH,
+) -> tuple[ScoringRules, RatingTable]:
+    """Load a rules file and build its rating table without installing either.
+
+    Raises :class:`ScoringRulesError` when the file is invalid or its content
+    changed while the version stayed the same.
+    """
+
+    from padel_wizard_bot.services.rating_table import build_rating_table
+
+    rules = load_scoring_rules(path)
+    current = _rules
+    if (
+        current is not None
+        and rules.version == current.version
+        and rules.checksum != current.checksum
+    ):
+        raise ScoringRulesError(
+            f"Scoring rules changed but still have version {rules.version}; "
+            "bump the version"
+        )
+    return rules, build_rating_table(rules)
+
+
+def install_scoring_rules(rules: ScoringRules, table: RatingTable) -> None:
+    """Switch to ``rules`` and the rating table built from them in one step."""
+
+    from padel_wizard_bot.services.rating_table import install_rating_table
+
+    global _rules
+    _rules = rules
+    install_rating_table(table)
+
+
+async def reload_scoring_rules(path: Path = DEFAULT_RULES_PATH) -> ScoringRules:
+    """Re-read the rules file without blocking the event loop.
+
+    Parsing and the rating table build run in a worker thread; the results
+    are installed on the loop thread, so a handler sees either the old rules
+    and table or the new ones. On error the current rules stay in effect.
+    """
+
+    rules, table = await asyncio.to_thread(prepare_scoring_rules, path)
+    install_scoring_rules(rules, table)
+    return rules
+
+
+def check_against_source(rules: ScoringRules) -> list[str]:
+    """Compare the level list with the level draft the rules cite as ``source``."""
+
+    if rules.source is None:
+        return []
+    path = _PROJECT_ROOT / rules.source
+    try:
+        with path.open(encoding="utf-8", newline="") as handle:
+            rows = list(csv.reader(handle))
+    except OSError as exc:
+        return [f"cannot read {rules.source}: {exc}"]
+
+    draft: dict[str, str] = {}
+    for row in rows[1:]:
+        label, _, name = row[0].partition(" ") if row else ("", "", "")
+        if label:
+            try:
+                draft[str(Level.parse(label))] = name.strip()
+            except ValueError:
+                continue
+    problems = []
+    for level in Level:
+        expected = draft.get(str(level))
+        if expected is None:
+            problems.append(f"{level} is missing from {rules.source}")
+        elif expected != rules.level_names[level]:
+            problems.append(
+                f"{level} is called {rules.level_names[level]!r} here "
+                f"but {expected!r} in {rules.source}"
+            )
+    return problems
+
+
+def _compile(document: dict[str, Any], checksum: str) -> ScoringRules:
+    version = document["version"]
+    if not isinstance(version, int) or isinstance(version, bool) or version < 1:
+        raise ScoringRulesError("version must be a positive integer")
+
+    levels = document["levels"]
+    unknown = set(levels) - {str(level) for level in Level}
+    if unknown:
+        raise ScoringRulesError(f"Unknown levels: {sorted(unknown)}")
+    # Level order matters: the nearest-score search keeps the first of two
+    # equally close levels.
+    entries = {level: levels[str(level)] for level in Level}
+
+    experience = document["experience"]
+    for section, question_id in _EXPERIENCE_QUESTIONS.items():
+        _check_options(section, experience[section], question_id)
+    racket_sports = experience["racket_sports"]
+
+    thresholds = tuple(
+        (float(bound), Level.parse(label)) for bound, label in experience["thresholds"]
+    )
+    bounds = [bound for bound, _ in thresholds]
+    if bounds != sorted(bounds):
+        raise ScoringRulesError("experience thresholds must be in ascending order")
+
+    skill_features: dict[str, tuple[str, dict[str, Level]]] = {}
+    for question_id, skill in document["skills"].items():
+        _check_options(f"skills.{question_id}", skill["levels"], question_id)
+        attribute = skill["attribute"]
+        if attribute not in _SKILL_ATTRIBUTES:
+            raise ScoringRulesError(f"Unknown skill attribute {attribute!r}")
+        skill_features[question_id] = (
+            attribute,
+            {option: Level.parse(label) for option, label in skill["levels"].items()},
+        )
+    attributes = sorted(attribute for attribute, _ in skill_features.values())
+    if attributes != sorted(_SKILL_ATTRIBUTES):
+        raise ScoringRulesError(
+            f"skills must rate each of {', '.join(_SKILL_ATTRIBUTES)} exactly once"
+        )
+
+    clamp_steps = document["clamp_steps"]
+    if not isinstance(clamp_steps, int) or clamp_steps < 0:
+        raise ScoringRulesError("clamp_steps must be a non-negative integer")
+
+    return ScoringRules(
+        version=version,
+        checksum=checksum,
+        source=document.get("source"),
+        level_names={level: str(entry["name"]) for level, entry in entries.items()},
+        level_descriptions={
+            level: str(entry["description"]) for level, entry in entries.items()
+        },
+        level_scores={level: float(entry["score"]) for level, entry in entries.items()},
+        experience_multipliers={
+            level: float(entry["experience_multiplier"]) for level, entry in entries.items()
+        },
+        clamp_steps=clamp_steps,
+        q1_option_months={
+            option: float(months) for option, months in experience["q1_1_months"].items()
+        },
+        q2_option_months={
+            option: float(months) for option, months in experience["q2_months"].items()
+        },
+        racket_sport_names={
+            option: str(sport["name"]) for option, sport in racket_sports.items()
+        },
+        racket_sport_coefficients={
+            str(sport["name"]): float(sport["coefficient"])
+            for sport in racket_sports.values()
+        },
+        experience_thresholds=thresholds,
+        top_experience_level=Level.parse(experience["top_level"]),
+        skill_features=skill_features,
+    )
+
+
+def _check_options(section: str, options: dict[str, Any], question_id: str) -> None:
+    """Require exactly one entry per option of the flow question."""
+
+    try:
+        question = DEFAULT_FLOW.get_question(question_id)
+    except KeyError:
+        raise ScoringRulesError(f"{section}: no question {question_id!r} in the flow") from None
+    expected = {option.id for option in question.options}
+    if set(options) != expected:
+        missing = sorted(expected - set(options))
+        extra = sorted(set(options) - expected)
+        raise ScoringRulesError(
+            f"{section} does not match the options of {question_id}: "
+            f"missing {missing}, unknown {extra}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Validate a scoring rules file.")
+    parser.add_argument("path", nargs="?", type=Path, default=DEFAULT_RULES_PATH)
+    args = parser.parse_args()
+    try:
+        rules = load_scoring_rules(args.path)
+    except ScoringRulesError as exc:
+        print(exc)
+        sys.exit(1)
+    print(f"Scoring rules version {rules.version}, checksum {rules.checksum[:12]}")
+    problems = check_against_source(rules)
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
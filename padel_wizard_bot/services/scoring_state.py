@@ -0,0 +1,164 @@
+"""Running scoring state updated one answer at a time."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field, replace
+from typing import Any, Iterable, Mapping, Optional
+
+from padel_wizard_bot.services.experience import (
+    PlayerExperience,
+    build_player_experience,
+)
+from padel_wizard_bot.services.final_rating import (
+    FinalRating,
+    calculate_interim_score,
+    rate_player,
+)
+from padel_wizard_bot.services.levels import Level
+from padel_wizard_bot.services.rating_table import get_rating_table
+from padel_wizard_bot.services.scoring_engine import SkillRatings
+from padel_wizard_bot.services.scoring_rules import ScoringRules, get_scoring_rules
+
+_SKILL_FIELDS: tuple[str, ...] = ("reliability", "net_play", "glass_play", "strokes")
+
+
+@dataclass(frozen=True)
+class _Resolved:
+    """Months and levels the answers stand for under one set of rules."""
+
+    q1_months: float
+    q2_months: Optional[float]
+    primary_racket_sport: Optional[str]
+    skill_ratings: SkillRatings
+
+
+@dataclass(frozen=True)
+class ScoringState:
+    """Everything the scoring code needs from the answers given so far.
+
+    The FSM keeps the option id of each answered question instead of the
+    growing answers list, and the months and levels behind them are looked
+    up only when a result is asked for. A session is therefore scored
+    entirely by the rules passed in at that point, even if the rules were
+    reloaded while it was running. The results match
+    ``calculate_player_experience`` and ``calculate_final_rating`` run on the
+    full list.
+    """
+
+    # question id -> option id, in the order the questions were answered.
+    options: Mapping[str, str] = field(default_factory=dict)
+    answered: int = 0
+
+    @classmethod
+    def from_answers(cls, answers: Iterable[dict[str, Any]]) -> ScoringState:
+        state = cls()
+        for answer in answers:
+            state = state.apply(str(answer.get("question_id")), str(answer.get("option_id")))
+        return state
+
+    @staticmethod
+    def is_restorable(data: dict[str, Any]) -> bool:
+        """Tell whether :meth:`from_dict` can restore ``data``.
+
+        Older versions saved the months and levels instead of option ids;
+        such states have to be rebuilt from the answers with
+        :meth:`from_answers`.
+        """
+
+        return "options" in data
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict[str, Any]]) -> ScoringState:
+        """Restore a state saved with :meth:`to_dict`; ``None`` gives a new one."""
+
+        if not data:
+            return cls()
+        return cls(options=dict(data["options"]), answered=data.get("answered", 0))
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the JSON-ready form kept in the FSM data."""
+
+        return {"answered": self.answered, "options": dict(self.options)}
+
+    def apply(self, question_id: str, option_id: str) -> ScoringState:
+        """Return the state after one more answer."""
+
+        return replace(
+            self,
+            options={**self.options, question_id: option_id},
+            answered=self.answered + 1,
+        )
+
+    def _resolve(self, rules: ScoringRules) -> _Resolved:
+        q1_months = 0.0
+        q2_months: Optional[float] = None
+        primary_racket_sport: Optional[str] = None
+        skills: dict[str, Optional[Level]] = {}
+        for question_id, option_id in self.options.items():
+            if option_id in rules.q1_option_months:
+                q1_months = rules.q1_option_months[option_id]
+            elif option_id in rules.q2_option_months:
+                q2_months = rules.q2_option_months[option_id]
+            elif option_id in rules.racket_sport_names:
+                primary_racket_sport = rules.racket_sport_names[option_id]
+
+            feature = rules.skill_features.get(question_id)
+            if feature is not None:
+                attribute_name, option_levels = feature
+                skills[attribute_name] = option_levels.get(option_id)
+        return _Resolved(
+            q1_months,
+            q2_months,
+            primary_racket_sport,
+            SkillRatings(*(skills.get(name) for name in _SKILL_FIELDS)),
+        )
+
+    @staticmethod
+    def _experience(resolved: _Resolved, rules: ScoringRules) -> Optional[PlayerExperience]:
+        if resolved.q2_months is None:
+            return None
+        return build_player_experience(
+            resolved.q1_months, resolved.q2_months, resolved.primary_racket_sport, rules
+        )
+
+    @property
+    def skill_ratings(self) -> SkillRatings:
+        """Skill levels under the rules in effect."""
+
+        return self._resolve(get_scoring_rules()).skill_ratings
+
+    def experience(
+        self, rules: Optional[ScoringRules] = None
+    ) -> Optional[PlayerExperience]:
+        """Return the player experience once q2 has been answered."""
+
+        rules = rules or get_scoring_rules()
+        return self._experience(self._resolve(rules), rules)
+
+    def final_rating(
+        self, rules: Optional[ScoringRules] = None
+    ) -> Optional[FinalRating]:
+        """Return the final rating once every skill question has been answered.
+
+        The shared rating table answers when it was built from ``rules``;
+        otherwise the rating is computed directly.
+        """
+
+        rules = rules or get_scoring_rules()
+        resolved = self._resolve(rules)
+        experience = self._experience(resolved, rules)
+        if experience is None:
+            return None
+        table = get_rating_table()
+        if table.checksum != rules.checksum:
+            return rate_player(experience, resolved.skill_ratings, rules)
+        return table.lookup(experience.level, resolved.skill_ratings)
+
+    def interim_rating(self, rules: Optional[ScoringRules] = None) -> Optional[float]:
+        """Return the rating implied by the answers so far, if experience is known."""
+
+        rules = rules or get_scoring_rules()
+        resolved = self._resolve(rules)
+        experience = self._experience(resolved, rules)
+        if experience is None:
+            return None
+        return calculate_interim_score(experience, resolved.skill_ratings, rules)
@@ -1,10 +1,17 @@
 """Storage package initialization and exports."""
-from .db import initialize_database, get_database_path
+from .backends import MemoryBackend, SQLiteBackend, StorageBackend
+from .db import initialize_database, get_database_path, parse_database_url
+from .engine import SQLiteEngine
 from .repo import StorageRepository, repository
 
 __all__ = [
     "initialize_database",
     "get_database_path",
+    "parse_database_url",
+    "MemoryBackend",
+    "SQLiteBackend",
+    "StorageBackend",
+    "SQLiteEngine",
     "StorageRepository",
     "repository",
 ]
@@ -0,0 +1,213 @@
+"""Incrementally maintained summary tables for questionnaire analytics.
+
+The repository updates these tables in the same transaction as the session
+writes they describe, so dashboards read a handful of pre-aggregated rows
+instead of scanning ``sessions`` and ``session_answers``.
+"""
+from __future__ import annotations
+
+import sqlite3
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from padel_wizard_bot.services.levels import Level
+
+
+@dataclass(frozen=True)
+class SessionOutcome:
+    """The parts of a session row that the summaries depend on."""
+
+    finished: bool
+    finished_at: Optional[str]
+    final_level: Optional[int]
+
+
+@dataclass(frozen=True)
+class AnalyticsSummary:
+    """Snapshot of all summary tables."""
+
+    users_completed: int
+    daily_completions: list[tuple[str, int]]
+    final_levels: dict[int, int]
+    question_reach: dict[str, int]
+
+
+def fetch_session_outcome(
+    connection: sqlite3.Connection, session_id: int
+) -> Optional[SessionOutcome]:
+    row = connection.execute(
+        "SELECT finished, finished_at, final_level FROM sessions WHERE id = ?",
+        (session_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    return SessionOutcome(
+        finished=bool(row[0]), finished_at=row[1], final_level=row[2]
+    )
+
+
+def apply_session_outcome(
+    connection: sqlite3.Connection,
+    previous: Optional[SessionOutcome],
+    current: Optional[SessionOutcome],
+) -> None:
+    """Move a session's contribution from ``previous`` to ``current``."""
+
+    if previous == current:
+        return
+    if previous is not None and previous.finished:
+        _bump_completion(connection, previous, -1)
+    if current is not None and current.finished:
+        _bump_completion(connection, current, 1)
+
+
+def record_question_reached(
+    connection: sqlite3.Connection, question_id: str, delta: int = 1
+) -> None:
+    connection.execute(
+        (
+            "INSERT INTO question_reach (question_id, sessions) VALUES (?, ?) "
+            "ON CONFLICT(question_id) DO UPDATE SET sessions = sessions + excluded.sessions"
+        ),
+        (question_id, delta),
+    )
+
+
+def _bump_completion(
+    connection: sqlite3.Connection, outcome: SessionOutcome, delta: int
+) -> None:
+    if outcome.finished_at:
+        connection.execute(
+            (
+                "INSERT INTO daily_completions (day, completions) VALUES (?, ?) "
+                "ON CONFLICT(day) DO UPDATE SET completions = completions + excluded.completions"
+            ),
+            (outcome.finished_at[:10], delta),
+        )
+    if outcome.final_level is not None:
+        connection.execute(
+            (
+                "INSERT INTO final_level_counts (level, sessions) VALUES (?, ?) "
+                "ON CONFLICT(level) DO UPDATE SET sessions = sessions + excluded.sessions"
+            ),
+            (outcome.final_level, delta),
+        )
+
+
+def rebuild_summaries(connection: sqlite3.Connection) -> None:
+    """Recompute every summary table from the live and the archived sessions.
+
+    Sessions moved to ``session_archive`` keep being counted, so a rebuild
+    gives the same totals as the incremental updates did. Their final level
+    and answers only exist in the compressed payload, which is decoded here
+    one row at a time.
+    """
+
+    daily: Counter[str] = Counter()
+    levels: Counter[int] = Counter()
+    reach: Counter[str] = Counter()
+    daily.update(
+        dict(
+            connection.execute(
+                "SELECT substr(finished_at, 1, 10), COUNT(*) FROM sessions "
+                "WHERE finished = 1 AND finished_at IS NOT NULL "
+                "GROUP BY substr(finished_at, 1, 10)"
+            ).fetchall()
+        )
+    )
+    levels.update(
+        dict(
+            connection.execute(
+                "SELECT final_level, COUNT(*) FROM sessions "
+                "WHERE finished = 1 AND final_level IS NOT NULL GROUP BY final_level"
+            ).fetchall()
+        )
+    )
+    reach.update(
+        dict(
+            connection.execute(
+                "SELECT question_id, COUNT(*) FROM session_answers GROUP BY question_id"
+            ).fetchall()
+        )
+    )
+    if _has_table(connection, "session_archive"):
+        _count_archived(connection, daily, levels, reach)
+
+    connection.execute("DELETE FROM daily_completions")
+    connection.executemany(
+        "INSERT INTO daily_completions (day, completions) VALUES (?, ?)",
+        sorted(daily.items()),
+    )
+    connection.execute("DELETE FROM final_level_counts")
+    connection.executemany(
+        "INSERT INTO final_level_counts (level, sessions) VALUES (?, ?)",
+        sorted(levels.items()),
+    )
+    connection.execute("DELETE FROM question_reach")
+    connection.executemany(
+        "INSERT INTO question_reach (question_id, sessions) VALUES (?, ?)",
+        sorted(reach.items()),
+    )
+
+
+def _count_archived(
+    connection: sqlite3.Connection,
+    daily: Counter[str],
+    levels: Counter[int],
+    reach: Counter[str],
+) -> None:
+    from .retention import decode_payload
+
+    for finished, finished_at, payload in connection.execute(
+        "SELECT finished, finished_at, payload FROM session_archive"
+    ):
+        document = decode_payload(payload)
+        for answer in document["answers"]:
+            reach[answer["question_id"]] += 1
+        if not finished:
+            continue
+        if finished_at is not None:
+            daily[finished_at[:10]] += 1
+        final_level = document["session"].get("final_level")
+        if final_level is not None:
+            # Sessions archived before levels were stored as codes carry the
+            # label, e.g. "D+".
+            levels[int(Level.parse(final_level))] += 1
+
+
+def _has_table(connection: sqlite3.Connection, name: str) -> bool:
+    row = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+
+def load_summary(
+    connection: sqlite3.Connection, *, since: Optional[str] = None
+) -> AnalyticsSummary:
+    """Read the summary tables; ``since`` limits daily rows to ``day >= since``."""
+
+    users_completed = connection.execute(
+        "SELECT COUNT(*) FROM users WHERE questionnaire_completed = 1"
+    ).fetchone()[0]
+    daily = connection.execute(
+        (
+            "SELECT day, completions FROM daily_completions "
+            "WHERE day >= ? AND completions != 0 ORDER BY day"
+        ),
+        (since or "",),
+    ).fetchall()
+    levels = connection.execute(
+        "SELECT level, sessions FROM final_level_counts WHERE sessions != 0"
+    ).fetchall()
+    reach = connection.execute(
+        "SELECT question_id, sessions FROM question_reach WHERE sessions != 0"
+    ).fetchall()
+    return AnalyticsSummary(
+        users_completed=int(users_completed),
+        daily_completions=[(str(day), int(count)) for day, count in daily],
+        final_levels={int(level): int(count) for level, count in levels},
+        question_reach={str(question): int(count) for question, count in reach},
+    )
+
@@ -0,0 +1,24 @@
+"""Storage backends selectable through ``settings.db_url``."""
+from __future__ import annotations
+
+from typing import Any
+
+from ..db import MEMORY_BACKEND, DatabaseConfig
+from .base import StorageBackend
+from .memory import MemoryBackend
+from .sqlite import SQLiteBackend
+
+
+def create_backend(config: DatabaseConfig, **options: Any) -> StorageBackend:
+    """Instantiate the backend described by ``config``.
+
+    ``options`` are forwarded to :class:`SQLiteBackend` and ignored by the
+    in-memory dictionary backend.
+    """
+
+    if config.backend == MEMORY_BACKEND:
+        return MemoryBackend()
+    return SQLiteBackend(config.path, **options)
+
+
+__all__ = ["MemoryBackend", "SQLiteBackend", "StorageBackend", "create_backend"]
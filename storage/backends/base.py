@@ -0,0 +1,160 @@
+"""Interface every storage backend implements."""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any, Iterable, Optional
+
+from ..analytics import AnalyticsSummary
+from ..engine import ReaderPoolStats
+from ..models import (
+    ExperienceUpdate,
+    FSMRecord,
+    IdentityCacheStats,
+    PlayerExperienceRecord,
+    SessionRecord,
+    UserRecord,
+)
+
+
+class StorageBackend(ABC):
+    """Persistence operations used by :class:`storage.repo.StorageRepository`."""
+
+    @abstractmethod
+    async def get_or_create_user(
+        self, telegram_id: int, username: Optional[str] = None
+    ) -> UserRecord:
+        """Return an existing user or create a new record if needed."""
+
+    @abstractmethod
+    async def start_session(
+        self,
+        telegram_id: int,
+        username: Optional[str] = None,
+        *,
+        flow_id: Optional[str] = None,
+        flow_version: Optional[int] = None,
+    ) -> SessionRecord:
+        """Create a new questionnaire session for the given Telegram user ID.
+
+        ``flow_id`` and ``flow_version`` record the questionnaire flow the
+        session is pinned to.
+        """
+
+    @abstractmethod
+    async def update_answers(
+        self, session_id: int, answers: Iterable[dict[str, Any]]
+    ) -> None:
+        """Replace all stored answers for the given session."""
+
+    @abstractmethod
+    async def append_answer(
+        self, session_id: int, question_id: str, option_id: str
+    ) -> None:
+        """Append a single answer to the end of the session's answer log."""
+
+    @abstractmethod
+    async def set_interim_rating(self, session_id: int, rating: float) -> None:
+        """Store the latest interim rating value for the session."""
+
+    @abstractmethod
+    async def mark_finished(
+        self,
+        session_id: int,
+        *,
+        finished: bool = True,
+        final_level: Optional[int] = None,
+        rules_version: Optional[int] = None,
+    ) -> None:
+        """Mark the session as finished and optionally store the final level.
+
+        ``rules_version`` is the scoring rules version that produced the level.
+        """
+
+    @abstractmethod
+    async def record_answer(
+        self,
+        session_id: int,
+        question_id: str,
+        option_id: str,
+        *,
+        experience: Optional[ExperienceUpdate] = None,
+        interim_rating: Optional[float] = None,
+        finished: bool = False,
+        final_level: Optional[int] = None,
+        rules_version: Optional[int] = None,
+    ) -> None:
+        """Persist everything produced by one questionnaire answer atomically."""
+
+    @abstractmethod
+    async def set_user_questionnaire_status(
+        self,
+        telegram_id: int,
+        *,
+        completed: bool,
+        final_rating: Optional[int],
+        username: Optional[str] = None,
+    ) -> None:
+        """Update questionnaire completion status and final rating for the user."""
+
+    @abstractmethod
+    async def mark_user_received_advice(
+        self, telegram_id: int, username: Optional[str] = None
+    ) -> None:
+        """Flag that the user has requested advice on the final screen."""
+
+    @abstractmethod
+    async def get_session(self, session_id: int) -> Optional[SessionRecord]:
+        """Fetch a session record by its internal identifier."""
+
+    @abstractmethod
+    async def upsert_player_experience(
+        self,
+        session_id: int,
+        *,
+        q1_months: float,
+        q2_months: float,
+        total_months: float,
+        primary_racket_sport: Optional[str],
+        experience_level: int,
+    ) -> PlayerExperienceRecord:
+        """Insert or update the stored player experience for a session."""
+
+    @abstractmethod
+    async def get_player_experience(
+        self, session_id: int
+    ) -> Optional[PlayerExperienceRecord]:
+        """Fetch stored player experience for a given session if present."""
+
+    @abstractmethod
+    async def get_analytics_summary(
+        self, *, since: Optional[str] = None
+    ) -> AnalyticsSummary:
+        """Return completions per day, final level counts and question reach."""
+
+    @abstractmethod
+    async def load_fsm_record(self, key: str) -> Optional[FSMRecord]:
+        """Return the persisted FSM state and data for ``key`` if any."""
+
+    @abstractmethod
+    async def save_fsm_record(self, key: str, record: FSMRecord) -> None:
+        """Insert or replace the persisted FSM state and data for ``key``."""
+
+    @abstractmethod
+    async def delete_fsm_record(self, key: str) -> None:
+        """Forget the persisted FSM state and data for ``key``."""
+
+    async def flush(self) -> None:
+        """Wait until all pending writes are durable."""
+
+    async def close(self) -> None:
+        """Flush pending writes and release resources."""
+
+    def identity_cache_stats(self) -> Optional[IdentityCacheStats]:
+        """Return identity cache counters if the backend keeps such a cache."""
+
+        return None
+
+    def reader_pool_stats(self) -> Optional[ReaderPoolStats]:
+        """Return read pool statistics if the backend uses a read pool."""
+
+        return None
@@ -0,0 +1,309 @@
+"""Pure-Python in-memory storage backend for load tests and benchmarks."""
+from __future__ import annotations
+
+import secrets
+from collections import Counter
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import Any, Iterable, Optional
+
+from ..analytics import AnalyticsSummary
+from ..models import (
+    ExperienceUpdate,
+    FSMRecord,
+    PlayerExperienceRecord,
+    SessionRecord,
+    UserRecord,
+)
+from .base import StorageBackend
+
+
+class MemoryBackend(StorageBackend):
+    """Keeps every record in dictionaries; nothing survives the process.
+
+    Operations complete without any I/O or thread hand-off, which makes this
+    backend suitable for measuring handler throughput in isolation. Returned
+    records are copies, so callers cannot mutate the stored state. Levels are
+    stored as plain integer codes, the way SQLite returns them.
+    """
+
+    def __init__(self) -> None:
+        self._users: dict[int, UserRecord] = {}
+        self._users_by_telegram_id: dict[int, int] = {}
+        self._sessions: dict[int, SessionRecord] = {}
+        self._session_numbers: set[int] = set()
+        self._experiences: dict[int, PlayerExperienceRecord] = {}
+        self._fsm_records: dict[str, FSMRecord] = {}
+        self._next_user_id = 1
+        self._next_session_id = 1
+        self._next_experience_id = 1
+
+    async def get_or_create_user(
+        self, telegram_id: int, username: Optional[str] = None
+    ) -> UserRecord:
+        return replace(self._get_or_create_user(telegram_id, username))
+
+    async def start_session(
+        self,
+        telegram_id: int,
+        username: Optional[str] = None,
+        *,
+        flow_id: Optional[str] = None,
+        flow_version: Optional[int] = None,
+    ) -> SessionRecord:
+        user = self._get_or_create_user(telegram_id, username)
+        session_number = secrets.randbelow(10**12)
+        while session_number in self._session_numbers:
+            session_number = secrets.randbelow(10**12)
+        now = _now()
+        session = SessionRecord(
+            id=self._next_session_id,
+            session_number=session_number,
+            user_id=user.id,
+            answers=[],
+            interim_rating=None,
+            finished=False,
+            final_level=None,
+            rules_version=None,
+            flow_id=flow_id,
+            flow_version=flow_version,
+            started_at=now,
+            finished_at=None,
+            updated_at=now,
+        )
+        self._next_session_id += 1
+        self._session_numbers.add(session_number)
+        self._sessions[session.id] = session
+        return replace(session, answers=[])
+
+    async def update_answers(
+        self, session_id: int, answers: Iterable[dict[str, Any]]
+    ) -> None:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+        session.answers = [
+            {
+                "question_id": str(answer.get("question_id")),
+                "option_id": str(answer.get("option_id")),
+            }
+            for answer in answers
+        ]
+        session.updated_at = _now()
+
+    async def append_answer(
+        self, session_id: int, question_id: str, option_id: str
+    ) -> None:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+        session.answers.append({"question_id": question_id, "option_id": option_id})
+        session.updated_at = _now()
+
+    async def set_interim_rating(self, session_id: int, rating: float) -> None:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+        session.interim_rating = rating
+        session.updated_at = _now()
+
+    async def mark_finished(
+        self,
+        session_id: int,
+        *,
+        finished: bool = True,
+        final_level: Optional[int] = None,
+        rules_version: Optional[int] = None,
+    ) -> None:
+        self._mark_finished(session_id, finished, final_level, rules_version, _now())
+
+    async def record_answer(
+        self,
+        session_id: int,
+        question_id: str,
+        option_id: str,
+        *,
+        experience: Optional[ExperienceUpdate] = None,
+        interim_rating: Optional[float] = None,
+        finished: bool = False,
+        final_level: Optional[int] = None,
+        rules_version: Optional[int] = None,
+    ) -> None:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+        timestamp = _now()
+        session.answers.append({"question_id": question_id, "option_id": option_id})
+        session.updated_at = timestamp
+        if experience is not None:
+            self._upsert_experience(session_id, experience, timestamp)
+        if interim_rating is not None:
+            session.interim_rating = interim_rating
+        if finished:
+            self._mark_finished(session_id, True, final_level, rules_version, timestamp)
+            user = self._users[session.user_id]
+            user.questionnaire_completed = True
+            user.final_rating = _level_code(final_level)
+
+    async def set_user_questionnaire_status(
+        self,
+        telegram_id: int,
+        *,
+        completed: bool,
+        final_rating: Optional[int],
+        username: Optional[str] = None,
+    ) -> None:
+        user = self._get_or_create_user(telegram_id, username)
+        user.questionnaire_completed = completed
+        user.final_rating = _level_code(final_rating)
+
+    async def mark_user_received_advice(
+        self, telegram_id: int, username: Optional[str] = None
+    ) -> None:
+        self._get_or_create_user(telegram_id, username).received_advice = True
+
+    async def get_session(self, session_id: int) -> Optional[SessionRecord]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        return replace(session, answers=[dict(answer) for answer in session.answers])
+
+    async def upsert_player_experience(
+        self,
+        session_id: int,
+        *,
+        q1_months: float,
+        q2_months: float,
+        total_months: float,
+        primary_racket_sport: Optional[str],
+        experience_level: int,
+    ) -> PlayerExperienceRecord:
+        experience = ExperienceUpdate(
+            q1_months=q1_months,
+            q2_months=q2_months,
+            total_months=total_months,
+            primary_racket_sport=primary_racket_sport,
+            experience_level=experience_level,
+        )
+        return replace(self._upsert_experience(session_id, experience, _now()))
+
+    async def get_player_experience(
+        self, session_id: int
+    ) -> Optional[PlayerExperienceRecord]:
+        record = self._experiences.get(session_id)
+        return replace(record) if record is not None else None
+
+    async def get_analytics_summary(
+        self, *, since: Optional[str] = None
+    ) -> AnalyticsSummary:
+        daily: Counter[str] = Counter()
+        levels: Counter[int] = Counter()
+        reach: Counter[str] = Counter()
+        for session in self._sessions.values():
+            for answer in session.answers:
+                reach[answer["question_id"]] += 1
+            if not session.finished:
+                continue
+            if session.finished_at:
+                daily[session.finished_at[:10]] += 1
+            if session.final_level is not None:
+                levels[session.final_level] += 1
+        return AnalyticsSummary(
+            users_completed=sum(
+                1 for user in self._users.values() if user.questionnaire_completed
+            ),
+            daily_completions=sorted(
+                (day, count) for day, count in daily.items() if day >= (since or "")
+            ),
+            final_levels=dict(levels),
+            question_reach=dict(reach),
+        )
+
+    async def load_fsm_record(self, key: str) -> Optional[FSMRecord]:
+        return self._fsm_records.get(key)
+
+    async def save_fsm_record(self, key: str, record: FSMRecord) -> None:
+        self._fsm_records[key] = record
+
+    async def delete_fsm_record(self, key: str) -> None:
+        self._fsm_records.pop(key, None)
+
+    def _get_or_create_user(
+        self, telegram_id: int, username: Optional[str]
+    ) -> UserRecord:
+        user_id = self._users_by_telegram_id.get(telegram_id)
+        if user_id is not None:
+            user = self._users[user_id]
+            if username is not None:
+                user.username = username
+            return user
+
+        user = UserRecord(
+            id=self._next_user_id,
+            telegram_id=telegram_id,
+            username=username,
+            questionnaire_completed=False,
+            final_rating=None,
+            received_advice=False,
+            created_at=_now(),
+        )
+        self._next_user_id += 1
+        self._users[user.id] = user
+        self._users_by_telegram_id[telegram_id] = user.id
+        return user
+
+    def _mark_finished(
+        self,
+        session_id: int,
+        finished: bool,
+        final_level: Optional[int],
+        rules_version: Optional[int],
+        timestamp: str,
+    ) -> None:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+        session.finished = finished
+        if final_level is not None:
+            session.final_level = int(final_level)
+        if rules_version is not None:
+            session.rules_version = rules_version
+        session.finished_at = timestamp if finished else None
+        session.updated_at = timestamp
+
+    def _upsert_experience(
+        self, session_id: int, experience: ExperienceUpdate, timestamp: str
+    ) -> PlayerExperienceRecord:
+        record = self._experiences.get(session_id)
+        if record is None:
+            record = PlayerExperienceRecord(
+                id=self._next_experience_id,
+                session_id=session_id,
+                q1_months=experience.q1_months,
+                q2_months=experience.q2_months,
+                total_months=experience.total_months,
+                primary_racket_sport=experience.primary_racket_sport,
+                experience_level=int(experience.experience_level),
+                created_at=timestamp,
+                updated_at=timestamp,
+            )
+            self._next_experience_id += 1
+            self._experiences[session_id] = record
+            return record
+
+        record.q1_months = experience.q1_months
+        record.q2_months = experience.q2_months
+        record.total_months = experience.total_months
+        record.primary_racket_sport = experience.primary_racket_sport
+        record.experience_level = int(experience.experience_level)
+        record.updated_at = timestamp
+        return record
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _level_code(level: Optional[int]) -> Optional[int]:
+    # Callers pass Level members; store the plain code like SQLite does.
+    return int(level) if level is not None else None
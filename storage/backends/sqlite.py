@@ -0,0 +1,810 @@
+"""SQLite implementation of the storage backend."""
+from __future__ import annotations
+
+import json
+import secrets
+import sqlite3
+from collections import OrderedDict
+from dataclasses import replace
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Final, Iterable, Optional
+
+from .. import analytics
+from ..db import initialize_database
+from ..engine import (
+    BATCH_MAX_OPERATIONS,
+    BATCH_WINDOW_SECONDS,
+    READ_POOL_SIZE,
+    SYNCHRONOUS,
+    ReaderPoolStats,
+    SQLiteEngine,
+)
+from ..migrations import migrate
+from ..models import (
+    ExperienceUpdate,
+    FSMRecord,
+    IdentityCacheStats,
+    PlayerExperienceRecord,
+    SessionRecord,
+    UserRecord,
+)
+from .base import StorageBackend
+
+
+USER_CACHE_SIZE: Final[int] = 10_000
+
+_USER_COLUMNS: Final[str] = (
+    "id, telegram_id, username, questionnaire_completed, final_rating, "
+    "received_advice, created_at"
+)
+
+
+class SQLiteBackend(StorageBackend):
+    """Storage backend on top of SQLite, for files as well as ``:memory:``.
+
+    File databases are migrated before first use and served by a
+    :class:`SQLiteEngine` with a group-committing writer and a read-only
+    connection pool. In-memory databases live on the writer connection only,
+    so they are migrated there and every read goes through the writer.
+    """
+
+    def __init__(
+        self,
+        database_path: Optional[Path],
+        *,
+        batch_window: float = BATCH_WINDOW_SECONDS,
+        batch_max_operations: int = BATCH_MAX_OPERATIONS,
+        user_cache_size: int = USER_CACHE_SIZE,
+        read_pool_size: int = READ_POOL_SIZE,
+        synchronous: str = SYNCHRONOUS,
+    ) -> None:
+        if database_path is not None:
+            initialize_database(database_path)
+        self._engine = SQLiteEngine(
+            database_path,
+            batch_window=batch_window,
+            batch_max_operations=batch_max_operations,
+            read_pool_size=read_pool_size if database_path is not None else 0,
+            synchronous=synchronous,
+            initializer=migrate if database_path is None else None,
+        )
+        # telegram_id -> (users.id, username) in least-recently-used order.
+        self._user_identities: OrderedDict[
+            int, tuple[int, Optional[str]]
+        ] = OrderedDict()
+        # telegram_id -> full user row, kept only for users in the identity
+        # map and dropped whenever this backend changes the user's flags.
+        self._user_records: dict[int, UserRecord] = {}
+        self._user_cache_size = user_cache_size
+        self._identity_hits = 0
+        self._identity_misses = 0
+
+    async def _run(self, operation: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Execute a blocking SQLite operation on the persistent writer thread.
+
+        Concurrent calls are group-committed; the returned value is available
+        only once the transaction containing the operation has been committed.
+        """
+
+        return await self._engine.run(operation)
+
+    async def _read(self, operation: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Execute a read-only SQLite operation on the reader pool.
+
+        Reads run concurrently with each other and with the writer, and see
+        every write whose awaitable has already resolved.
+        """
+
+        return await self._engine.read(operation)
+
+    def reader_pool_stats(self) -> Optional[ReaderPoolStats]:
+        """Return checkout wait-time statistics of the read connection pool."""
+
+        return self._engine.reader_stats()
+
+    async def flush(self) -> None:
+        """Wait until all pending writes have been committed."""
+
+        await self._engine.flush()
+
+    async def close(self) -> None:
+        """Complete queued operations and release the database connection."""
+
+        await self._engine.aclose()
+
+    def identity_cache_stats(self) -> IdentityCacheStats:
+        """Return hit/miss counters of the user identity cache."""
+
+        return IdentityCacheStats(
+            hits=self._identity_hits,
+            misses=self._identity_misses,
+            size=len(self._user_identities),
+            capacity=self._user_cache_size,
+        )
+
+    def _lookup_identity(self, telegram_id: int) -> Optional[tuple[int, Optional[str]]]:
+        identity = self._user_identities.get(telegram_id)
+        if identity is None:
+            self._identity_misses += 1
+            return None
+        self._identity_hits += 1
+        self._user_identities.move_to_end(telegram_id)
+        return identity
+
+    def _remember_identity(
+        self, telegram_id: int, user_id: int, username: Optional[str]
+    ) -> None:
+        if self._user_cache_size <= 0:
+            return
+        record = self._user_records.get(telegram_id)
+        if record is not None and record.username != username:
+            del self._user_records[telegram_id]
+        self._user_identities[telegram_id] = (user_id, username)
+        self._user_identities.move_to_end(telegram_id)
+        while len(self._user_identities) > self._user_cache_size:
+            evicted, _ = self._user_identities.popitem(last=False)
+            self._user_records.pop(evicted, None)
+
+    async def get_or_create_user(
+        self, telegram_id: int, username: Optional[str] = None
+    ) -> UserRecord:
+        """Return an existing user or create a new record if needed.
+
+        Users already in the identity map are answered from memory unless the
+        username changed. Writes made by other processes, such as
+        ``storage.rescore``, are not seen until the entry is evicted.
+        """
+
+        identity = self._lookup_identity(telegram_id)
+        cached = self._user_records.get(telegram_id)
+        if (
+            identity is not None
+            and cached is not None
+            and (username is None or username == identity[1])
+        ):
+            return replace(cached)
+
+        def operation(connection: sqlite3.Connection) -> UserRecord:
+            if identity is not None:
+                rows = connection.execute(
+                    f"UPDATE users SET username = ? WHERE id = ? RETURNING {_USER_COLUMNS}",
+                    (username if username is not None else identity[1], identity[0]),
+                ).fetchall()
+                if rows:
+                    return self._user_from_row(rows[0])
+            return self._user_from_row(self._upsert_user(connection, telegram_id, username))
+
+        user: UserRecord = await self._run(operation)
+        self._remember_identity(telegram_id, user.id, user.username)
+        if telegram_id in self._user_identities:
+            self._user_records[telegram_id] = replace(user)
+        return user
+
+    async def start_session(
+        self,
+        telegram_id: int,
+        username: Optional[str] = None,
+        *,
+        flow_id: Optional[str] = None,
+        flow_version: Optional[int] = None,
+    ) -> SessionRecord:
+        """Create a new questionnaire session for the given Telegram user ID.
+
+        ``flow_id`` and ``flow_version`` record the questionnaire flow the
+        session is pinned to.
+        """
+
+        identity = self._lookup_identity(telegram_id)
+
+        def operation(
+            connection: sqlite3.Connection,
+        ) -> tuple[SessionRecord, Optional[str]]:
+            user_id, stored_username = self._resolve_user(
+                connection, telegram_id, username, identity
+            )
+            session_number = self._generate_session_number(connection)
+            now = datetime.now(timezone.utc).isoformat()
+            cursor = connection.execute(
+                (
+                    "INSERT INTO sessions (session_number, user_id, answers_json, flow_id, "
+                    "flow_version, started_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)"
+                ),
+                (
+                    session_number,
+                    user_id,
+                    json.dumps([], ensure_ascii=False),
+                    flow_id,
+                    flow_version,
+                    now,
+                    now,
+                ),
+            )
+            session_id = cursor.lastrowid
+            if session_id is None:
+                raise RuntimeError("Failed to insert session: lastrowid is None")
+            session = SessionRecord(
+                id=session_id,
+                session_number=session_number,
+                user_id=user_id,
+                answers=[],
+                interim_rating=None,
+                finished=False,
+                final_level=None,
+                rules_version=None,
+                flow_id=flow_id,
+                flow_version=flow_version,
+                started_at=now,
+                finished_at=None,
+                updated_at=now,
+            )
+            return session, stored_username
+
+        session, stored_username = await self._run(operation)
+        self._remember_identity(telegram_id, session.user_id, stored_username)
+        return session
+
+    async def update_answers(
+        self,
+        session_id: int,
+        answers: Iterable[dict[str, Any]],
+    ) -> None:
+        """Replace all stored answers for the given session."""
+
+        answers = list(answers)
+        timestamp = datetime.now(timezone.utc).isoformat()
+
+        def operation(connection: sqlite3.Connection) -> None:
+            cursor = connection.execute(
+                "DELETE FROM session_answers WHERE session_id = ? RETURNING question_id",
+                (session_id,),
+            )
+            for row in cursor.fetchall():
+                analytics.record_question_reached(connection, row[0], -1)
+            for answer in answers:
+                analytics.record_question_reached(
+                    connection, str(answer.get("question_id"))
+                )
+            connection.executemany(
+                (
+                    "INSERT INTO session_answers "
+                    "(session_id, seq, question_id, option_id, answered_at) "
+                    "VALUES (?, ?, ?, ?, ?)"
+                ),
+                [
+                    (
+                        session_id,
+                        seq,
+                        str(answer.get("question_id")),
+                        str(answer.get("option_id")),
+                        timestamp,
+                    )
+                    for seq, answer in enumerate(answers)
+                ],
+            )
+            self._touch_session(connection, session_id, timestamp)
+
+        await self._run(operation)
+
+    async def append_answer(
+        self, session_id: int, question_id: str, option_id: str
+    ) -> None:
+        """Append a single answer to the end of the session's answer log."""
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+
+        def operation(connection: sqlite3.Connection) -> None:
+            self._append_answer(
+                connection, session_id, question_id, option_id, timestamp
+            )
+
+        await self._run(operation)
+
+    async def set_interim_rating(self, session_id: int, rating: float) -> None:
+        """Store the latest interim rating value for the session."""
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+
+        def operation(connection: sqlite3.Connection) -> None:
+            self._write_interim_rating(connection, session_id, rating, timestamp)
+
+        await self._run(operation)
+
+    async def mark_finished(
+        self,
+        session_id: int,
+        *,
+        finished: bool = True,
+        final_level: Optional[int] = None,
+        rules_version: Optional[int] = None,
+    ) -> None:
+        """Mark the session as finished and optionally store the final level."""
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+
+        def operation(connection: sqlite3.Connection) -> None:
+            self._write_finished(
+                connection, session_id, finished, final_level, rules_version, timestamp
+            )
+
+        await self._run(operation)
+
+    async def record_answer(
+        self,
+        session_id: int,
+        question_id: str,
+        option_id: str,
+        *,
+        experience: Optional[ExperienceUpdate] = None,
+        interim_rating: Optional[float] = None,
+        finished: bool = False,
+        final_level: Optional[int] = None,
+        rules_version: Optional[int] = None,
+    ) -> None:
+        """Persist everything produced by one questionnaire answer atomically.
+
+        Appends the answer, stores the recomputed experience and the interim
+        rating.
+        When ``finished`` is set, the session is also closed with
+        ``final_level`` and ``rules_version`` and the owning user is marked as
+        having completed the questionnaire with that rating. All writes share
+        one transaction.
+        """
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+
+        def operation(connection: sqlite3.Connection) -> Optional[int]:
+            self._append_answer(
+                connection, session_id, question_id, option_id, timestamp
+            )
+            self._touch_session(connection, session_id, timestamp)
+            if experience is not None:
+                self._write_player_experience(
+                    connection, session_id, experience, timestamp
+                )
+            if interim_rating is not None:
+                self._write_interim_rating(
+                    connection, session_id, interim_rating, timestamp
+                )
+            if finished:
+                self._write_finished(
+                    connection, session_id, True, final_level, rules_version, timestamp
+                )
+                row = connection.execute(
+                    (
+                        "UPDATE users SET questionnaire_completed = 1, final_rating = ? "
+                        "WHERE id = (SELECT user_id FROM sessions WHERE id = ?) "
+                        "RETURNING telegram_id"
+                    ),
+                    (final_level, session_id),
+                ).fetchone()
+                if row is not None:
+                    return row["telegram_id"]
+            return None
+
+        telegram_id = await self._run(operation)
+        if telegram_id is not None:
+            self._user_records.pop(telegram_id, None)
+
+    async def set_user_questionnaire_status(
+        self,
+        telegram_id: int,
+        *,
+        completed: bool,
+        final_rating: Optional[int],
+        username: Optional[str] = None,
+    ) -> None:
+        """Update questionnaire completion status and final rating for the user."""
+
+        identity = self._lookup_identity(telegram_id)
+
+        def operation(connection: sqlite3.Connection) -> tuple[int, Optional[str]]:
+            user_id, stored_username = self._resolve_user(
+                connection, telegram_id, username, identity
+            )
+            connection.execute(
+                (
+                    "UPDATE users SET questionnaire_completed = ?, final_rating = ? "
+                    "WHERE id = ?"
+                ),
+                (int(completed), final_rating, user_id),
+            )
+            return user_id, stored_username
+
+        user_id, stored_username = await self._run(operation)
+        self._user_records.pop(telegram_id, None)
+        self._remember_identity(telegram_id, user_id, stored_username)
+
+    async def get_analytics_summary(
+        self, *, since: Optional[str] = None
+    ) -> analytics.AnalyticsSummary:
+        """Return completions per day, final level counts and question reach."""
+
+        def operation(connection: sqlite3.Connection) -> analytics.AnalyticsSummary:
+            return analytics.load_summary(connection, since=since)
+
+        return await self._read(operation)
+
+    async def get_session(self, session_id: int) -> Optional[SessionRecord]:
+        """Fetch a session record by its internal identifier."""
+
+        def operation(connection: sqlite3.Connection) -> Optional[SessionRecord]:
+            cursor = connection.execute(
+                (
+                    "SELECT id, session_number, user_id, interim_rating, finished, "
+                    "final_level, rules_version, flow_id, flow_version, started_at, "
+                    "finished_at, updated_at FROM sessions WHERE id = ?"
+                ),
+                (session_id,),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            cursor = connection.execute(
+                (
+                    "SELECT question_id, option_id FROM session_answers "
+                    "WHERE session_id = ? ORDER BY seq"
+                ),
+                (session_id,),
+            )
+            answers = [
+                {"question_id": answer["question_id"], "option_id": answer["option_id"]}
+                for answer in cursor.fetchall()
+            ]
+            return SessionRecord(
+                id=row["id"],
+                session_number=row["session_number"],
+                user_id=row["user_id"],
+                answers=answers,
+                interim_rating=row["interim_rating"],
+                finished=bool(row["finished"]),
+                final_level=row["final_level"],
+                rules_version=row["rules_version"],
+                flow_id=row["flow_id"],
+                flow_version=row["flow_version"],
+                started_at=row["started_at"],
+                finished_at=row["finished_at"],
+                updated_at=row["updated_at"],
+            )
+
+        return await self._read(operation)
+
+    async def mark_user_received_advice(
+        self, telegram_id: int, username: Optional[str] = None
+    ) -> None:
+        """Flag that the user has requested advice on the final screen."""
+
+        identity = self._lookup_identity(telegram_id)
+
+        def operation(connection: sqlite3.Connection) -> tuple[int, Optional[str]]:
+            user_id, stored_username = self._resolve_user(
+                connection, telegram_id, username, identity
+            )
+            connection.execute(
+                "UPDATE users SET received_advice = 1 WHERE id = ?",
+                (user_id,),
+            )
+            return user_id, stored_username
+
+        user_id, stored_username = await self._run(operation)
+        self._user_records.pop(telegram_id, None)
+        self._remember_identity(telegram_id, user_id, stored_username)
+
+    def _user_from_row(self, row: sqlite3.Row) -> UserRecord:
+        return UserRecord(
+            id=row["id"],
+            telegram_id=row["telegram_id"],
+            username=row["username"],
+            questionnaire_completed=bool(row["questionnaire_completed"]),
+            final_rating=row["final_rating"],
+            received_advice=bool(row["received_advice"]),
+            created_at=row["created_at"],
+        )
+
+    def _upsert_user(
+        self,
+        connection: sqlite3.Connection,
+        telegram_id: int,
+        username: Optional[str],
+    ) -> sqlite3.Row:
+        """Insert the user or refresh a changed username in one statement."""
+
+        now = datetime.now(timezone.utc).isoformat()
+        cursor = connection.execute(
+            (
+                "INSERT INTO users (telegram_id, username, questionnaire_completed, final_rating, "
+                "received_advice, created_at) VALUES (?, ?, 0, NULL, 0, ?) "
+                "ON CONFLICT(telegram_id) DO UPDATE SET username = excluded.username "
+                "WHERE excluded.username IS NOT NULL AND users.username IS NOT excluded.username "
+                f"RETURNING {_USER_COLUMNS}"
+            ),
+            (telegram_id, username, now),
+        )
+        rows = cursor.fetchall()
+        if rows:
+            return rows[0]
+        # The conflict branch skips unchanged usernames and then returns nothing.
+        cursor = connection.execute(
+            f"SELECT {_USER_COLUMNS} FROM users WHERE telegram_id = ?",
+            (telegram_id,),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            raise RuntimeError(f"Failed to upsert user with telegram_id={telegram_id}")
+        return row
+
+    def _resolve_user(
+        self,
+        connection: sqlite3.Connection,
+        telegram_id: int,
+        username: Optional[str],
+        identity: Optional[tuple[int, Optional[str]]],
+    ) -> tuple[int, Optional[str]]:
+        """Return ``(users.id, username)``, skipping the lookup for cached users."""
+
+        if identity is None:
+            row = self._upsert_user(connection, telegram_id, username)
+            return row["id"], row["username"]
+
+        user_id, cached_username = identity
+        if username is None or username == cached_username:
+            return user_id, cached_username
+        connection.execute(
+            "UPDATE users SET username = ? WHERE id = ?",
+            (username, user_id),
+        )
+        return user_id, username
+
+    def _generate_session_number(self, connection: sqlite3.Connection) -> int:
+        """Generate a random session number ensuring uniqueness."""
+
+        while True:
+            candidate = secrets.randbelow(10**12)
+            cursor = connection.execute(
+                "SELECT 1 FROM sessions WHERE session_number = ?",
+                (candidate,),
+            )
+            if cursor.fetchone() is None:
+                return candidate
+
+    def _append_answer(
+        self,
+        connection: sqlite3.Connection,
+        session_id: int,
+        question_id: str,
+        option_id: str,
+        timestamp: str,
+    ) -> None:
+        connection.execute(
+            (
+                "INSERT INTO session_answers "
+                "(session_id, seq, question_id, option_id, answered_at) "
+                "SELECT ?, COALESCE(MAX(seq), -1) + 1, ?, ?, ? "
+                "FROM session_answers WHERE session_id = ?"
+            ),
+            (session_id, question_id, option_id, timestamp, session_id),
+        )
+        analytics.record_question_reached(connection, question_id)
+
+    def _touch_session(
+        self, connection: sqlite3.Connection, session_id: int, timestamp: str
+    ) -> None:
+        connection.execute(
+            "UPDATE sessions SET updated_at = ? WHERE id = ?",
+            (timestamp, session_id),
+        )
+
+    def _write_interim_rating(
+        self,
+        connection: sqlite3.Connection,
+        session_id: int,
+        rating: float,
+        timestamp: str,
+    ) -> None:
+        connection.execute(
+            "UPDATE sessions SET interim_rating = ?, updated_at = ? WHERE id = ?",
+            (rating, timestamp, session_id),
+        )
+
+    def _write_finished(
+        self,
+        connection: sqlite3.Connection,
+        session_id: int,
+        finished: bool,
+        final_level: Optional[int],
+        rules_version: Optional[int],
+        timestamp: str,
+    ) -> None:
+        finished_at = timestamp if finished else None
+        previous = analytics.fetch_session_outcome(connection, session_id)
+        cursor = connection.execute(
+            (
+                "UPDATE sessions SET finished = ?, final_level = COALESCE(?, final_level), "
+                "rules_version = COALESCE(?, rules_version), "
+                "finished_at = ?, updated_at = ? WHERE id = ? "
+                "RETURNING finished, finished_at, final_level"
+            ),
+            (
+                int(finished),
+                final_level,
+                rules_version,
+                finished_at,
+                timestamp,
+                session_id,
+            ),
+        )
+        rows = cursor.fetchall()
+        if rows:
+            current = analytics.SessionOutcome(
+                finished=bool(rows[0][0]),
+                finished_at=rows[0][1],
+                final_level=rows[0][2],
+            )
+            analytics.apply_session_outcome(connection, previous, current)
+
+    def _write_player_experience(
+        self,
+        connection: sqlite3.Connection,
+        session_id: int,
+        experience: ExperienceUpdate,
+        timestamp: str,
+    ) -> PlayerExperienceRecord:
+        cursor = connection.execute(
+            "SELECT id, created_at FROM player_experiences WHERE session_id = ?",
+            (session_id,),
+        )
+        row = cursor.fetchone()
+        if row:
+            connection.execute(
+                (
+                    "UPDATE player_experiences SET q1_months = ?, q2_months = ?, "
+                    "total_months = ?, primary_racket_sport = ?, experience_level = ?, "
+                    "updated_at = ? WHERE session_id = ?"
+                ),
+                (
+                    experience.q1_months,
+                    experience.q2_months,
+                    experience.total_months,
+                    experience.primary_racket_sport,
+                    experience.experience_level,
+                    timestamp,
+                    session_id,
+                ),
+            )
+            return PlayerExperienceRecord(
+                id=row["id"],
+                session_id=session_id,
+                q1_months=experience.q1_months,
+                q2_months=experience.q2_months,
+                total_months=experience.total_months,
+                primary_racket_sport=experience.primary_racket_sport,
+                experience_level=experience.experience_level,
+                created_at=row["created_at"],
+                updated_at=timestamp,
+            )
+
+        cursor = connection.execute(
+            (
+                "INSERT INTO player_experiences (session_id, q1_months, q2_months, total_months, "
+                "primary_racket_sport, experience_level, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            ),
+            (
+                session_id,
+                experience.q1_months,
+                experience.q2_months,
+                experience.total_months,
+                experience.primary_racket_sport,
+                experience.experience_level,
+                timestamp,
+                timestamp,
+            ),
+        )
+        record_id = cursor.lastrowid
+        if record_id is None:
+            raise RuntimeError("Failed to insert player experience: lastrowid is None")
+        return PlayerExperienceRecord(
+            id=record_id,
+            session_id=session_id,
+            q1_months=experience.q1_months,
+            q2_months=experience.q2_months,
+            total_months=experience.total_months,
+            primary_racket_sport=experience.primary_racket_sport,
+            experience_level=experience.experience_level,
+            created_at=timestamp,
+            updated_at=timestamp,
+        )
+
+    async def upsert_player_experience(
+        self,
+        session_id: int,
+        *,
+        q1_months: float,
+        q2_months: float,
+        total_months: float,
+        primary_racket_sport: Optional[str],
+        experience_level: int,
+    ) -> PlayerExperienceRecord:
+        """Insert or update the stored player experience for a session."""
+
+        experience = ExperienceUpdate(
+            q1_months=q1_months,
+            q2_months=q2_months,
+            total_months=total_months,
+            primary_racket_sport=primary_racket_sport,
+            experience_level=experience_level,
+        )
+
+        def operation(connection: sqlite3.Connection) -> PlayerExperienceRecord:
+            timestamp = datetime.now(timezone.utc).isoformat()
+            return self._write_player_experience(
+                connection, session_id, experience, timestamp
+            )
+
+        return await self._run(operation)
+
+    async def get_player_experience(
+        self, session_id: int
+    ) -> Optional[PlayerExperienceRecord]:
+        """Fetch stored player experience for a given session if present."""
+
+        def operation(connection: sqlite3.Connection) -> Optional[PlayerExperienceRecord]:
+            cursor = connection.execute(
+                    (
+                    "SELECT id, session_id, q1_months, q2_months, total_months, primary_racket_sport, "
+                    "experience_level, created_at, updated_at FROM player_experiences WHERE session_id = ?"
+                    ),
+                (session_id,),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return PlayerExperienceRecord(
+                id=row["id"],
+                session_id=row["session_id"],
+                q1_months=row["q1_months"],
+                q2_months=row["q2_months"],
+                total_months=row["total_months"],
+                primary_racket_sport=row["primary_racket_sport"],
+                experience_level=row["experience_level"],
+                created_at=row["created_at"],
+                updated_at=row["updated_at"],
+            )
+
+        return await self._read(operation)
+
+    async def load_fsm_record(self, key: str) -> Optional[FSMRecord]:
+        """Return the persisted FSM state and data for ``key`` if any."""
+
+        def operation(connection: sqlite3.Connection) -> Optional[FSMRecord]:
+            row = connection.execute(
+                "SELECT state, data FROM fsm_states WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            return FSMRecord(state=row["state"], data=row["data"])
+
+        return await self._read(operation)
+
+    async def save_fsm_record(self, key: str, record: FSMRecord) -> None:
+        """Insert or replace the persisted FSM state and data for ``key``."""
+
+        def operation(connection: sqlite3.Connection) -> None:
+            connection.execute(
+                (
+                    "INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET state = excluded.state, "
+                    "data = excluded.data, updated_at = excluded.updated_at"
+                ),
+                (key, record.state, record.data, datetime.now(timezone.utc).isoformat()),
+            )
+
+        await self._run(operation)
+
+    async def delete_fsm_record(self, key: str) -> None:
+        """Forget the persisted FSM state and data for ``key``."""
+
+        def operation(connection: sqlite3.Connection) -> None:
+            connection.execute("DELETE FROM fsm_states WHERE key = ?", (key,))
+
+        await self._run(operation)
@@ -0,0 +1,269 @@
+"""Sweep scoring constants over the stored sessions and report what would change.
+
+Usage: ``python -m storage.calibrate GRID.json [--include-archive]``
+
+``GRID.json`` maps parameter names to lists of candidate values; every
+combination is scored. Parameter names:
+
+* ``sport_coefficients.<sport name>`` — e.g. ``sport_coefficients.Сквош``;
+* ``experience_multipliers.<level>`` — multiplier used for that experience level;
+* ``threshold.<level>`` — upper bound in months of that experience level;
+* ``experience_thresholds`` — the whole ``[[months, level], ...]`` list;
+* ``option_levels.<question>.<option id>`` — level given by a q3..q6 option.
+
+Finished sessions are loaded once and reduced to their distinct answer sets,
+and every candidate is scored with the vectorized ``score_batch``, so
+hundreds of candidates take seconds. For each candidate the report shows the
+share of sessions whose level moves, how many users' latest level changes,
+how often the experience clamp applies and the per-level count change.
+Requires NumPy (``pip install -r requirements-dev.txt``).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass, replace
+from itertools import groupby, product
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+from padel_wizard_bot.services.final_rating import (
+    LEVEL_ORDER,
+    NO_LEVEL,
+    BatchParameters,
+    BatchRatings,
+    encode_answers,
+    score_batch,
+)
+from padel_wizard_bot.services.levels import Level
+
+from .db import get_database_path, initialize_database
+from .retention import decode_payload
+
+
+@dataclass(frozen=True)
+class SessionMatrix:
+    """Distinct answer sets of the stored sessions and how often each occurs."""
+
+    rows: np.ndarray
+    session_counts: np.ndarray
+    # Row index of every user's latest finished session.
+    latest_rows: np.ndarray
+    sessions: int
+
+
+@dataclass(frozen=True)
+class CandidateReport:
+    overrides: dict[str, Any]
+    level_shift: float
+    users_changed: int
+    clamp_rate: float
+    level_delta: dict[Level, int]
+
+
+def load_sessions(
+    connection: sqlite3.Connection, *, include_archive: bool = False
+) -> SessionMatrix:
+    """Encode the answers of every finished session into one option matrix."""
+
+    encoded: list[list[int]] = []
+    latest_by_user: dict[int, int] = {}
+    cursor = connection.execute(
+        (
+            "SELECT a.session_id, s.user_id, a.question_id, a.option_id "
+            "FROM session_answers AS a JOIN sessions AS s ON s.id = a.session_id "
+            "WHERE s.finished = 1 ORDER BY a.session_id, a.seq"
+        )
+    )
+    sessions: list[tuple[int, int, list[int]]] = []
+    for (session_id, user_id), answers in groupby(
+        cursor, key=lambda row: (row[0], row[1])
+    ):
+        sessions.append(
+            (
+                session_id,
+                user_id,
+                encode_answers(
+                    {"question_id": question_id, "option_id": option_id}
+                    for _, _, question_id, option_id in answers
+                ),
+            )
+        )
+    if include_archive:
+        for (payload,) in connection.execute(
+            "SELECT payload FROM session_archive WHERE finished = 1"
+        ):
+            document = decode_payload(payload)
+            session = document["session"]
+            sessions.append(
+                (session["id"], session["user_id"], encode_answers(document["answers"]))
+            )
+
+    sessions.sort(key=lambda item: item[0])
+    for session_id, user_id, row in sessions:
+        latest_by_user[user_id] = len(encoded)
+        encoded.append(row)
+
+    if not encoded:
+        return SessionMatrix(
+            rows=np.empty((0, 7), dtype=np.int64),
+            session_counts=np.empty(0, dtype=np.int64),
+            latest_rows=np.empty(0, dtype=np.int64),
+            sessions=0,
+        )
+    rows, inverse, counts = np.unique(
+        np.array(encoded, dtype=np.int64), axis=0, return_inverse=True, return_counts=True
+    )
+    inverse = inverse.reshape(-1)
+    return SessionMatrix(
+        rows=rows,
+        session_counts=counts,
+        latest_rows=inverse[np.fromiter(latest_by_user.values(), dtype=np.int64)],
+        sessions=len(encoded),
+    )
+
+
+def apply_override(
+    parameters: BatchParameters, name: str, value: Any
+) -> BatchParameters:
+    """Return ``parameters`` with one named constant replaced."""
+
+    section, _, key = name.partition(".")
+    if section == "sport_coefficients" and key:
+        return replace(
+            parameters,
+            sport_coefficients={**parameters.sport_coefficients, key: float(value)},
+        )
+    level = _parse_level(key)
+    if section == "experience_multipliers" and level is not None:
+        return replace(
+            parameters,
+            experience_multipliers={
+                **parameters.experience_multipliers,
+                level: float(value),
+            },
+        )
+    if section == "experience_thresholds" and not key:
+        return replace(
+            parameters,
+            experience_thresholds=tuple(
+                (float(bound), Level.parse(label)) for bound, label in value
+            ),
+        )
+    if section == "threshold" and level is not None:
+        thresholds = list(parameters.experience_thresholds)
+        for position, (_, threshold_level) in enumerate(thresholds):
+            if threshold_level == level:
+                thresholds[position] = (float(value), level)
+                return replace(parameters, experience_thresholds=tuple(thresholds))
+    if section == "option_levels":
+        question_id, _, option_id = key.partition(".")
+        levels = parameters.option_levels.get(question_id)
+        option_level = _parse_level(value)
+        if levels is not None and option_id in levels and option_level is not None:
+            return replace(
+                parameters,
+                option_levels={
+                    **parameters.option_levels,
+                    question_id: {**levels, option_id: option_level},
+                },
+            )
+    raise ValueError(f"Cannot apply {name}={value!r}")
+
+
+def _parse_level(label: Any) -> Optional[Level]:
+    try:
+        return Level.parse(str(label))
+    except ValueError:
+        return None
+
+
+def iter_candidates(grid: dict[str, list[Any]]) -> list[dict[str, Any]]:
+    names = list(grid)
+    return [dict(zip(names, values)) for values in product(*(grid[name] for name in names))]
+
+
+def evaluate(
+    sessions: SessionMatrix,
+    baseline: BatchRatings,
+    overrides: dict[str, Any],
+) -> CandidateReport:
+    parameters = BatchParameters.current()
+    for name, value in overrides.items():
+        parameters = apply_override(parameters, name, value)
+    candidate = score_batch(sessions.rows, parameters)
+
+    base_counts = _level_counts(baseline, sessions.session_counts)
+    candidate_counts = _level_counts(candidate, sessions.session_counts)
+    moved = sessions.session_counts[baseline.level_codes != candidate.level_codes].sum()
+    rated = sessions.session_counts[candidate.level_codes != NO_LEVEL].sum()
+    clamped = sessions.session_counts[candidate.clamped].sum()
+    latest = sessions.latest_rows
+    return CandidateReport(
+        overrides=overrides,
+        level_shift=float(moved) / sessions.sessions if sessions.sessions else 0.0,
+        users_changed=int(
+            (baseline.level_codes[latest] != candidate.level_codes[latest]).sum()
+        ),
+        clamp_rate=float(clamped) / rated if rated else 0.0,
+        level_delta={
+            level: int(candidate_counts[level] - base_counts[level])
+            for level in LEVEL_ORDER
+            if candidate_counts[level] != base_counts[level]
+        },
+    )
+
+
+def _level_counts(ratings: BatchRatings, weights: np.ndarray) -> np.ndarray:
+    rated = ratings.level_codes != NO_LEVEL
+    return np.bincount(
+        ratings.level_codes[rated], weights=weights[rated], minlength=max(Level) + 1
+    )
+
+
+def _format_report(report: CandidateReport) -> str:
+    overrides = ", ".join(f"{name}={value}" for name, value in report.overrides.items())
+    delta = " ".join(f"{level}:{count:+d}" for level, count in report.level_delta.items())
+    return (
+        f"{report.level_shift:6.1%} moved  {report.users_changed:6d} users  "
+        f"{report.clamp_rate:6.1%} clamped  {delta or '-'}  | {overrides}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Sweep scoring constants over the stored sessions and report what would change."
+    )
+    parser.add_argument("grid", type=Path, help="JSON file with candidate values")
+    parser.add_argument(
+        "--include-archive",
+        action="store_true",
+        help="also score finished sessions moved to session_archive",
+    )
+    args = parser.parse_args()
+
+    with args.grid.open(encoding="utf-8") as handle:
+        grid = json.load(handle)
+    candidates = iter_candidates(grid)
+
+    initialize_database()
+    with closing(sqlite3.connect(get_database_path())) as connection:
+        sessions = load_sessions(connection, include_archive=args.include_archive)
+
+    baseline = score_batch(sessions.rows)
+    current = evaluate(sessions, baseline, {})
+    print(
+        f"{sessions.sessions} finished sessions, {len(sessions.rows)} distinct answer sets, "
+        f"{len(sessions.latest_rows)} users; current clamp rate {current.clamp_rate:.1%}"
+    )
+    print(f"Scoring {len(candidates)} candidates")
+    for overrides in candidates:
+        print(_format_report(evaluate(sessions, baseline, overrides)))
+
+
+if __name__ == "__main__":
+    main()
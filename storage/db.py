@@ -2,94 +2,95 @@
 from __future__ import annotations
 
 import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Final
+from typing import Final, Optional
+
+from .migrations import migrate
 
 
 STORAGE_DIR: Final[Path] = Path(__file__).resolve().parent
+PROJECT_DIR: Final[Path] = STORAGE_DIR.parent
 DB_FILENAME: Final[str] = "padel_wizard.sqlite3"
 DB_PATH: Final[Path] = STORAGE_DIR / DB_FILENAME
+DEFAULT_DB_URL: Final[str] = f"sqlite:///{DB_PATH.relative_to(PROJECT_DIR).as_posix()}"
+
+SQLITE_BACKEND: Final[str] = "sqlite"
+MEMORY_BACKEND: Final[str] = "memory"
+
+
+@dataclass(frozen=True)
+class DatabaseConfig:
+    """Storage backend selected by a database URL.
+
+    ``path`` is ``None`` for in-memory databases.
+    """
+
+    backend: str
+    path: Optional[Path]
+
+
+def parse_database_url(url: str) -> DatabaseConfig:
+    """Translate ``settings.db_url`` into a backend and a database location.
+
+    Supported forms:
+
+    * ``sqlite:///relative/file.sqlite3`` — relative to the project directory;
+    * ``sqlite:////absolute/file.sqlite3`` — absolute path;
+    * ``sqlite://:memory:`` (or ``sqlite:///:memory:``) — private SQLite
+      database that lives as long as the process;
+    * ``memory://`` — pure-Python dictionaries, no SQLite at all.
+    """
+
+    scheme, separator, rest = url.partition("://")
+    if not separator:
+        raise ValueError(f"Database URL must look like scheme://location: {url!r}")
+    scheme = scheme.lower()
+
+    if scheme == MEMORY_BACKEND:
+        return DatabaseConfig(backend=MEMORY_BACKEND, path=None)
+    if scheme != SQLITE_BACKEND:
+        raise ValueError(f"Unsupported database backend {scheme!r} in {url!r}")
+
+    location = rest[1:] if rest.startswith("/") else rest
+    if location in ("", ":memory:"):
+        return DatabaseConfig(backend=SQLITE_BACKEND, path=None)
+
+    path = Path(location).expanduser()
+    if not path.is_absolute():
+        path = PROJECT_DIR / path
+    return DatabaseConfig(backend=SQLITE_BACKEND, path=path)
+
+
+def get_database_url() -> str:
+    """Return the database URL configured through ``settings.db_url``."""
+
+    from padel_wizard_bot.config import settings
+
+    return settings.db_url
 
 
 def get_database_path() -> Path:
-    """Return the path to the SQLite database file."""
-    return DB_PATH
+    """Return the path to the configured SQLite database file."""
 
+    config = parse_database_url(get_database_url())
+    if config.path is None:
+        raise ValueError("The configured database is not stored in a file")
+    return config.path
 
-def initialize_database() -> None:
-    """Create the SQLite database and required tables if they do not exist."""
-    STORAGE_DIR.mkdir(parents=True, exist_ok=True)
 
-    with sqlite3.connect(DB_PATH) as connection:
-        connection.execute("PRAGMA foreign_keys = ON")
+def initialize_database(database_path: Optional[Path] = None) -> int:
+    """Create the SQLite database if needed and apply pending migrations.
 
-        connection.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER NOT NULL UNIQUE,
-                username TEXT,
-                questionnaire_completed INTEGER NOT NULL DEFAULT 0,
-                final_rating TEXT,
-                received_advice INTEGER NOT NULL DEFAULT 0,
-                created_at TEXT NOT NULL
-            )
-            """
-        )
-
-        cursor = connection.execute("PRAGMA table_info(users)")
-        existing_columns = {row[1] for row in cursor.fetchall()}
-        if "username" not in existing_columns:
-            connection.execute("ALTER TABLE users ADD COLUMN username TEXT")
-        if "questionnaire_completed" not in existing_columns:
-            connection.execute(
-                "ALTER TABLE users ADD COLUMN questionnaire_completed INTEGER NOT NULL DEFAULT 0"
-            )
-        if "final_rating" not in existing_columns:
-            connection.execute("ALTER TABLE users ADD COLUMN final_rating TEXT")
-        if "received_advice" not in existing_columns:
-            connection.execute(
-                "ALTER TABLE users ADD COLUMN received_advice INTEGER NOT NULL DEFAULT 0"
-            )
-
-        connection.execute(
-            """
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_number INTEGER NOT NULL UNIQUE,
-                user_id INTEGER NOT NULL,
-                answers_json TEXT NOT NULL DEFAULT '[]',
-                interim_rating REAL,
-                finished INTEGER NOT NULL DEFAULT 0,
-                final_level TEXT,
-                started_at TEXT NOT NULL,
-                finished_at TEXT,
-                updated_at TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-            """
-        )
-
-        connection.execute(
-            """
-            CREATE TABLE IF NOT EXISTS player_experiences (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id INTEGER NOT NULL UNIQUE,
-                q1_months REAL NOT NULL,
-                q2_months REAL NOT NULL,
-                total_months REAL NOT NULL,
-                primary_racket_sport TEXT,
-                experience_level TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
-            )
-            """
-        )
-
-        cursor = connection.execute("PRAGMA table_info(player_experiences)")
-        experience_columns = {row[1] for row in cursor.fetchall()}
-        if "primary_racket_sport" not in experience_columns:
-            connection.execute(
-                "ALTER TABLE player_experiences ADD COLUMN primary_racket_sport TEXT"
-            )
+    Returns the schema version the database is at afterwards.
+    """
+    path = database_path if database_path is not None else get_database_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with closing(sqlite3.connect(path, isolation_level=None)) as connection:
+        connection.execute("PRAGMA foreign_keys = ON")
+        # Only takes effect while the file is still empty; older databases are
+        # converted by ``python -m storage.retention --convert-auto-vacuum``.
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        return migrate(connection)
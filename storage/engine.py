@@ -0,0 +1,417 @@
+"""Long-lived SQLite engine that serializes database work on a writer thread."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Final, Optional
+
+logger = logging.getLogger(__name__)
+
+Operation = Callable[[sqlite3.Connection], Any]
+
+# Negative values are interpreted by SQLite as KiB rather than pages.
+CACHE_SIZE_KIB: Final[int] = 16 * 1024
+# Number of compiled statements kept per connection by the sqlite3 module.
+STATEMENT_CACHE_SIZE: Final[int] = 256
+# How long the writer keeps collecting operations into one transaction.
+BATCH_WINDOW_SECONDS: Final[float] = 0.002
+# Upper bound on operations committed together, regardless of the window.
+BATCH_MAX_OPERATIONS: Final[int] = 64
+# Read-only connections serving queries alongside the writer.
+READ_POOL_SIZE: Final[int] = 4
+# PRAGMA synchronous of the writer connection; see SQLiteEngine.
+SYNCHRONOUS: Final[str] = "FULL"
+
+_STOP: Final[object] = object()
+
+_QueueItem = tuple[Operation, asyncio.AbstractEventLoop, "asyncio.Future[Any]"]
+
+
+def _resolve(future: asyncio.Future[Any], result: Any) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def _reject(future: asyncio.Future[Any], exc: BaseException) -> None:
+    if not future.done():
+        future.set_exception(exc)
+
+
+def _noop(connection: sqlite3.Connection) -> None:
+    return None
+
+
+@dataclass(frozen=True)
+class ReaderPoolStats:
+    """Checkout statistics of the read-only connection pool.
+
+    Wait times are measured from the moment a coroutine submits a read until a
+    connection is handed to it, so they include time spent queued behind other
+    reads when every connection is busy.
+    """
+
+    size: int
+    open_connections: int
+    checkouts: int
+    total_wait: float
+    max_wait: float
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.checkouts if self.checkouts else 0.0
+
+
+class ReaderPool:
+    """Fixed-size pool of ``mode=ro`` connections used from worker threads.
+
+    Each read runs in its own ``BEGIN``/``COMMIT`` so multi-statement
+    operations see one consistent WAL snapshot while the writer keeps
+    committing.
+    """
+
+    def __init__(
+        self,
+        database_path: Path,
+        *,
+        size: int = READ_POOL_SIZE,
+        cache_size_kib: int = CACHE_SIZE_KIB,
+        statement_cache_size: int = STATEMENT_CACHE_SIZE,
+    ) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self._database_path = database_path
+        self._size = size
+        self._cache_size_kib = cache_size_kib
+        self._statement_cache_size = statement_cache_size
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._open_connections = 0
+        self._checkouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def run(self, operation: Operation) -> Any:
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        return await loop.run_in_executor(
+            self._get_executor(), self._execute, operation, submitted
+        )
+
+    def stats(self) -> ReaderPoolStats:
+        with self._lock:
+            return ReaderPoolStats(
+                size=self._size,
+                open_connections=self._open_connections,
+                checkouts=self._checkouts,
+                total_wait=self._total_wait,
+                max_wait=self._max_wait,
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self._lock:
+                self._open_connections -= 1
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._size, thread_name_prefix="sqlite-reader"
+                )
+            return self._executor
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._open_connections < self._size
+            if can_open:
+                self._open_connections += 1
+        if not can_open:
+            return self._idle.get()
+        try:
+            return self._connect()
+        except BaseException:
+            with self._lock:
+                self._open_connections -= 1
+            raise
+
+    def _execute(self, operation: Operation, submitted: float) -> Any:
+        connection = self._checkout()
+        waited = time.perf_counter() - submitted
+        with self._lock:
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        try:
+            connection.execute("BEGIN")
+            try:
+                return operation(connection)
+            finally:
+                connection.execute("COMMIT")
+        finally:
+            self._idle.put(connection)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            f"{self._database_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self._statement_cache_size,
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute(f"PRAGMA cache_size = {-abs(self._cache_size_kib)}")
+        return connection
+
+
+class SQLiteEngine:
+    """Runs repository operations on one dedicated thread and connection.
+
+    The connection is opened lazily on the first call, switched to WAL mode and
+    kept open for the lifetime of the process, so every operation reuses the
+    same page cache and compiled statements. Coroutines submit operations
+    through a queue and await an asyncio future.
+
+    Operations are group-committed: the writer collects everything that arrives
+    within ``batch_window`` seconds (up to ``batch_max_operations``) and runs it
+    in one transaction, each operation inside its own savepoint so a failing
+    operation is rolled back alone. Futures are resolved only after the shared
+    ``COMMIT`` has returned.
+
+    The writer runs with ``synchronous=FULL`` by default: every commit is
+    fsynced, so a write whose future has resolved survives a power loss or
+    OS crash. ``NORMAL`` skips that fsync in WAL mode and only syncs at
+    checkpoints. That is faster, but the last commits can roll back after a
+    power loss (never after a crash of the process alone). Group commit
+    spreads one fsync over a whole batch, which makes ``FULL`` affordable.
+    Pass ``synchronous="NORMAL"`` where throughput matters more than the
+    last moments of data.
+
+    Read-only operations submitted through :meth:`read` bypass the writer and
+    run on a :class:`ReaderPool`; with ``read_pool_size=0`` they are queued to
+    the writer like everything else.
+    """
+
+    def __init__(
+        self,
+        database_path: Optional[Path],
+        *,
+        cache_size_kib: int = CACHE_SIZE_KIB,
+        statement_cache_size: int = STATEMENT_CACHE_SIZE,
+        synchronous: str = SYNCHRONOUS,
+        batch_window: float = BATCH_WINDOW_SECONDS,
+        batch_max_operations: int = BATCH_MAX_OPERATIONS,
+        read_pool_size: int = READ_POOL_SIZE,
+        initializer: Optional[Callable[[sqlite3.Connection], Any]] = None,
+    ) -> None:
+        if batch_max_operations < 1:
+            raise ValueError("batch_max_operations must be at least 1")
+        self._database_path = database_path
+        self._cache_size_kib = cache_size_kib
+        self._statement_cache_size = statement_cache_size
+        self._synchronous = synchronous
+        self._batch_window = max(0.0, batch_window)
+        self._batch_max_operations = batch_max_operations
+        self._initializer = initializer
+        self._queue: queue.SimpleQueue[Any] = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._readers: Optional[ReaderPool] = None
+        self._writer_ready = False
+        if read_pool_size > 0:
+            if database_path is None:
+                raise ValueError("An in-memory database cannot use a read pool")
+            self._readers = ReaderPool(
+                database_path,
+                size=read_pool_size,
+                cache_size_kib=cache_size_kib,
+                statement_cache_size=statement_cache_size,
+            )
+
+    @property
+    def database_path(self) -> Optional[Path]:
+        """Database file, or ``None`` for a private in-memory database."""
+
+        return self._database_path
+
+    async def read(self, operation: Operation) -> Any:
+        """Execute a read-only ``operation`` concurrently with the writer."""
+
+        if self._readers is None:
+            return await self.run(operation)
+        if not self._writer_ready:
+            # Readers open the database read-only and cannot create the WAL
+            # index themselves, so let the writer open it first.
+            await self.run(_noop)
+            self._writer_ready = True
+        return await self._readers.run(operation)
+
+    def reader_stats(self) -> Optional[ReaderPoolStats]:
+        return self._readers.stats() if self._readers is not None else None
+
+    async def run(self, operation: Operation) -> Any:
+        """Execute ``operation`` on the writer thread and wait for its commit."""
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[Any] = loop.create_future()
+        self._ensure_started()
+        self._queue.put((operation, loop, future))
+        return await future
+
+    async def flush(self) -> None:
+        """Wait until every operation queued so far has been committed."""
+
+        with self._lock:
+            running = self._thread is not None and self._thread.is_alive()
+        if running:
+            await self.run(_noop)
+
+    def close(self) -> None:
+        """Commit queued operations and close all connections."""
+
+        if self._readers is not None:
+            self._readers.close()
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join()
+
+    async def aclose(self) -> None:
+        await asyncio.to_thread(self.close)
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._worker,
+                name="sqlite-writer",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self._database_path if self._database_path is not None else ":memory:",
+            isolation_level=None,
+            cached_statements=self._statement_cache_size,
+        )
+        connection.row_factory = sqlite3.Row
+        if self._database_path is not None:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(f"PRAGMA synchronous = {self._synchronous}")
+        connection.execute(f"PRAGMA cache_size = {-abs(self._cache_size_kib)}")
+        connection.execute("PRAGMA temp_store = MEMORY")
+        connection.execute("PRAGMA foreign_keys = ON")
+        if self._initializer is not None:
+            self._initializer(connection)
+        return connection
+
+    def _worker(self) -> None:
+        try:
+            connection = self._connect()
+        except Exception as exc:
+            logger.exception("Failed to open SQLite database %s", self._database_path)
+            self._fail_pending(exc)
+            return
+
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self._collect_batch()
+                if batch:
+                    self._commit_batch(connection, batch)
+        finally:
+            connection.close()
+
+    def _collect_batch(self) -> tuple[list[_QueueItem], bool]:
+        """Block for the first operation, then gather more until the window ends."""
+
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch: list[_QueueItem] = [first]
+        deadline = time.monotonic() + self._batch_window
+        while len(batch) < self._batch_max_operations:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _commit_batch(
+        self, connection: sqlite3.Connection, batch: list[_QueueItem]
+    ) -> None:
+        outcomes: list[tuple[bool, Any]] = []
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            for operation, _, _ in batch:
+                connection.execute("SAVEPOINT operation")
+                try:
+                    result = operation(connection)
+                except BaseException as exc:
+                    connection.execute("ROLLBACK TO operation")
+                    connection.execute("RELEASE operation")
+                    outcomes.append((False, exc))
+                else:
+                    connection.execute("RELEASE operation")
+                    outcomes.append((True, result))
+            connection.execute("COMMIT")
+        except BaseException as exc:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            logger.exception("Failed to commit a batch of %s operations", len(batch))
+            for _, loop, future in batch:
+                loop.call_soon_threadsafe(_reject, future, exc)
+            return
+
+        for (_, loop, future), (succeeded, value) in zip(batch, outcomes):
+            if succeeded:
+                loop.call_soon_threadsafe(_resolve, future, value)
+            else:
+                loop.call_soon_threadsafe(_reject, future, value)
+
+    def _fail_pending(self, exc: BaseException) -> None:
+        with self._lock:
+            self._thread = None
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is _STOP:
+                continue
+            _, loop, future = item
+            loop.call_soon_threadsafe(_reject, future, exc)
@@ -0,0 +1,373 @@
+"""Stream users, sessions, answers and player experiences to JSONL or CSV files.
+
+Usage: ``python -m storage.export [--format jsonl|csv] [--output DIR]
+[--tables users,sessions,answers,experiences] [--incremental]``
+
+Rows travel from ``fetchmany`` cursors through generators straight into the
+output files, so memory use does not depend on the table size. All tables are
+read inside one read transaction and therefore describe the same snapshot.
+
+With ``--incremental`` only rows whose timestamp is newer than the watermark
+saved by the previous run are exported. Sessions and player experiences are
+tracked by ``updated_at``, answers by ``answered_at`` and users by
+``created_at`` (user rows carry no modification time; completion status
+changes show up through their sessions).
+
+Timestamps are taken before their transaction commits, so a row may become
+visible after a run has already read past its timestamp. Each run therefore
+rereads ``WATERMARK_OVERLAP`` before the watermark and drops the rows of that
+window it has already exported, recognised by primary key and timestamp.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Final, Iterable, Iterator, Optional, TextIO
+
+from .db import get_database_path, initialize_database
+
+logger = logging.getLogger(__name__)
+
+FETCH_SIZE: Final[int] = 1000
+JSONL_FORMAT: Final[str] = "jsonl"
+CSV_FORMAT: Final[str] = "csv"
+WATERMARK_FILENAME: Final[str] = "watermarks.json"
+# How far back each incremental run rereads; must exceed the longest time
+# between a row's timestamp and the commit that makes it visible.
+WATERMARK_OVERLAP: Final[timedelta] = timedelta(minutes=5)
+
+Row = dict[str, Any]
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    """One exported dataset and the timestamp column its watermark follows."""
+
+    name: str
+    query: str
+    watermark_column: str
+    key_columns: tuple[str, ...]
+    # Integer level codes written out as labels such as "D+".
+    level_columns: tuple[str, ...] = ()
+
+
+TABLES: Final[tuple[ExportTable, ...]] = (
+    ExportTable(
+        name="users",
+        query=(
+            "SELECT id, telegram_id, username, questionnaire_completed, final_rating, "
+            "received_advice, created_at FROM users WHERE created_at >= ?"
+        ),
+        watermark_column="created_at",
+        key_columns=("id",),
+        level_columns=("final_rating",),
+    ),
+    ExportTable(
+        name="sessions",
+        query=(
+            "SELECT id, session_number, user_id, interim_rating, finished, final_level, "
+            "rules_version, flow_id, flow_version, started_at, finished_at, updated_at "
+            "FROM sessions WHERE updated_at >= ?"
+        ),
+        watermark_column="updated_at",
+        key_columns=("id",),
+        level_columns=("final_level",),
+    ),
+    ExportTable(
+        name="answers",
+        query=(
+            "SELECT session_id, seq, question_id, option_id, answered_at "
+            "FROM session_answers WHERE answered_at >= ?"
+        ),
+        watermark_column="answered_at",
+        key_columns=("session_id", "seq"),
+    ),
+    ExportTable(
+        name="experiences",
+        query=(
+            "SELECT id, session_id, q1_months, q2_months, total_months, "
+            "primary_racket_sport, experience_level, created_at, updated_at "
+            "FROM player_experiences WHERE updated_at >= ?"
+        ),
+        watermark_column="updated_at",
+        key_columns=("id",),
+        level_columns=("experience_level",),
+    ),
+)
+TABLES_BY_NAME: Final[dict[str, ExportTable]] = {table.name: table for table in TABLES}
+
+
+@dataclass(frozen=True)
+class Watermark:
+    """Export position of one table.
+
+    ``recent`` maps the primary key of every exported row whose timestamp
+    falls within ``WATERMARK_OVERLAP`` of ``timestamp`` to that timestamp.
+    """
+
+    timestamp: str = ""
+    recent: dict[str, str] = field(default_factory=dict)
+
+    def lower_bound(self) -> str:
+        """Return the timestamp the next run starts reading from."""
+
+        return _overlap_start(self.timestamp)
+
+
+def _overlap_start(timestamp: str) -> str:
+    if not timestamp:
+        return ""
+    return (datetime.fromisoformat(timestamp) - WATERMARK_OVERLAP).isoformat()
+
+
+def iter_rows(
+    connection: sqlite3.Connection,
+    query: str,
+    parameters: Iterable[Any] = (),
+    *,
+    fetch_size: int = FETCH_SIZE,
+) -> Iterator[Row]:
+    """Yield query results as dictionaries, ``fetch_size`` rows at a time."""
+
+    cursor = connection.execute(query, tuple(parameters))
+    columns = [description[0] for description in cursor.description]
+    try:
+        while True:
+            chunk = cursor.fetchmany(fetch_size)
+            if not chunk:
+                return
+            for values in chunk:
+                yield dict(zip(columns, values))
+    finally:
+        cursor.close()
+
+
+def decode_answers(rows: Iterable[Row]) -> Iterator[Row]:
+    """Add the question and option texts to raw ``session_answers`` rows."""
+
+    from padel_wizard_bot.services.questionnaire_flow import DEFAULT_FLOW
+
+    texts: dict[tuple[str, str], tuple[Optional[str], Optional[str]]] = {}
+    for row in rows:
+        key = (row["question_id"], row["option_id"])
+        decoded = texts.get(key)
+        if decoded is None:
+            decoded = (None, None)
+            try:
+                question = DEFAULT_FLOW.get_question(key[0])
+                decoded = (question.text, question.get_option(key[1]).text)
+            except KeyError:
+                pass
+            texts[key] = decoded
+        row["question_text"], row["option_text"] = decoded
+        yield row
+
+
+def decode_levels(rows: Iterable[Row], columns: Iterable[str]) -> Iterator[Row]:
+    """Replace the integer level codes in ``columns`` with their labels."""
+
+    from padel_wizard_bot.services.levels import Level
+
+    columns = tuple(columns)
+    for row in rows:
+        for column in columns:
+            if row[column] is not None:
+                row[column] = Level(row[column]).label
+        yield row
+
+
+def track_watermark(
+    rows: Iterable[Row], table: ExportTable, watermarks: dict[str, Watermark]
+) -> Iterator[Row]:
+    """Drop rows exported by an earlier run and advance the table's watermark."""
+
+    previous = watermarks.get(table.name, Watermark())
+    latest = previous.timestamp
+    exported: dict[str, str] = {}
+    for row in rows:
+        value = row[table.watermark_column]
+        key = ":".join(str(row[column]) for column in table.key_columns)
+        if value and previous.recent.get(key) == value:
+            continue
+        if value:
+            exported[key] = value
+            if value > latest:
+                latest = value
+        yield row
+    if latest:
+        start = _overlap_start(latest)
+        recent = {
+            key: value
+            for key, value in {**previous.recent, **exported}.items()
+            if value >= start
+        }
+        watermarks[table.name] = Watermark(latest, recent)
+
+
+def write_jsonl(rows: Iterable[Row], handle: TextIO) -> int:
+    count = 0
+    for row in rows:
+        handle.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+        handle.write("\n")
+        count += 1
+    return count
+
+
+def write_csv(rows: Iterable[Row], handle: TextIO) -> int:
+    """Write rows as CSV; the header is taken from the first row."""
+
+    writer: Optional[csv.DictWriter[str]] = None
+    count = 0
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(handle, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def load_watermarks(path: Path) -> dict[str, Watermark]:
+    """Read saved positions; files from older versions hold bare timestamps."""
+
+    if not path.exists():
+        return {}
+    with path.open(encoding="utf-8") as handle:
+        document = json.load(handle)
+    watermarks: dict[str, Watermark] = {}
+    for name, value in document.items():
+        if isinstance(value, dict):
+            watermarks[str(name)] = Watermark(
+                str(value["timestamp"]),
+                {str(key): str(stamp) for key, stamp in value["recent"].items()},
+            )
+        else:
+            watermarks[str(name)] = Watermark(str(value))
+    return watermarks
+
+
+def save_watermarks(path: Path, watermarks: dict[str, Watermark]) -> None:
+    """Replace the watermark file atomically so a crash keeps the old one."""
+
+    document = {
+        name: {"timestamp": watermark.timestamp, "recent": watermark.recent}
+        for name, watermark in watermarks.items()
+    }
+    temporary = path.with_name(path.name + ".tmp")
+    with temporary.open("w", encoding="utf-8") as handle:
+        json.dump(document, handle, indent=2, sort_keys=True)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+
+
+def export_tables(
+    connection: sqlite3.Connection,
+    output_dir: Path,
+    *,
+    tables: Iterable[ExportTable] = TABLES,
+    output_format: str = JSONL_FORMAT,
+    watermarks: Optional[dict[str, Watermark]] = None,
+    fetch_size: int = FETCH_SIZE,
+) -> dict[str, int]:
+    """Export ``tables`` into ``output_dir`` and return the row count per table.
+
+    ``watermarks`` maps table names to their export position; rows exported
+    before are skipped and the mapping is advanced in place.
+    """
+
+    if output_format not in (JSONL_FORMAT, CSV_FORMAT):
+        raise ValueError(f"Unsupported export format {output_format!r}")
+    write = write_jsonl if output_format == JSONL_FORMAT else write_csv
+    if watermarks is None:
+        watermarks = {}
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    counts: dict[str, int] = {}
+    connection.execute("BEGIN")
+    try:
+        for table in tables:
+            rows: Iterable[Row] = iter_rows(
+                connection,
+                table.query,
+                (watermarks.get(table.name, Watermark()).lower_bound(),),
+                fetch_size=fetch_size,
+            )
+            rows = track_watermark(rows, table, watermarks)
+            if table.name == "answers":
+                rows = decode_answers(rows)
+            if table.level_columns:
+                rows = decode_levels(rows, table.level_columns)
+            path = output_dir / f"{table.name}-{stamp}.{output_format}"
+            with path.open("w", encoding="utf-8", newline="") as handle:
+                counts[table.name] = write(rows, handle)
+            logger.info("Exported %s %s rows to %s", counts[table.name], table.name, path)
+    finally:
+        connection.execute("COMMIT")
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Stream users, sessions, answers and player experiences to JSONL or CSV files."
+    )
+    parser.add_argument(
+        "--format", choices=(JSONL_FORMAT, CSV_FORMAT), default=JSONL_FORMAT
+    )
+    parser.add_argument(
+        "--output", type=Path, default=Path("export"), help="directory for the files"
+    )
+    parser.add_argument(
+        "--tables",
+        default=",".join(TABLES_BY_NAME),
+        help="comma-separated subset of: " + ", ".join(TABLES_BY_NAME),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only export rows changed since the previous incremental run",
+    )
+    parser.add_argument(
+        "--watermark-file",
+        type=Path,
+        help=f"where incremental runs keep their position (default OUTPUT/{WATERMARK_FILENAME})",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+    try:
+        tables = [TABLES_BY_NAME[name.strip()] for name in args.tables.split(",")]
+    except KeyError as exc:
+        parser.error(f"unknown table {exc.args[0]!r}")
+
+    watermark_file = args.watermark_file or args.output / WATERMARK_FILENAME
+    watermarks = load_watermarks(watermark_file) if args.incremental else {}
+
+    initialize_database()
+    database_uri = f"{get_database_path().resolve().as_uri()}?mode=ro"
+    with closing(
+        sqlite3.connect(database_uri, uri=True, isolation_level=None)
+    ) as connection:
+        export_tables(
+            connection,
+            args.output,
+            tables=tables,
+            output_format=args.format,
+            watermarks=watermarks,
+        )
+
+    if args.incremental:
+        save_watermarks(watermark_file, watermarks)
+
+
+if __name__ == "__main__":
+    main()
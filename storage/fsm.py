@@ -0,0 +1,231 @@
+"""aiogram FSM storage that survives restarts."""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Final, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from .models import FSMRecord
+from .repo import StorageRepository
+
+FSM_CACHE_SIZE: Final[int] = 10_000
+# Conversations idle for longer than this are dropped from memory; their
+# state stays in the database and is loaded again on the next update.
+FSM_IDLE_TTL_SECONDS: Final[float] = 30 * 60
+
+_EMPTY_DATA: Final[str] = "{}"
+# Rough in-memory footprint of a cached entry: node and entry objects plus the
+# decoded data, which takes about five bytes per character of its JSON
+# (measured on typical questionnaire data).
+_ENTRY_OVERHEAD_BYTES: Final[int] = 300
+_DECODED_BYTES_PER_CHAR: Final[int] = 5
+
+
+@dataclass
+class _CachedEntry:
+    state: Optional[str]
+    data: Dict[str, Any]
+    payload: str
+    last_access: float = 0.0
+
+    @property
+    def approximate_bytes(self) -> int:
+        return _ENTRY_OVERHEAD_BYTES + _DECODED_BYTES_PER_CHAR * len(self.payload)
+
+
+@dataclass(frozen=True)
+class FSMCacheStats:
+    """Gauge of the FSM cache: live entries, their size and eviction counters."""
+
+    entries: int
+    approximate_bytes: int
+    capacity: int
+    hits: int
+    misses: int
+    expired: int
+    evicted: int
+
+
+def storage_key_to_string(key: StorageKey) -> str:
+    """Return a compact, stable identifier for an aiogram storage key."""
+
+    parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+    if key.thread_id is not None or key.business_connection_id is not None:
+        parts.append(str(key.thread_id or ""))
+        parts.append(key.business_connection_id or "")
+    if key.destiny != "default":
+        parts.append(key.destiny)
+    return ":".join(parts)
+
+
+def encode_data(data: Dict[str, Any]) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class PersistentFSMStorage(BaseStorage):
+    """Write-through FSM storage backed by the repository's database.
+
+    Every state and data change is committed to the ``fsm_states`` table
+    before the call returns, and the result is kept in an LRU cache of
+    ``cache_size`` keys, so reads of active conversations never leave memory.
+    Evicted or never-seen keys are loaded from the database on first access;
+    in-flight questionnaires therefore continue after a restart. Data is
+    stored as compact JSON and unchanged writes are skipped.
+
+    Entries not touched for ``idle_ttl`` seconds expire lazily: the cache is
+    kept in access order, so each access drops expired entries from its cold
+    end without scanning the rest.
+
+    Updates run as concurrent tasks. Concurrent misses for one key share a
+    single database load, a load never replaces a value stored while it was
+    pending, and the cache only takes a new value once its database write
+    has succeeded, so a failed write leaves both at the previous value.
+    """
+
+    def __init__(
+        self,
+        repository: StorageRepository,
+        *,
+        cache_size: int = FSM_CACHE_SIZE,
+        idle_ttl: float = FSM_IDLE_TTL_SECONDS,
+    ) -> None:
+        if cache_size < 1:
+            raise ValueError("cache_size must be at least 1")
+        self._repository = repository
+        self._cache_size = cache_size
+        self._idle_ttl = idle_ttl
+        self._cache: OrderedDict[str, _CachedEntry] = OrderedDict()
+        # In-flight database loads by cache key, and values stored for those
+        # keys while their load was pending.
+        self._loading: Dict[str, asyncio.Task[_CachedEntry]] = {}
+        self._stored_while_loading: Dict[str, _CachedEntry] = {}
+        self._cached_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evicted = 0
+
+    def stats(self) -> FSMCacheStats:
+        self._expire(time.monotonic())
+        return FSMCacheStats(
+            entries=len(self._cache),
+            approximate_bytes=self._cached_bytes,
+            capacity=self._cache_size,
+            hits=self._hits,
+            misses=self._misses,
+            expired=self._expired,
+            evicted=self._evicted,
+        )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = await self._load(key)
+        new_state = state.state if isinstance(state, State) else state
+        if new_state == entry.state:
+            return
+        await self._store(key, new_state, entry.data, entry.payload)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._load(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        entry = await self._load(key)
+        payload = encode_data(data)
+        if payload == entry.payload:
+            return
+        await self._store(key, entry.state, data.copy(), payload)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._load(key)).data.copy()
+
+    async def close(self) -> None:
+        self._cache.clear()
+        self._cached_bytes = 0
+
+    async def _load(self, key: StorageKey) -> _CachedEntry:
+        cache_key = storage_key_to_string(key)
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._cache.get(cache_key)
+        if entry is not None:
+            self._hits += 1
+            entry.last_access = now
+            self._cache.move_to_end(cache_key)
+            return entry
+
+        self._misses += 1
+        loading = self._loading.get(cache_key)
+        if loading is None:
+            loading = asyncio.ensure_future(self._fetch(cache_key))
+            self._loading[cache_key] = loading
+        # Shielded so that a cancelled update does not fail the others
+        # waiting for the same load.
+        return await asyncio.shield(loading)
+
+    async def _fetch(self, cache_key: str) -> _CachedEntry:
+        try:
+            record = await self._repository.load_fsm_record(cache_key)
+        finally:
+            del self._loading[cache_key]
+            stored = self._stored_while_loading.pop(cache_key, None)
+        if stored is not None:
+            # The row read may predate that write; the stored value is newer
+            # and already cached.
+            return stored
+        if record is None:
+            entry = _CachedEntry(state=None, data={}, payload=_EMPTY_DATA)
+        else:
+            entry = _CachedEntry(
+                state=record.state, data=json.loads(record.data), payload=record.data
+            )
+        self._remember(cache_key, entry)
+        return entry
+
+    async def _store(
+        self,
+        key: StorageKey,
+        state: Optional[str],
+        data: Dict[str, Any],
+        payload: str,
+    ) -> None:
+        cache_key = storage_key_to_string(key)
+        if state is None and payload == _EMPTY_DATA:
+            await self._repository.delete_fsm_record(cache_key)
+        else:
+            await self._repository.save_fsm_record(
+                cache_key, FSMRecord(state=state, data=payload)
+            )
+        # Only cached once committed. The writer queue commits writes in
+        # submission order and resumes their callers in that order, so
+        # concurrent stores reach the cache in the same order as the database.
+        entry = _CachedEntry(state=state, data=data, payload=payload)
+        self._remember(cache_key, entry)
+        if cache_key in self._loading:
+            self._stored_while_loading[cache_key] = entry
+
+    def _remember(self, cache_key: str, entry: _CachedEntry) -> None:
+        entry.last_access = time.monotonic()
+        previous = self._cache.pop(cache_key, None)
+        if previous is not None:
+            self._cached_bytes -= previous.approximate_bytes
+        self._cache[cache_key] = entry
+        self._cached_bytes += entry.approximate_bytes
+        while len(self._cache) > self._cache_size:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_bytes -= evicted.approximate_bytes
+            self._evicted += 1
+
+    def _expire(self, now: float) -> None:
+        deadline = now - self._idle_ttl
+        while self._cache:
+            oldest = next(iter(self._cache.values()))
+            if oldest.last_access > deadline:
+                return
+            _, expired = self._cache.popitem(last=False)
+            self._cached_bytes -= expired.approximate_bytes
+            self._expired += 1
@@ -0,0 +1,27 @@
+"""Command-line entry point that applies pending schema migrations.
+
+Usage: ``python -m storage.migrate``
+"""
+from __future__ import annotations
+
+import logging
+
+from .db import get_database_path, initialize_database
+from .migrations import SCHEMA_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+    version = initialize_database()
+    logger.info(
+        "Database %s is at schema version %s (latest %s)",
+        get_database_path(),
+        version,
+        SCHEMA_VERSION,
+    )
+
+
+if __name__ == "__main__":
+    main()
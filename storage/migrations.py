@@ -0,0 +1,465 @@
+"""Versioned schema migrations tracked with ``PRAGMA user_version``."""
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import zlib
+from collections import Counter
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+Migration = Callable[[sqlite3.Connection], None]
+
+
+def _create_base_schema(connection: sqlite3.Connection) -> None:
+    """Create users, sessions and player_experiences, upgrading early layouts."""
+
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER NOT NULL UNIQUE,
+            username TEXT,
+            questionnaire_completed INTEGER NOT NULL DEFAULT 0,
+            final_rating TEXT,
+            received_advice INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+
+    cursor = connection.execute("PRAGMA table_info(users)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+    if "username" not in existing_columns:
+        connection.execute("ALTER TABLE users ADD COLUMN username TEXT")
+    if "questionnaire_completed" not in existing_columns:
+        connection.execute(
+            "ALTER TABLE users ADD COLUMN questionnaire_completed INTEGER NOT NULL DEFAULT 0"
+        )
+    if "final_rating" not in existing_columns:
+        connection.execute("ALTER TABLE users ADD COLUMN final_rating TEXT")
+    if "received_advice" not in existing_columns:
+        connection.execute(
+            "ALTER TABLE users ADD COLUMN received_advice INTEGER NOT NULL DEFAULT 0"
+        )
+
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_number INTEGER NOT NULL UNIQUE,
+            user_id INTEGER NOT NULL,
+            answers_json TEXT NOT NULL DEFAULT '[]',
+            interim_rating REAL,
+            finished INTEGER NOT NULL DEFAULT 0,
+            final_level TEXT,
+            started_at TEXT NOT NULL,
+            finished_at TEXT,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS player_experiences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL UNIQUE,
+            q1_months REAL NOT NULL,
+            q2_months REAL NOT NULL,
+            total_months REAL NOT NULL,
+            primary_racket_sport TEXT,
+            experience_level TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+        )
+        """
+    )
+
+    cursor = connection.execute("PRAGMA table_info(player_experiences)")
+    experience_columns = {row[1] for row in cursor.fetchall()}
+    if "primary_racket_sport" not in experience_columns:
+        connection.execute(
+            "ALTER TABLE player_experiences ADD COLUMN primary_racket_sport TEXT"
+        )
+
+
+def _add_session_answers(connection: sqlite3.Connection) -> None:
+    """Introduce the append-only answer log and move legacy answers into it."""
+
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS session_answers (
+            session_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            question_id TEXT NOT NULL,
+            option_id TEXT NOT NULL,
+            answered_at TEXT NOT NULL,
+            PRIMARY KEY (session_id, seq),
+            FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        """
+    )
+    _explode_legacy_answers(connection)
+
+
+def _explode_legacy_answers(connection: sqlite3.Connection) -> None:
+    """Move answers stored in ``sessions.answers_json`` into ``session_answers``."""
+
+    cursor = connection.execute(
+        "SELECT id, answers_json, updated_at FROM sessions WHERE answers_json != '[]'"
+    )
+    for session_id, answers_json, updated_at in cursor.fetchall():
+        try:
+            answers = json.loads(answers_json or "[]")
+        except ValueError:
+            answers = []
+        connection.executemany(
+            (
+                "INSERT OR IGNORE INTO session_answers "
+                "(session_id, seq, question_id, option_id, answered_at) "
+                "VALUES (?, ?, ?, ?, ?)"
+            ),
+            [
+                (
+                    session_id,
+                    seq,
+                    str(answer.get("question_id")),
+                    str(answer.get("option_id")),
+                    updated_at,
+                )
+                for seq, answer in enumerate(answers)
+                if isinstance(answer, dict)
+            ],
+        )
+        connection.execute(
+            "UPDATE sessions SET answers_json = '[]' WHERE id = ?",
+            (session_id,),
+        )
+
+
+def _add_analytics(connection: sqlite3.Connection) -> None:
+    """Add secondary indexes on sessions and the analytics summary tables."""
+
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_finished_at ON sessions(finished, finished_at)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_started_at ON sessions(started_at)"
+    )
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS daily_completions (
+            day TEXT PRIMARY KEY,
+            completions INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS final_level_counts (
+            level TEXT PRIMARY KEY,
+            sessions INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS question_reach (
+            question_id TEXT PRIMARY KEY,
+            sessions INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+    _rebuild_summaries(connection)
+
+
+def _add_session_archive(connection: sqlite3.Connection) -> None:
+    """Add the cold storage table filled by :mod:`storage.retention`."""
+
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS session_archive (
+            session_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            finished INTEGER NOT NULL,
+            started_at TEXT NOT NULL,
+            finished_at TEXT,
+            archived_at TEXT NOT NULL,
+            payload BLOB NOT NULL
+        )
+        """
+    )
+
+
+def _add_job_checkpoints(connection: sqlite3.Connection) -> None:
+    """Add the table where resumable maintenance jobs record their position."""
+
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS job_checkpoints (
+            job TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _add_fsm_states(connection: sqlite3.Connection) -> None:
+    """Add the table that keeps aiogram FSM state across restarts."""
+
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _store_level_codes(connection: sqlite3.Connection) -> None:
+    """Replace the TEXT level columns with the integer codes of ``Level``."""
+
+    level_code = "CASE {column} " + " ".join(
+        f"WHEN '{label}' THEN {code}" for label, code in _LEVEL_CODES.items()
+    ) + " END"
+
+    for table, column in (("users", "final_rating"), ("sessions", "final_level")):
+        connection.execute(f"ALTER TABLE {table} ADD COLUMN {column}_code INTEGER")
+        connection.execute(
+            f"UPDATE {table} SET {column}_code = {level_code.format(column=column)} "
+            f"WHERE {column} IS NOT NULL"
+        )
+        connection.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+        connection.execute(
+            f"ALTER TABLE {table} RENAME COLUMN {column}_code TO {column}"
+        )
+
+    # Nothing references these two tables, so they are rebuilt outright.
+    connection.execute("ALTER TABLE player_experiences RENAME TO player_experiences_text")
+    connection.execute(
+        """
+        CREATE TABLE player_experiences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL UNIQUE,
+            q1_months REAL NOT NULL,
+            q2_months REAL NOT NULL,
+            total_months REAL NOT NULL,
+            primary_racket_sport TEXT,
+            experience_level INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+        )
+        """
+    )
+    connection.execute(
+        "INSERT INTO player_experiences "
+        "(id, session_id, q1_months, q2_months, total_months, primary_racket_sport, "
+        "experience_level, created_at, updated_at) "
+        "SELECT id, session_id, q1_months, q2_months, total_months, primary_racket_sport, "
+        f"{level_code.format(column='experience_level')}, created_at, updated_at "
+        "FROM player_experiences_text"
+    )
+    connection.execute("DROP TABLE player_experiences_text")
+
+    connection.execute("DROP TABLE final_level_counts")
+    connection.execute(
+        """
+        CREATE TABLE final_level_counts (
+            level INTEGER PRIMARY KEY,
+            sessions INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+    _rebuild_summaries(connection)
+
+
+def _add_session_rules_version(connection: sqlite3.Connection) -> None:
+    """Record which scoring rules version produced each session's final level."""
+
+    connection.execute("ALTER TABLE sessions ADD COLUMN rules_version INTEGER")
+
+
+def _add_session_flow(connection: sqlite3.Connection) -> None:
+    """Pin sessions to a questionnaire flow id and version.
+
+    Every earlier session used the only flow there was, ``default`` version 1.
+    """
+
+    connection.execute("ALTER TABLE sessions ADD COLUMN flow_id TEXT")
+    connection.execute("ALTER TABLE sessions ADD COLUMN flow_version INTEGER")
+    connection.execute("UPDATE sessions SET flow_id = 'default', flow_version = 1")
+
+
+def _add_session_unscorable_version(connection: sqlite3.Connection) -> None:
+    """Remember which rules version could not score a finished session.
+
+    :mod:`storage.rescore` skips such sessions until the rules change.
+    """
+
+    connection.execute("ALTER TABLE sessions ADD COLUMN unscorable_rules_version INTEGER")
+
+
+def _add_retention_indexes(connection: sqlite3.Connection) -> None:
+    """Index the ``updated_at`` scans of :mod:`storage.retention`.
+
+    Abandoned sessions are found by ``finished = 0 AND updated_at < ?`` and
+    stale FSM states by ``updated_at < ?``.
+    """
+
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(finished, updated_at)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_fsm_states_updated_at ON fsm_states(updated_at)"
+    )
+
+
+# Labels as stored before ``_store_level_codes``; kept here so the migration
+# does not change if the ``Level`` enum ever does.
+_LEVEL_CODES: dict[str, int] = {
+    "E-": 1,
+    "E": 2,
+    "E+": 3,
+    "D-": 4,
+    "D": 5,
+    "D+": 6,
+    "C-": 7,
+    "C": 8,
+    "C+": 9,
+}
+
+
+def _rebuild_summaries(connection: sqlite3.Connection) -> None:
+    """Recount the summary tables for the steps that create or retype them.
+
+    A copy of ``storage.analytics.rebuild_summaries`` as it was when those
+    steps were written, so later changes to the live code or to the archive
+    format cannot change what they do. Archived payloads are zlib-compressed
+    JSON whose final level is still a label at this point.
+    """
+
+    daily: Counter[str] = Counter()
+    levels: Counter[Any] = Counter()
+    reach: Counter[str] = Counter()
+    daily.update(
+        dict(
+            connection.execute(
+                "SELECT substr(finished_at, 1, 10), COUNT(*) FROM sessions "
+                "WHERE finished = 1 AND finished_at IS NOT NULL "
+                "GROUP BY substr(finished_at, 1, 10)"
+            ).fetchall()
+        )
+    )
+    levels.update(
+        dict(
+            connection.execute(
+                "SELECT final_level, COUNT(*) FROM sessions "
+                "WHERE finished = 1 AND final_level IS NOT NULL GROUP BY final_level"
+            ).fetchall()
+        )
+    )
+    reach.update(
+        dict(
+            connection.execute(
+                "SELECT question_id, COUNT(*) FROM session_answers GROUP BY question_id"
+            ).fetchall()
+        )
+    )
+    has_archive = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'session_archive'"
+    ).fetchone()
+    if has_archive:
+        for finished, finished_at, payload in connection.execute(
+            "SELECT finished, finished_at, payload FROM session_archive"
+        ):
+            document = json.loads(zlib.decompress(payload).decode("utf-8"))
+            for answer in document["answers"]:
+                reach[answer["question_id"]] += 1
+            if not finished:
+                continue
+            if finished_at is not None:
+                daily[finished_at[:10]] += 1
+            final_level = document["session"].get("final_level")
+            if final_level is not None:
+                levels[_LEVEL_CODES.get(final_level, final_level)] += 1
+
+    connection.execute("DELETE FROM daily_completions")
+    connection.executemany(
+        "INSERT INTO daily_completions (day, completions) VALUES (?, ?)",
+        sorted(daily.items()),
+    )
+    connection.execute("DELETE FROM final_level_counts")
+    connection.executemany(
+        "INSERT INTO final_level_counts (level, sessions) VALUES (?, ?)",
+        sorted(levels.items()),
+    )
+    connection.execute("DELETE FROM question_reach")
+    connection.executemany(
+        "INSERT INTO question_reach (question_id, sessions) VALUES (?, ?)",
+        sorted(reach.items()),
+    )
+
+
+# Append new steps to the end; a database at version N has run MIGRATIONS[:N].
+MIGRATIONS: tuple[Migration, ...] = (
+    _create_base_schema,
+    _add_session_answers,
+    _add_analytics,
+    _add_session_archive,
+    _add_job_checkpoints,
+    _add_fsm_states,
+    _store_level_codes,
+    _add_session_rules_version,
+    _add_session_flow,
+    _add_session_unscorable_version,
+    _add_retention_indexes,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(connection: sqlite3.Connection) -> int:
+    """Return the schema version recorded in the database header."""
+
+    return int(connection.execute("PRAGMA user_version").fetchone()[0])
+
+
+def migrate(connection: sqlite3.Connection) -> int:
+    """Bring the schema up to ``SCHEMA_VERSION`` and return the new version.
+
+    When the database is already current this costs a single PRAGMA read.
+    Otherwise every pending migration runs inside one ``BEGIN IMMEDIATE``
+    transaction together with the ``user_version`` bump, so a failure leaves
+    the previous schema untouched. The connection must be in autocommit mode
+    (``isolation_level=None``).
+    """
+
+    version = get_schema_version(connection)
+    if version >= SCHEMA_VERSION:
+        return version
+
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        # Another process may have migrated while we waited for the lock.
+        version = get_schema_version(connection)
+        for step in MIGRATIONS[version:]:
+            logger.info("Applying migration %s", step.__name__)
+            step(connection)
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    return SCHEMA_VERSION
@@ -0,0 +1,87 @@
+"""Records exchanged between the repository and its callers.
+
+Padel levels are carried as the integer codes of
+``padel_wizard_bot.services.levels.Level``.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+@dataclass
+class UserRecord:
+    """Representation of a user stored in the database."""
+
+    id: int
+    telegram_id: int
+    username: Optional[str]
+    questionnaire_completed: bool
+    final_rating: Optional[int]
+    received_advice: bool
+    created_at: str
+
+
+@dataclass
+class SessionRecord:
+    """Representation of a questionnaire session."""
+
+    id: int
+    session_number: int
+    user_id: int
+    answers: list[dict[str, Any]]
+    interim_rating: Optional[float]
+    finished: bool
+    final_level: Optional[int]
+    # Version of the scoring rules that produced ``final_level``.
+    rules_version: Optional[int]
+    # Questionnaire flow the session is pinned to; see services.flow_registry.
+    flow_id: Optional[str]
+    flow_version: Optional[int]
+    started_at: str
+    finished_at: Optional[str]
+    updated_at: str
+
+
+@dataclass
+class PlayerExperienceRecord:
+    """Representation of a player's combined experience within a session."""
+
+    id: int
+    session_id: int
+    q1_months: float
+    q2_months: float
+    total_months: float
+    primary_racket_sport: Optional[str]
+    experience_level: int
+    created_at: str
+    updated_at: str
+
+
+@dataclass(frozen=True)
+class FSMRecord:
+    """FSM state and serialized FSM data stored for one conversation key."""
+
+    state: Optional[str]
+    data: str
+
+
+@dataclass(frozen=True)
+class IdentityCacheStats:
+    """Counters describing the telegram_id → users.id identity map."""
+
+    hits: int
+    misses: int
+    size: int
+    capacity: int
+
+
+@dataclass(frozen=True)
+class ExperienceUpdate:
+    """Experience values to persist alongside a recorded answer."""
+
+    q1_months: float
+    q2_months: float
+    total_months: float
+    primary_racket_sport: Optional[str]
+    experience_level: int
@@ -1,310 +1,192 @@
 """Repository layer for reading and writing session data."""
 from __future__ import annotations
 
-import asyncio
-import json
-import secrets
-import sqlite3
-from dataclasses import dataclass
-from datetime import datetime, timezone
-from typing import Any, Callable, Iterable, Optional
-
-from .db import DB_PATH, initialize_database
-
-
-@dataclass
-class UserRecord:
-    """Representation of a user stored in the database."""
-
-    id: int
-    telegram_id: int
-    username: Optional[str]
-    questionnaire_completed: bool
-    final_rating: Optional[str]
-    received_advice: bool
-    created_at: str
-
-
-@dataclass
-class SessionRecord:
-    """Representation of a questionnaire session."""
-
-    id: int
-    session_number: int
-    user_id: int
-    answers: list[dict[str, Any]]
-    interim_rating: Optional[float]
-    finished: bool
-    final_level: Optional[str]
-    started_at: str
-    finished_at: Optional[str]
-    updated_at: str
-
-
-@dataclass
-class PlayerExperienceRecord:
-    """Representation of a player's combined experience within a session."""
-
-    id: int
-    session_id: int
-    q1_months: float
-    q2_months: float
-    total_months: float
-    primary_racket_sport: Optional[str]
-    experience_level: str
-    created_at: str
-    updated_at: str
+from typing import Any, Iterable, Optional
+
+from .analytics import AnalyticsSummary
+from .backends import StorageBackend, create_backend
+from .db import get_database_url, parse_database_url
+from .engine import ReaderPoolStats
+from .models import (
+    ExperienceUpdate,
+    FSMRecord,
+    IdentityCacheStats,
+    PlayerExperienceRecord,
+    SessionRecord,
+    UserRecord,
+)
 
 
 class StorageRepository:
-    """High-level API for working with questionnaire sessions."""
+    """High-level API for working with questionnaire sessions.
 
-    def __init__(self) -> None:
-        initialize_database()
+    The actual persistence is delegated to a :class:`StorageBackend` chosen
+    from ``db_url`` (``settings.db_url`` by default); see
+    :func:`storage.db.parse_database_url` for the accepted URLs. Keyword
+    ``options`` tune the SQLite backend (batch window, read pool size, ...).
+    """
 
-    async def _run(self, operation: Callable[[sqlite3.Connection], Any]) -> Any:
-        """Execute a blocking SQLite operation in a thread pool."""
+    def __init__(self, db_url: Optional[str] = None, **options: Any) -> None:
+        self._db_url = db_url if db_url is not None else get_database_url()
+        self._backend = create_backend(parse_database_url(self._db_url), **options)
 
-        def wrapper() -> Any:
-            with sqlite3.connect(DB_PATH) as connection:
-                connection.row_factory = sqlite3.Row
-                connection.execute("PRAGMA foreign_keys = ON")
-                result = operation(connection)
-                connection.commit()
-                return result
+    @property
+    def db_url(self) -> str:
+        return self._db_url
 
-        return await asyncio.to_thread(wrapper)
+    @property
+    def backend(self) -> StorageBackend:
+        return self._backend
+
+    async def flush(self) -> None:
+        """Wait until all pending writes have been committed."""
+
+        await self._backend.flush()
+
+    async def close(self) -> None:
+        """Complete queued operations and release the database connection."""
+
+        await self._backend.close()
+
+    def identity_cache_stats(self) -> Optional[IdentityCacheStats]:
+        """Return hit/miss counters of the user identity cache."""
+
+        return self._backend.identity_cache_stats()
+
+    def reader_pool_stats(self) -> Optional[ReaderPoolStats]:
+        """Return checkout wait-time statistics of the read connection pool."""
+
+        return self._backend.reader_pool_stats()
 
     async def get_or_create_user(
         self, telegram_id: int, username: Optional[str] = None
     ) -> UserRecord:
         """Return an existing user or create a new record if needed."""
 
-        def operation(connection: sqlite3.Connection) -> UserRecord:
-            cursor = connection.execute(
-                (
-                    "SELECT id, telegram_id, username, questionnaire_completed, final_rating, "
-                    "received_advice, created_at FROM users WHERE telegram_id = ?"
-                ),
-                (telegram_id,),
-            )
-            row = cursor.fetchone()
-            if row:
-                stored_username = username if username is not None else row["username"]
-                if stored_username is not None and row["username"] != stored_username:
-                    connection.execute(
-                        "UPDATE users SET username = ? WHERE telegram_id = ?",
-                        (stored_username, telegram_id),
-                    )
-                return UserRecord(
-                    id=row["id"],
-                    telegram_id=row["telegram_id"],
-                    username=stored_username,
-                    questionnaire_completed=bool(row["questionnaire_completed"]),
-                    final_rating=row["final_rating"],
-                    received_advice=bool(row["received_advice"]),
-                    created_at=row["created_at"],
-                )
-
-            now = datetime.now(timezone.utc).isoformat()
-            cursor = connection.execute(
-                (
-                    "INSERT INTO users (telegram_id, username, questionnaire_completed, final_rating, "
-                    "received_advice, created_at) VALUES (?, ?, ?, ?, ?, ?)"
-                ),
-                (telegram_id, username, 0, None, 0, now),
-            )
-            user_id = cursor.lastrowid
-            if user_id is None:
-                raise RuntimeError("Failed to insert user: lastrowid is None")
-            return UserRecord(
-                id=user_id,
-                telegram_id=telegram_id,
-                username=username,
-                questionnaire_completed=False,
-                final_rating=None,
-                received_advice=False,
-                created_at=now,
-            )
-
-        return await self._run(operation)
+        return await self._backend.get_or_create_user(telegram_id, username)
 
     async def start_session(
-        self, telegram_id: int, username: Optional[str] = None
+        self,
+        telegram_id: int,
+        username: Optional[str] = None,
+        *,
+        flow_id: Optional[str] = None,
+        flow_version: Optional[int] = None,
     ) -> SessionRecord:
-        """Create a new questionnaire session for the given Telegram user ID."""
-
-        user = await self.get_or_create_user(telegram_id, username)
-
-        def operation(connection: sqlite3.Connection) -> SessionRecord:
-            if user.id is None:
-                raise RuntimeError("Failed to get user_id: user.id is None")
-
-            session_number = self._generate_session_number(connection)
-            now = datetime.now(timezone.utc).isoformat()
-            cursor = connection.execute(
-                (
-                    "INSERT INTO sessions (session_number, user_id, answers_json, started_at, "
-                    "updated_at) VALUES (?, ?, ?, ?, ?)"
-                ),
-                (
-                    session_number,
-                    user.id,
-                    json.dumps([], ensure_ascii=False),
-                    now,
-                    now,
-                ),
-            )
-            session_id = cursor.lastrowid
-            if session_id is None:
-                raise RuntimeError("Failed to insert session: lastrowid is None")
-            return SessionRecord(
-                id=session_id,
-                session_number=session_number,
-                user_id=user.id,
-                answers=[],
-                interim_rating=None,
-                finished=False,
-                final_level=None,
-                started_at=now,
-                finished_at=None,
-                updated_at=now,
-            )
-
-        return await self._run(operation)
+        """Create a new questionnaire session for the given Telegram user ID.
+
+        ``flow_id`` and ``flow_version`` record the questionnaire flow the
+        session is pinned to.
+        """
+
+        return await self._backend.start_session(
+            telegram_id, username, flow_id=flow_id, flow_version=flow_version
+        )
 
     async def update_answers(
         self,
         session_id: int,
         answers: Iterable[dict[str, Any]],
     ) -> None:
-        """Persist the provided answers for the given session."""
+        """Replace all stored answers for the given session."""
 
-        answers_json = json.dumps(list(answers), ensure_ascii=False)
-        timestamp = datetime.now(timezone.utc).isoformat()
+        await self._backend.update_answers(session_id, answers)
 
-        def operation(connection: sqlite3.Connection) -> None:
-            connection.execute(
-                "UPDATE sessions SET answers_json = ?, updated_at = ? WHERE id = ?",
-                (answers_json, timestamp, session_id),
-            )
+    async def append_answer(
+        self, session_id: int, question_id: str, option_id: str
+    ) -> None:
+        """Append a single answer to the end of the session's answer log."""
 
-        await self._run(operation)
+        await self._backend.append_answer(session_id, question_id, option_id)
 
     async def set_interim_rating(self, session_id: int, rating: float) -> None:
         """Store the latest interim rating value for the session."""
 
-        timestamp = datetime.now(timezone.utc).isoformat()
-
-        def operation(connection: sqlite3.Connection) -> None:
-            connection.execute(
-                "UPDATE sessions SET interim_rating = ?, updated_at = ? WHERE id = ?",
-                (rating, timestamp, session_id),
-            )
-
-        await self._run(operation)
+        await self._backend.set_interim_rating(session_id, rating)
 
     async def mark_finished(
         self,
         session_id: int,
         *,
         finished: bool = True,
-        final_level: Optional[str] = None,
+        final_level: Optional[int] = None,
+        rules_version: Optional[int] = None,
     ) -> None:
         """Mark the session as finished and optionally store the final level."""
 
-        timestamp = datetime.now(timezone.utc).isoformat()
-        finished_at = timestamp if finished else None
-
-        def operation(connection: sqlite3.Connection) -> None:
-            connection.execute(
-                (
-                    "UPDATE sessions SET finished = ?, final_level = COALESCE(?, final_level), "
-                    "finished_at = ?, updated_at = ? WHERE id = ?"
-                ),
-                (int(finished), final_level, finished_at, timestamp, session_id),
-            )
+        await self._backend.mark_finished(
+            session_id,
+            finished=finished,
+            final_level=final_level,
+            rules_version=rules_version,
+        )
 
-        await self._run(operation)
+    async def record_answer(
+        self,
+        session_id: int,
+        question_id: str,
+        option_id: str,
+        *,
+        experience: Optional[ExperienceUpdate] = None,
+        interim_rating: Optional[float] = None,
+        finished: bool = False,
+        final_level: Optional[int] = None,
+        rules_version: Optional[int] = None,
+    ) -> None:
+        """Persist everything produced by one questionnaire answer atomically.
+
+        Appends the answer, stores the recomputed experience and the interim
+        rating. When ``finished`` is set, the session is also closed with
+        ``final_level`` and ``rules_version`` and the owning user is marked as
+        having completed the questionnaire with that rating.
+        """
+
+        await self._backend.record_answer(
+            session_id,
+            question_id,
+            option_id,
+            experience=experience,
+            interim_rating=interim_rating,
+            finished=finished,
+            final_level=final_level,
+            rules_version=rules_version,
+        )
 
     async def set_user_questionnaire_status(
         self,
         telegram_id: int,
         *,
         completed: bool,
-        final_rating: Optional[str],
+        final_rating: Optional[int],
         username: Optional[str] = None,
     ) -> None:
         """Update questionnaire completion status and final rating for the user."""
 
-        user = await self.get_or_create_user(telegram_id, username)
+        await self._backend.set_user_questionnaire_status(
+            telegram_id,
+            completed=completed,
+            final_rating=final_rating,
+            username=username,
+        )
 
-        def operation(connection: sqlite3.Connection) -> None:
-            connection.execute(
-                (
-                    "UPDATE users SET questionnaire_completed = ?, final_rating = ? "
-                    "WHERE id = ?"
-                ),
-                (int(completed), final_rating, user.id),
-            )
+    async def get_analytics_summary(
+        self, *, since: Optional[str] = None
+    ) -> AnalyticsSummary:
+        """Return completions per day, final level counts and question reach."""
 
-        await self._run(operation)
+        return await self._backend.get_analytics_summary(since=since)
 
     async def get_session(self, session_id: int) -> Optional[SessionRecord]:
         """Fetch a session record by its internal identifier."""
 
-        def operation(connection: sqlite3.Connection) -> Optional[SessionRecord]:
-            cursor = connection.execute(
-                (
-                    "SELECT id, session_number, user_id, answers_json, interim_rating, finished, "
-                    "final_level, started_at, finished_at, updated_at FROM sessions WHERE id = ?"
-                ),
-                (session_id,),
-            )
-            row = cursor.fetchone()
-            if row is None:
-                return None
-            return SessionRecord(
-                id=row["id"],
-                session_number=row["session_number"],
-                user_id=row["user_id"],
-                answers=json.loads(row["answers_json"] or "[]"),
-                interim_rating=row["interim_rating"],
-                finished=bool(row["finished"]),
-                final_level=row["final_level"],
-                started_at=row["started_at"],
-                finished_at=row["finished_at"],
-                updated_at=row["updated_at"],
-            )
-
-        return await self._run(operation)
+        return await self._backend.get_session(session_id)
 
     async def mark_user_received_advice(
         self, telegram_id: int, username: Optional[str] = None
     ) -> None:
         """Flag that the user has requested advice on the final screen."""
 
-        user = await self.get_or_create_user(telegram_id, username)
-
-        def operation(connection: sqlite3.Connection) -> None:
-            connection.execute(
-                "UPDATE users SET received_advice = 1 WHERE id = ?",
-                (user.id,),
-            )
-
-        await self._run(operation)
-
-    def _generate_session_number(self, connection: sqlite3.Connection) -> int:
-        """Generate a random session number ensuring uniqueness."""
-
-        while True:
-            candidate = secrets.randbelow(10**12)
-            cursor = connection.execute(
-                "SELECT 1 FROM sessions WHERE session_number = ?",
-                (candidate,),
-            )
-            if cursor.fetchone() is None:
-                return candidate
+        await self._backend.mark_user_received_advice(telegram_id, username)
 
     async def upsert_player_experience(
         self,
@@ -314,109 +196,40 @@ class StorageRepository:
         q2_months: float,
         total_months: float,
         primary_racket_sport: Optional[str],
-        experience_level: str,
+        experience_level: int,
     ) -> PlayerExperienceRecord:
         """Insert or update the stored player experience for a session."""
 
-        def operation(connection: sqlite3.Connection) -> PlayerExperienceRecord:
-            timestamp = datetime.now(timezone.utc).isoformat()
-            cursor = connection.execute(
-                "SELECT id, created_at FROM player_experiences WHERE session_id = ?",
-                (session_id,),
-            )
-            row = cursor.fetchone()
-            if row:
-                connection.execute(
-                    (
-                        "UPDATE player_experiences SET q1_months = ?, q2_months = ?, "
-                        "total_months = ?, primary_racket_sport = ?, experience_level = ?, "
-                        "updated_at = ? WHERE session_id = ?"
-                    ),
-                    (
-                        q1_months,
-                        q2_months,
-                        total_months,
-                        primary_racket_sport,
-                        experience_level,
-                        timestamp,
-                        session_id,
-                    ),
-                )
-                return PlayerExperienceRecord(
-                    id=row["id"],
-                    session_id=session_id,
-                    q1_months=q1_months,
-                    q2_months=q2_months,
-                    total_months=total_months,
-                    primary_racket_sport=primary_racket_sport,
-                    experience_level=experience_level,
-                    created_at=row["created_at"],
-                    updated_at=timestamp,
-                )
-
-            cursor = connection.execute(
-                (
-                    "INSERT INTO player_experiences (session_id, q1_months, q2_months, total_months, "
-                    "primary_racket_sport, experience_level, created_at, updated_at) "
-                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
-                ),
-                (
-                    session_id,
-                    q1_months,
-                    q2_months,
-                    total_months,
-                    primary_racket_sport,
-                    experience_level,
-                    timestamp,
-                    timestamp,
-                ),
-            )
-            record_id = cursor.lastrowid
-            if record_id is None:
-                raise RuntimeError("Failed to insert player experience: lastrowid is None")
-            return PlayerExperienceRecord(
-                id=record_id,
-                session_id=session_id,
-                q1_months=q1_months,
-                q2_months=q2_months,
-                total_months=total_months,
-                primary_racket_sport=primary_racket_sport,
-                experience_level=experience_level,
-                created_at=timestamp,
-                updated_at=timestamp,
-            )
-
-        return await self._run(operation)
+        return await self._backend.upsert_player_experience(
+            session_id,
+            q1_months=q1_months,
+            q2_months=q2_months,
+            total_months=total_months,
+            primary_racket_sport=primary_racket_sport,
+            experience_level=experience_level,
+        )
 
     async def get_player_experience(
         self, session_id: int
     ) -> Optional[PlayerExperienceRecord]:
         """Fetch stored player experience for a given session if present."""
 
-        def operation(connection: sqlite3.Connection) -> Optional[PlayerExperienceRecord]:
-            cursor = connection.execute(
-                    (
-                    "SELECT id, session_id, q1_months, q2_months, total_months, primary_racket_sport, "
-                    "experience_level, created_at, updated_at FROM player_experiences WHERE session_id = ?"
-                    ),
-                (session_id,),
-            )
-            row = cursor.fetchone()
-            if row is None:
-                return None
-            return PlayerExperienceRecord(
-                id=row["id"],
-                session_id=row["session_id"],
-                q1_months=row["q1_months"],
-                q2_months=row["q2_months"],
-                total_months=row["total_months"],
-                primary_racket_sport=row["primary_racket_sport"],
-                experience_level=row["experience_level"],
-                created_at=row["created_at"],
-                updated_at=row["updated_at"],
-            )
-
-        return await self._run(operation)
+        return await self._backend.get_player_experience(session_id)
+
+    async def load_fsm_record(self, key: str) -> Optional[FSMRecord]:
+        """Return the persisted FSM state and data for ``key`` if any."""
+
+        return await self._backend.load_fsm_record(key)
+
+    async def save_fsm_record(self, key: str, record: FSMRecord) -> None:
+        """Insert or replace the persisted FSM state and data for ``key``."""
+
+        await self._backend.save_fsm_record(key, record)
+
+    async def delete_fsm_record(self, key: str) -> None:
+        """Forget the persisted FSM state and data for ``key``."""
+
+        await self._backend.delete_fsm_record(key)
 
 
 repository = StorageRepository()
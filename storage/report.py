@@ -0,0 +1,39 @@
+"""Print the analytics summary tables.
+
+Usage: ``python -m storage.report [--since YYYY-MM-DD]``
+"""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from contextlib import closing
+
+from padel_wizard_bot.services.levels import Level
+
+from .analytics import load_summary
+from .db import get_database_path, initialize_database
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Print the analytics summary tables.")
+    parser.add_argument("--since", help="only show completions on or after this day")
+    args = parser.parse_args()
+
+    initialize_database()
+    with closing(sqlite3.connect(get_database_path())) as connection:
+        summary = load_summary(connection, since=args.since)
+
+    print(f"Users who completed the questionnaire: {summary.users_completed}")
+    print("\nCompletions per day:")
+    for day, count in summary.daily_completions:
+        print(f"  {day}  {count}")
+    print("\nFinal level distribution:")
+    for level, count in sorted(summary.final_levels.items()):
+        print(f"  {Level(level).label:<3} {count}")
+    print("\nSessions that reached each question:")
+    for question_id, count in sorted(summary.question_reach.items()):
+        print(f"  {question_id:<10} {count}")
+
+
+if __name__ == "__main__":
+    main()
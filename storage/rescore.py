@@ -0,0 +1,554 @@
+"""Recompute experience and final levels of finished sessions with current scoring.
+
+Usage: ``python -m storage.rescore [--dry-run] [--restart] [--all]
+[--chunk-size N] [--workers N]``
+
+Finished sessions are read in ``id`` order, ``chunk_size`` at a time. Each
+chunk is scored on a process pool and the changed sessions are written back
+in one short ``BEGIN IMMEDIATE`` transaction together with the job position in
+``job_checkpoints``, so an interrupted run continues after the last committed
+chunk. A run that completes clears the position, so the next one starts from
+the first session again. ``final_level_counts`` and ``daily_completions`` are
+moved along with the sessions, and a user's ``final_rating`` follows their
+latest finished session. ``--dry-run`` prints the differences and writes
+nothing.
+
+Every rescored session is stamped with the current scoring rules version, and
+sessions already at that version are skipped unless ``--all`` is given, so
+rerunning after a rules change only touches sessions scored by older rules.
+Sessions the current rules cannot score keep their results and are marked in
+``unscorable_rules_version``, so they are not scanned again until the rules
+change either.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import math
+import sqlite3
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import repeat
+from pathlib import Path
+from typing import Callable, Final, Iterator, Optional, Sequence
+
+from padel_wizard_bot.services.experience import calculate_player_experience
+from padel_wizard_bot.services.final_rating import calculate_final_rating
+from padel_wizard_bot.services.levels import Level
+from padel_wizard_bot.services.scoring_rules import ScoringRules, get_scoring_rules
+
+from .analytics import SessionOutcome, apply_session_outcome
+from .db import get_database_path, initialize_database
+from .models import ExperienceUpdate
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME: Final[str] = "rescore"
+CHUNK_SIZE: Final[int] = 500
+BUSY_TIMEOUT_SECONDS: Final[float] = 30.0
+# Interim ratings are floats; smaller differences are not worth a write.
+SCORE_TOLERANCE: Final[float] = 1e-9
+
+Answers = list[dict[str, str]]
+
+
+@dataclass(frozen=True)
+class SessionSnapshot:
+    """Stored results of one finished session and the answers behind them."""
+
+    id: int
+    user_id: int
+    finished_at: Optional[str]
+    final_level: Optional[int]
+    rules_version: Optional[int]
+    interim_rating: Optional[float]
+    experience: Optional[ExperienceUpdate]
+    answers: Answers
+
+
+@dataclass(frozen=True)
+class Score:
+    """What the current scoring code makes of a session's answers."""
+
+    final_level: Optional[Level]
+    interim_rating: Optional[float]
+    experience: Optional[ExperienceUpdate]
+
+
+@dataclass(frozen=True)
+class Rescore:
+    """A session whose stored results differ from the recomputed ones."""
+
+    snapshot: SessionSnapshot
+    score: Score
+
+    def describe(self) -> str:
+        parts = [f"session {self.snapshot.id}:"]
+        if self.snapshot.final_level != self.score.final_level:
+            parts.append(
+                f"level {_format_level(self.snapshot.final_level)} -> "
+                f"{_format_level(self.score.final_level)}"
+            )
+        old_experience = self.snapshot.experience
+        new_experience = self.score.experience
+        if old_experience != new_experience:
+            parts.append(
+                "experience {} -> {}".format(
+                    _describe_experience(old_experience),
+                    _describe_experience(new_experience),
+                )
+            )
+        if _score_changed(self.snapshot.interim_rating, self.score.interim_rating):
+            parts.append(
+                f"score {_format_score(self.snapshot.interim_rating)} -> "
+                f"{_format_score(self.score.interim_rating)}"
+            )
+        return " ".join(parts)
+
+
+@dataclass(frozen=True)
+class Changes:
+    """How the sessions of one chunk compare with their recomputed scores."""
+
+    changed: list[Rescore]
+    # Scored sessions whose stored results still match.
+    unchanged: list[int]
+    # Sessions the current code cannot score; they keep their stored results.
+    unscorable: list[int]
+
+
+@dataclass(frozen=True)
+class RescoreResult:
+    scanned: int
+    changed: int
+    unscorable: int
+    last_session_id: int
+
+
+def score_answers(answers: Answers, rules: Optional[ScoringRules] = None) -> Score:
+    """Score one session; runs in worker processes, so it must stay top-level."""
+
+    experience = calculate_player_experience(answers, rules)
+    rating = calculate_final_rating(answers, rules)
+    return Score(
+        final_level=rating.level if rating is not None else None,
+        interim_rating=rating.score if rating is not None else None,
+        experience=(
+            ExperienceUpdate(
+                q1_months=experience.q1_months,
+                q2_months=experience.q2_months,
+                total_months=experience.total_months,
+                primary_racket_sport=experience.primary_racket_sport,
+                experience_level=experience.level,
+            )
+            if experience is not None
+            else None
+        ),
+    )
+
+
+def fetch_chunk(
+    connection: sqlite3.Connection,
+    after_id: int,
+    chunk_size: int,
+    skip_version: Optional[int] = None,
+) -> list[SessionSnapshot]:
+    """Load the next ``chunk_size`` finished sessions with ``id > after_id``.
+
+    Sessions already scored with rules version ``skip_version``, or found
+    unscorable with it, are left out.
+    """
+
+    condition, parameters = _pending_condition(skip_version)
+    rows = connection.execute(
+        (
+            "SELECT s.id, s.user_id, s.finished_at, s.final_level, s.rules_version, "
+            "s.interim_rating, e.q1_months, e.q2_months, e.total_months, "
+            "e.primary_racket_sport, e.experience_level FROM sessions AS s "
+            "LEFT JOIN player_experiences AS e ON e.session_id = s.id "
+            f"WHERE s.finished = 1 AND s.id > ?{condition} "
+            "ORDER BY s.id LIMIT ?"
+        ),
+        (after_id, *parameters, chunk_size),
+    ).fetchall()
+    if not rows:
+        return []
+
+    answers: dict[int, Answers] = {row[0]: [] for row in rows}
+    for session_id, question_id, option_id in connection.execute(
+        (
+            "SELECT session_id, question_id, option_id FROM session_answers "
+            "WHERE session_id BETWEEN ? AND ? ORDER BY session_id, seq"
+        ),
+        (rows[0][0], rows[-1][0]),
+    ):
+        if session_id in answers:
+            answers[session_id].append(
+                {"question_id": question_id, "option_id": option_id}
+            )
+
+    return [
+        SessionSnapshot(
+            id=row[0],
+            user_id=row[1],
+            finished_at=row[2],
+            final_level=row[3],
+            rules_version=row[4],
+            interim_rating=row[5],
+            experience=(
+                ExperienceUpdate(
+                    q1_months=row[6],
+                    q2_months=row[7],
+                    total_months=row[8],
+                    primary_racket_sport=row[9],
+                    experience_level=row[10],
+                )
+                if row[10] is not None
+                else None
+            ),
+            answers=answers[row[0]],
+        )
+        for row in rows
+    ]
+
+
+def find_changes(snapshots: list[SessionSnapshot], scores: list[Score]) -> Changes:
+    """Pair snapshots with scores."""
+
+    changes: list[Rescore] = []
+    unchanged: list[int] = []
+    unscorable: list[int] = []
+    for snapshot, score in zip(snapshots, scores):
+        if score.final_level is None:
+            unscorable.append(snapshot.id)
+            continue
+        if (
+            snapshot.final_level != score.final_level
+            or snapshot.experience != score.experience
+            or _score_changed(snapshot.interim_rating, score.interim_rating)
+        ):
+            changes.append(Rescore(snapshot=snapshot, score=score))
+        else:
+            unchanged.append(snapshot.id)
+    return Changes(changed=changes, unchanged=unchanged, unscorable=unscorable)
+
+
+def write_changes(
+    connection: sqlite3.Connection,
+    changes: list[Rescore],
+    position: int,
+    *,
+    rules_version: int,
+    unchanged: Sequence[int] = (),
+    unscorable: Sequence[int] = (),
+) -> None:
+    """Store ``changes`` and the job position in one transaction.
+
+    Changed sessions and the ``unchanged`` ones are stamped with
+    ``rules_version``; ``unscorable`` ones are marked as not scorable with it.
+    """
+
+    timestamp = datetime.now(timezone.utc).isoformat()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        for change in changes:
+            _write_change(connection, change, rules_version, timestamp)
+        connection.executemany(
+            (
+                "UPDATE sessions SET rules_version = ?, updated_at = ? "
+                "WHERE id = ? AND rules_version IS NOT ?"
+            ),
+            (
+                (rules_version, timestamp, session_id, rules_version)
+                for session_id in unchanged
+            ),
+        )
+        connection.executemany(
+            "UPDATE sessions SET unscorable_rules_version = ? WHERE id = ?",
+            ((rules_version, session_id) for session_id in unscorable),
+        )
+        connection.execute(
+            (
+                "INSERT INTO job_checkpoints (job, position, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(job) DO UPDATE SET position = excluded.position, "
+                "updated_at = excluded.updated_at"
+            ),
+            (JOB_NAME, position, timestamp),
+        )
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def load_position(connection: sqlite3.Connection) -> int:
+    row = connection.execute(
+        "SELECT position FROM job_checkpoints WHERE job = ?", (JOB_NAME,)
+    ).fetchone()
+    return int(row[0]) if row is not None else 0
+
+
+def reset_position(connection: sqlite3.Connection) -> None:
+    connection.execute("DELETE FROM job_checkpoints WHERE job = ?", (JOB_NAME,))
+
+
+def iter_chunks(
+    connection: sqlite3.Connection,
+    after_id: int,
+    chunk_size: int,
+    skip_version: Optional[int] = None,
+) -> Iterator[list[SessionSnapshot]]:
+    while True:
+        chunk = fetch_chunk(connection, after_id, chunk_size, skip_version)
+        if not chunk:
+            return
+        yield chunk
+        after_id = chunk[-1].id
+
+
+def run_rescore(
+    database_path: Path,
+    *,
+    chunk_size: int = CHUNK_SIZE,
+    workers: int = 1,
+    dry_run: bool = False,
+    restart: bool = False,
+    include_current: bool = False,
+    report: Callable[[Rescore], None] = lambda change: None,
+) -> RescoreResult:
+    """Rescore finished sessions after the saved position.
+
+    Sessions already scored with the current rules version are skipped unless
+    ``include_current`` is set. ``report`` is called for every changed
+    session, in dry-run mode too. The saved position only outlives an
+    interrupted run; a completed one deletes it.
+    """
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    rules = get_scoring_rules()
+    skip_version = None if include_current else rules.version
+
+    with closing(
+        sqlite3.connect(
+            database_path, isolation_level=None, timeout=BUSY_TIMEOUT_SECONDS
+        )
+    ) as connection:
+        connection.execute("PRAGMA foreign_keys = ON")
+        if restart and not dry_run:
+            reset_position(connection)
+        position = 0 if restart else load_position(connection)
+        condition, parameters = _pending_condition(skip_version)
+        total = connection.execute(
+            f"SELECT COUNT(*) FROM sessions AS s WHERE s.finished = 1 AND s.id > ?{condition}",
+            (position, *parameters),
+        ).fetchone()[0]
+        logger.info(
+            "Rescoring %s finished sessions after id %s with scoring rules v%s%s",
+            total,
+            position,
+            rules.version,
+            " (dry run)" if dry_run else "",
+        )
+
+        executor: Optional[Executor] = (
+            ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        )
+        scanned = changed = unscorable = 0
+        try:
+            for chunk in iter_chunks(connection, position, chunk_size, skip_version):
+                scores = _score_chunk(executor, chunk, workers, rules)
+                found = find_changes(chunk, scores)
+                for change in found.changed:
+                    report(change)
+                position = chunk[-1].id
+                if not dry_run:
+                    write_changes(
+                        connection,
+                        found.changed,
+                        position,
+                        rules_version=rules.version,
+                        unchanged=found.unchanged,
+                        unscorable=found.unscorable,
+                    )
+                scanned += len(chunk)
+                changed += len(found.changed)
+                unscorable += len(found.unscorable)
+                logger.info(
+                    "Rescored %s/%s sessions (%.0f%%), %s changed, up to id %s",
+                    scanned,
+                    total,
+                    100.0 * scanned / total if total else 100.0,
+                    changed,
+                    position,
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        if not dry_run:
+            reset_position(connection)
+
+    return RescoreResult(
+        scanned=scanned,
+        changed=changed,
+        unscorable=unscorable,
+        last_session_id=position,
+    )
+
+
+def _pending_condition(skip_version: Optional[int]) -> tuple[str, tuple[int, ...]]:
+    """SQL that leaves out sessions already handled with ``skip_version``."""
+
+    if skip_version is None:
+        return "", ()
+    return (
+        " AND s.rules_version IS NOT ? AND s.unscorable_rules_version IS NOT ?",
+        (skip_version, skip_version),
+    )
+
+
+def _score_chunk(
+    executor: Optional[Executor],
+    chunk: list[SessionSnapshot],
+    workers: int,
+    rules: ScoringRules,
+) -> list[Score]:
+    answers = [snapshot.answers for snapshot in chunk]
+    if executor is None:
+        return [score_answers(session_answers, rules) for session_answers in answers]
+    # Workers get the rules explicitly so the whole run uses the version
+    # that is stamped on the sessions.
+    return list(
+        executor.map(
+            score_answers,
+            answers,
+            repeat(rules),
+            chunksize=max(1, math.ceil(len(answers) / workers)),
+        )
+    )
+
+
+def _write_change(
+    connection: sqlite3.Connection, change: Rescore, rules_version: int, timestamp: str
+) -> None:
+    snapshot, score = change.snapshot, change.score
+    connection.execute(
+        (
+            "UPDATE sessions SET final_level = ?, interim_rating = ?, rules_version = ?, "
+            "updated_at = ? WHERE id = ?"
+        ),
+        (score.final_level, score.interim_rating, rules_version, timestamp, snapshot.id),
+    )
+    apply_session_outcome(
+        connection,
+        SessionOutcome(True, snapshot.finished_at, snapshot.final_level),
+        SessionOutcome(True, snapshot.finished_at, score.final_level),
+    )
+    # Only the user's latest finished session decides their current rating.
+    connection.execute(
+        (
+            "UPDATE users SET final_rating = ? WHERE id = ? AND ? = "
+            "(SELECT MAX(id) FROM sessions WHERE user_id = ? AND finished = 1)"
+        ),
+        (score.final_level, snapshot.user_id, snapshot.id, snapshot.user_id),
+    )
+
+    experience = score.experience
+    if experience is None or experience == snapshot.experience:
+        return
+    connection.execute(
+        (
+            "INSERT INTO player_experiences (session_id, q1_months, q2_months, total_months, "
+            "primary_racket_sport, experience_level, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET q1_months = excluded.q1_months, "
+            "q2_months = excluded.q2_months, total_months = excluded.total_months, "
+            "primary_racket_sport = excluded.primary_racket_sport, "
+            "experience_level = excluded.experience_level, updated_at = excluded.updated_at"
+        ),
+        (
+            snapshot.id,
+            experience.q1_months,
+            experience.q2_months,
+            experience.total_months,
+            experience.primary_racket_sport,
+            experience.experience_level,
+            timestamp,
+            timestamp,
+        ),
+    )
+
+
+def _score_changed(old: Optional[float], new: Optional[float]) -> bool:
+    if old is None or new is None:
+        return old is not new
+    return abs(old - new) > SCORE_TOLERANCE
+
+
+def _format_score(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def _describe_experience(experience: Optional[ExperienceUpdate]) -> str:
+    if experience is None:
+        return "-"
+    return (
+        f"{_format_level(experience.experience_level)} "
+        f"({experience.total_months:g} months)"
+    )
+
+
+def _format_level(level: Optional[int]) -> str:
+    return Level(level).label if level is not None else "-"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Recompute experience and final levels of finished sessions with current scoring."
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="print the differences without writing"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore the saved position and start over"
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="also rescore sessions already scored with the current rules version",
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="scoring processes (1 scores inline)"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+    initialize_database()
+
+    def report(change: Rescore) -> None:
+        if args.dry_run:
+            print(change.describe())
+
+    result = run_rescore(
+        get_database_path(),
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        dry_run=args.dry_run,
+        restart=args.restart,
+        include_current=args.all,
+        report=report,
+    )
+    logger.info(
+        "Scanned %s sessions: %s changed, %s could not be scored, last id %s",
+        result.scanned,
+        result.changed,
+        result.unscorable,
+        result.last_session_id,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""Move old sessions out of the hot tables into a compressed archive.
+
+Usage: ``python -m storage.retention [--finished-days N] [--abandoned-days N]
+[--batch-size N] [--convert-auto-vacuum]``
+
+Each batch of sessions is serialized to zlib-compressed JSON, stored in
+``session_archive`` and deleted from ``sessions`` (``session_answers`` and
+``player_experiences`` follow through ``ON DELETE CASCADE``) inside one short
+``BEGIN IMMEDIATE`` transaction, so the bot's writer only waits for a single
+batch at a time. The analytics summary tables are left alone: they already
+count the archived sessions and keep doing so, and
+:func:`storage.analytics.rebuild_summaries` reads ``session_archive`` as well.
+Persisted FSM state of conversations idle for longer than the abandoned-session
+age is deleted too.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Final, Optional
+
+from .db import get_database_path, initialize_database
+
+logger = logging.getLogger(__name__)
+
+FINISHED_RETENTION_DAYS: Final[int] = 180
+ABANDONED_RETENTION_DAYS: Final[int] = 30
+BATCH_SIZE: Final[int] = 200
+# Pause between batches so queued bot writes get the lock in between.
+BATCH_PAUSE_SECONDS: Final[float] = 0.05
+# Pages released per ``PRAGMA incremental_vacuum`` call.
+VACUUM_STEP_PAGES: Final[int] = 1024
+BUSY_TIMEOUT_SECONDS: Final[float] = 30.0
+
+_AUTO_VACUUM_INCREMENTAL: Final[int] = 2
+
+
+@dataclass(frozen=True)
+class RetentionResult:
+    """What a retention run archived and how much space it released."""
+
+    archived_sessions: int
+    batches: int
+    purged_fsm_states: int
+    freed_pages: int
+
+
+def encode_payload(
+    session: dict[str, Any],
+    answers: list[dict[str, Any]],
+    experience: Optional[dict[str, Any]],
+) -> bytes:
+    document = {"session": session, "answers": answers, "experience": experience}
+    return zlib.compress(
+        json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        ),
+        9,
+    )
+
+
+def decode_payload(payload: bytes) -> dict[str, Any]:
+    """Inverse of :func:`encode_payload`; returns session, answers and experience."""
+
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+def archive_batch(
+    connection: sqlite3.Connection,
+    *,
+    finished_before: str,
+    abandoned_before: str,
+    batch_size: int,
+) -> int:
+    """Archive up to ``batch_size`` expired sessions in one transaction.
+
+    Finished sessions expire by ``finished_at``, abandoned ones by their last
+    activity. Returns how many sessions were moved; ``0`` means nothing is left.
+    """
+
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        rows = connection.execute(
+            (
+                "SELECT * FROM sessions WHERE finished = 1 AND finished_at < ? "
+                "UNION ALL "
+                "SELECT * FROM sessions WHERE finished = 0 AND updated_at < ? "
+                "ORDER BY id LIMIT ?"
+            ),
+            (finished_before, abandoned_before, batch_size),
+        ).fetchall()
+        archived_at = datetime.now(timezone.utc).isoformat()
+        for row in rows:
+            session = dict(row)
+            session.pop("answers_json", None)
+            answers = [
+                dict(answer)
+                for answer in connection.execute(
+                    (
+                        "SELECT question_id, option_id, answered_at "
+                        "FROM session_answers WHERE session_id = ? ORDER BY seq"
+                    ),
+                    (row["id"],),
+                )
+            ]
+            experience_row = connection.execute(
+                "SELECT * FROM player_experiences WHERE session_id = ?",
+                (row["id"],),
+            ).fetchone()
+            experience = dict(experience_row) if experience_row is not None else None
+            connection.execute(
+                (
+                    "INSERT OR REPLACE INTO session_archive "
+                    "(session_id, user_id, finished, started_at, finished_at, archived_at, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+                ),
+                (
+                    row["id"],
+                    row["user_id"],
+                    row["finished"],
+                    row["started_at"],
+                    row["finished_at"],
+                    archived_at,
+                    encode_payload(session, answers, experience),
+                ),
+            )
+        connection.executemany(
+            "DELETE FROM sessions WHERE id = ?", [(row["id"],) for row in rows]
+        )
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    return len(rows)
+
+
+def purge_fsm_states(
+    connection: sqlite3.Connection, *, idle_before: str, batch_size: int
+) -> int:
+    """Delete FSM state last written before ``idle_before``, batch by batch."""
+
+    purged = 0
+    while True:
+        cursor = connection.execute(
+            (
+                "DELETE FROM fsm_states WHERE key IN "
+                "(SELECT key FROM fsm_states WHERE updated_at < ? LIMIT ?)"
+            ),
+            (idle_before, batch_size),
+        )
+        purged += cursor.rowcount
+        if cursor.rowcount < batch_size:
+            return purged
+
+
+def incremental_vacuum(
+    connection: sqlite3.Connection, *, step_pages: int = VACUUM_STEP_PAGES
+) -> int:
+    """Return free pages to the filesystem a few at a time.
+
+    Does nothing unless the database uses ``auto_vacuum = INCREMENTAL``.
+    Returns the number of pages released.
+    """
+
+    if connection.execute("PRAGMA auto_vacuum").fetchone()[0] != _AUTO_VACUUM_INCREMENTAL:
+        logger.warning(
+            "auto_vacuum is not INCREMENTAL; run with --convert-auto-vacuum once "
+            "to let the retention job shrink the database file"
+        )
+        return 0
+
+    freed = 0
+    while True:
+        before = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        if before == 0:
+            return freed
+        connection.execute(f"PRAGMA incremental_vacuum({step_pages})").fetchall()
+        after = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        if after >= before:
+            return freed
+        freed += before - after
+
+
+def convert_auto_vacuum(connection: sqlite3.Connection) -> None:
+    """Switch an existing database to incremental auto-vacuum.
+
+    SQLite applies the new mode only while rebuilding the file, so this runs
+    a full ``VACUUM`` and should be done once, with the bot stopped.
+    """
+
+    connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    connection.execute("VACUUM")
+
+
+def run_retention(
+    database_path: Path,
+    *,
+    finished_days: int = FINISHED_RETENTION_DAYS,
+    abandoned_days: int = ABANDONED_RETENTION_DAYS,
+    batch_size: int = BATCH_SIZE,
+    pause: float = BATCH_PAUSE_SECONDS,
+    now: Optional[datetime] = None,
+) -> RetentionResult:
+    """Archive expired sessions batch by batch, then release free pages."""
+
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    now = now or datetime.now(timezone.utc)
+    finished_before = (now - timedelta(days=finished_days)).isoformat()
+    abandoned_before = (now - timedelta(days=abandoned_days)).isoformat()
+
+    archived = 0
+    batches = 0
+    with closing(
+        sqlite3.connect(
+            database_path, isolation_level=None, timeout=BUSY_TIMEOUT_SECONDS
+        )
+    ) as connection:
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA foreign_keys = ON")
+        while True:
+            moved = archive_batch(
+                connection,
+                finished_before=finished_before,
+                abandoned_before=abandoned_before,
+                batch_size=batch_size,
+            )
+            if moved == 0:
+                break
+            archived += moved
+            batches += 1
+            logger.info("Archived %s sessions (%s so far)", moved, archived)
+            if moved < batch_size:
+                break
+            time.sleep(pause)
+
+        purged = purge_fsm_states(
+            connection, idle_before=abandoned_before, batch_size=batch_size
+        )
+        if purged:
+            logger.info("Deleted FSM state of %s idle conversations", purged)
+        freed = incremental_vacuum(connection) if archived or purged else 0
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    return RetentionResult(
+        archived_sessions=archived,
+        batches=batches,
+        purged_fsm_states=purged,
+        freed_pages=freed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Move old sessions out of the hot tables into a compressed archive."
+    )
+    parser.add_argument(
+        "--finished-days",
+        type=int,
+        default=FINISHED_RETENTION_DAYS,
+        help="archive finished sessions completed more than this many days ago",
+    )
+    parser.add_argument(
+        "--abandoned-days",
+        type=int,
+        default=ABANDONED_RETENTION_DAYS,
+        help="archive unfinished sessions idle for more than this many days",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help="sessions moved per transaction",
+    )
+    parser.add_argument(
+        "--convert-auto-vacuum",
+        action="store_true",
+        help="one-off VACUUM switching an old database to incremental auto-vacuum",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+    initialize_database()
+    database_path = get_database_path()
+    if args.convert_auto_vacuum:
+        with closing(sqlite3.connect(database_path, isolation_level=None)) as connection:
+            convert_auto_vacuum(connection)
+        logger.info("Database %s now uses incremental auto-vacuum", database_path)
+
+    result = run_retention(
+        database_path,
+        finished_days=args.finished_days,
+        abandoned_days=args.abandoned_days,
+        batch_size=args.batch_size,
+    )
+    logger.info(
+        "Archived %s sessions in %s batches, released %s pages",
+        result.archived_sessions,
+        result.batches,
+        result.freed_pages,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Group commit, ordering and visibility guarantees of ``SQLiteEngine``."""
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from storage.engine import SQLiteEngine
+
+
+def _create_items(connection: sqlite3.Connection) -> None:
+    connection.execute("CREATE TABLE IF NOT EXISTS items (value INTEGER PRIMARY KEY)")
+
+
+def _insert(value: int) -> Any:
+    def operation(connection: sqlite3.Connection) -> int:
+        connection.execute("INSERT INTO items (value) VALUES (?)", (value,))
+        return value
+
+    return operation
+
+
+def _select_values(connection: sqlite3.Connection) -> list[int]:
+    return [row[0] for row in connection.execute("SELECT value FROM items ORDER BY value")]
+
+
+def _stored_values(path: Path) -> list[int]:
+    with closing(sqlite3.connect(path)) as connection:
+        return _select_values(connection)
+
+
+def _engine(path: Path, **options: Any) -> SQLiteEngine:
+    return SQLiteEngine(path, initializer=_create_items, **options)
+
+
+def test_failing_operation_rolls_back_alone(tmp_path: Path) -> None:
+    path = tmp_path / "engine.sqlite3"
+    # A long window and a batch of exactly three keep all of them in one
+    # transaction.
+    engine = _engine(path, batch_window=5.0, batch_max_operations=3, read_pool_size=0)
+
+    def insert_then_fail(connection: sqlite3.Connection) -> None:
+        connection.execute("INSERT INTO items (value) VALUES (2)")
+        raise RuntimeError("operation failed")
+
+    async def main() -> tuple[Any, ...]:
+        try:
+            return await asyncio.gather(
+                engine.run(_insert(1)),
+                engine.run(insert_then_fail),
+                engine.run(_insert(3)),
+                return_exceptions=True,
+            )
+        finally:
+            await engine.aclose()
+
+    first, failed, third = asyncio.run(main())
+    assert (first, third) == (1, 3)
+    assert isinstance(failed, RuntimeError)
+    assert _stored_values(path) == [1, 3]
+
+
+def test_awaiters_resume_in_submission_order(tmp_path: Path) -> None:
+    engine = _engine(tmp_path / "engine.sqlite3", batch_window=0.05, read_pool_size=0)
+    resumed: list[int] = []
+
+    async def submit(value: int) -> None:
+        await engine.run(_insert(value))
+        resumed.append(value)
+
+    async def main() -> None:
+        try:
+            await asyncio.gather(*(submit(value) for value in range(200)))
+        finally:
+            await engine.aclose()
+
+    asyncio.run(main())
+    assert resumed == list(range(200))
+
+
+def test_reader_sees_resolved_writes(tmp_path: Path) -> None:
+    engine = _engine(tmp_path / "engine.sqlite3", read_pool_size=2)
+
+    async def main() -> None:
+        try:
+            for value in range(50):
+                await engine.run(_insert(value))
+                assert (await engine.read(_select_values))[-1] == value
+        finally:
+            await engine.aclose()
+
+    asyncio.run(main())
+
+
+def test_close_commits_queued_writes(tmp_path: Path) -> None:
+    path = tmp_path / "engine.sqlite3"
+    engine = _engine(path, batch_window=5.0, read_pool_size=0)
+
+    async def main() -> list[int]:
+        tasks = [asyncio.create_task(engine.run(_insert(value))) for value in range(10)]
+        # Let every task reach the queue, then close before the window ends.
+        await asyncio.sleep(0)
+        await engine.aclose()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(main()) == list(range(10))
+    assert _stored_values(path) == list(range(10))
+
+
+def test_in_memory_database_rejects_read_pool() -> None:
+    with pytest.raises(ValueError):
+        SQLiteEngine(None, read_pool_size=1)
@@ -0,0 +1,161 @@
+"""Cache behaviour of ``PersistentFSMStorage`` under concurrent updates."""
+from __future__ import annotations
+
+import asyncio
+from typing import Optional
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from storage.fsm import PersistentFSMStorage, storage_key_to_string
+from storage.models import FSMRecord
+from storage.repo import StorageRepository
+
+KEY_A = StorageKey(bot_id=1, chat_id=10, user_id=10)
+KEY_B = StorageKey(bot_id=1, chat_id=20, user_id=20)
+
+
+class _Database:
+    """Wraps the memory backend's FSM calls with gates and counters."""
+
+    def __init__(self, repository: StorageRepository, monkeypatch: pytest.MonkeyPatch) -> None:
+        backend = repository.backend
+        self.loads = 0
+        # While set, a load reads its row first and then waits, like a read
+        # snapshot taken before a concurrent commit.
+        self.load_gate: Optional[asyncio.Event] = None
+        self.save_gate: Optional[asyncio.Event] = None
+        self.fail_saves = False
+        load, save = backend.load_fsm_record, backend.save_fsm_record
+
+        async def load_fsm_record(key: str) -> Optional[FSMRecord]:
+            self.loads += 1
+            record = await load(key)
+            if self.load_gate is not None:
+                await self.load_gate.wait()
+            return record
+
+        async def save_fsm_record(key: str, record: FSMRecord) -> None:
+            if self.save_gate is not None:
+                await self.save_gate.wait()
+            if self.fail_saves:
+                raise RuntimeError("write failed")
+            await save(key, record)
+
+        monkeypatch.setattr(backend, "load_fsm_record", load_fsm_record)
+        monkeypatch.setattr(backend, "save_fsm_record", save_fsm_record)
+
+
+@pytest.fixture
+def repository() -> StorageRepository:
+    return StorageRepository("memory://")
+
+
+@pytest.fixture
+def database(repository: StorageRepository, monkeypatch: pytest.MonkeyPatch) -> _Database:
+    return _Database(repository, monkeypatch)
+
+
+async def _settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_misses_share_one_load(
+    repository: StorageRepository, database: _Database
+) -> None:
+    storage = PersistentFSMStorage(repository)
+
+    async def main() -> list[Optional[str]]:
+        await repository.save_fsm_record(
+            storage_key_to_string(KEY_A), FSMRecord(state="waiting", data="{}")
+        )
+        database.load_gate = asyncio.Event()
+        readers = [asyncio.create_task(storage.get_state(KEY_A)) for _ in range(3)]
+        await _settle()
+        database.load_gate.set()
+        return await asyncio.gather(*readers)
+
+    assert asyncio.run(main()) == ["waiting"] * 3
+    assert database.loads == 1
+    stats = storage.stats()
+    assert (stats.entries, stats.hits, stats.misses) == (1, 0, 3)
+
+
+def test_load_keeps_value_stored_while_pending(
+    repository: StorageRepository, database: _Database
+) -> None:
+    storage = PersistentFSMStorage(repository, cache_size=1)
+
+    async def main() -> tuple[Optional[str], Optional[str]]:
+        await storage.set_state(KEY_A, "old")
+        database.save_gate = asyncio.Event()
+        writer = asyncio.create_task(storage.set_state(KEY_A, "new"))
+        await _settle()
+        # Evict KEY_A while its write is still pending, then miss on it.
+        await storage.get_state(KEY_B)
+        database.load_gate = asyncio.Event()
+        reader = asyncio.create_task(storage.get_state(KEY_A))
+        await _settle()
+        # The load has read "old"; the write commits before it returns.
+        database.save_gate.set()
+        await writer
+        database.load_gate.set()
+        return await reader, await storage.get_state(KEY_A)
+
+    assert asyncio.run(main()) == ("new", "new")
+
+
+def test_failed_write_leaves_cache_unchanged(
+    repository: StorageRepository, database: _Database
+) -> None:
+    storage = PersistentFSMStorage(repository)
+
+    async def main() -> tuple[Optional[str], dict[str, object]]:
+        await storage.set_state(KEY_A, "first")
+        await storage.set_data(KEY_A, {"answered": 1})
+        database.fail_saves = True
+        with pytest.raises(RuntimeError):
+            await storage.set_state(KEY_A, "second")
+        with pytest.raises(RuntimeError):
+            await storage.set_data(KEY_A, {"answered": 2})
+        return await storage.get_state(KEY_A), await storage.get_data(KEY_A)
+
+    assert asyncio.run(main()) == ("first", {"answered": 1})
+    stored = asyncio.run(repository.load_fsm_record(storage_key_to_string(KEY_A)))
+    assert stored == FSMRecord(state="first", data='{"answered":1}')
+
+
+def test_cache_size_evicts_least_recently_used(
+    repository: StorageRepository, database: _Database
+) -> None:
+    storage = PersistentFSMStorage(repository, cache_size=2)
+    keys = [StorageKey(bot_id=1, chat_id=chat, user_id=chat) for chat in range(3)]
+
+    async def main() -> dict[str, object]:
+        for number, key in enumerate(keys):
+            await storage.set_data(key, {"number": number})
+        # keys[0] was evicted and comes back from the database.
+        return await storage.get_data(keys[0])
+
+    assert asyncio.run(main()) == {"number": 0}
+    stats = storage.stats()
+    assert (stats.entries, stats.capacity, stats.evicted) == (2, 2, 2)
+    assert stats.approximate_bytes > 0
+    assert database.loads == 4
+
+
+def test_idle_entries_expire(repository: StorageRepository, database: _Database) -> None:
+    storage = PersistentFSMStorage(repository, idle_ttl=0.05)
+
+    async def main() -> Optional[str]:
+        await storage.set_state(KEY_A, "waiting")
+        assert storage.stats().entries == 1
+        await asyncio.sleep(0.1)
+        stats = storage.stats()
+        assert (stats.entries, stats.expired, stats.approximate_bytes) == (0, 1, 0)
+        return await storage.get_state(KEY_A)
+
+    assert asyncio.run(main()) == "waiting"
+    assert database.loads == 2
+    assert storage.stats().misses == 2
@@ -0,0 +1,106 @@
+"""Upgrading a database from the first schema version to the current one."""
+from __future__ import annotations
+
+import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+from storage.migrations import MIGRATIONS, SCHEMA_VERSION, get_schema_version, migrate
+
+ANSWERS = [
+    {"question_id": "q1", "option_id": "has_experience"},
+    {"question_id": "q1.1", "option_id": "q1_1_months_12"},
+    {"question_id": "q2", "option_id": "q2_hours_50_100"},
+]
+
+
+def _baseline(path: Path) -> sqlite3.Connection:
+    """Return a version 1 database with text levels and answers_json."""
+
+    connection = sqlite3.connect(path, isolation_level=None)
+    MIGRATIONS[0](connection)
+    connection.execute("PRAGMA user_version = 1")
+    connection.execute(
+        "INSERT INTO users (id, telegram_id, username, questionnaire_completed, "
+        "final_rating, created_at) VALUES (1, 100, 'player', 1, 'D+', '2024-05-01T10:00:00')"
+    )
+    connection.executemany(
+        "INSERT INTO sessions (id, session_number, user_id, answers_json, finished, "
+        "final_level, started_at, finished_at, updated_at) VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                1,
+                111,
+                json.dumps(ANSWERS),
+                1,
+                "D+",
+                "2024-05-01T10:00:00",
+                "2024-05-01T10:05:00",
+                "2024-05-01T10:05:00",
+            ),
+            (
+                2,
+                222,
+                json.dumps(ANSWERS[:1]),
+                0,
+                None,
+                "2024-05-02T09:00:00",
+                None,
+                "2024-05-02T09:01:00",
+            ),
+        ],
+    )
+    connection.execute(
+        "INSERT INTO player_experiences (session_id, q1_months, q2_months, total_months, "
+        "experience_level, created_at, updated_at) "
+        "VALUES (1, 12.0, 2.0, 14.0, 'E+', '2024-05-01T10:02:00', '2024-05-01T10:02:00')"
+    )
+    return connection
+
+
+def test_migrate_from_baseline(tmp_path: Path) -> None:
+    with closing(_baseline(tmp_path / "legacy.sqlite3")) as connection:
+        assert migrate(connection) == SCHEMA_VERSION
+        assert get_schema_version(connection) == SCHEMA_VERSION
+
+        # Levels are stored as integer codes: D+ is 6 and E+ is 3.
+        assert connection.execute("SELECT final_rating FROM users").fetchall() == [(6,)]
+        assert connection.execute(
+            "SELECT id, final_level, typeof(final_level) FROM sessions ORDER BY id"
+        ).fetchall() == [(1, 6, "integer"), (2, None, "null")]
+        assert connection.execute(
+            "SELECT experience_level, typeof(experience_level) FROM player_experiences"
+        ).fetchall() == [(3, "integer")]
+
+        # answers_json was exploded into the answer log and then emptied.
+        assert connection.execute(
+            "SELECT session_id, seq, question_id, option_id, answered_at "
+            "FROM session_answers ORDER BY session_id, seq"
+        ).fetchall() == [
+            (1, 0, "q1", "has_experience", "2024-05-01T10:05:00"),
+            (1, 1, "q1.1", "q1_1_months_12", "2024-05-01T10:05:00"),
+            (1, 2, "q2", "q2_hours_50_100", "2024-05-01T10:05:00"),
+            (2, 0, "q1", "has_experience", "2024-05-02T09:01:00"),
+        ]
+        assert connection.execute(
+            "SELECT COUNT(*) FROM sessions WHERE answers_json != '[]'"
+        ).fetchone() == (0,)
+
+        assert connection.execute(
+            "SELECT DISTINCT flow_id, flow_version FROM sessions"
+        ).fetchall() == [("default", 1)]
+
+        # The summary tables were rebuilt with level codes.
+        assert connection.execute("SELECT * FROM daily_completions").fetchall() == [
+            ("2024-05-01", 1)
+        ]
+        assert connection.execute(
+            "SELECT level, typeof(level), sessions FROM final_level_counts"
+        ).fetchall() == [(6, "integer", 1)]
+        assert connection.execute(
+            "SELECT * FROM question_reach ORDER BY question_id"
+        ).fetchall() == [("q1", 2), ("q1.1", 1), ("q2", 1)]
+
+        # A current database is left alone.
+        assert migrate(connection) == SCHEMA_VERSION
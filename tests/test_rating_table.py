@@ -0,0 +1,151 @@
+"""The precomputed rating table against the reference ``rate_player``."""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+from itertools import product
+from pathlib import Path
+
+import pytest
+
+from padel_wizard_bot.services import rating_table
+from padel_wizard_bot.services.experience import PlayerExperience
+from padel_wizard_bot.services.final_rating import calculate_final_rating, rate_player
+from padel_wizard_bot.services.levels import Level
+from padel_wizard_bot.services.questionnaire_flow import DEFAULT_FLOW
+from padel_wizard_bot.services.rating_table import get_rating_table
+from padel_wizard_bot.services.scoring_engine import SkillRatings
+from padel_wizard_bot.services.scoring_rules import (
+    DEFAULT_RULES_PATH,
+    get_scoring_rules,
+    install_scoring_rules,
+    reload_scoring_rules,
+)
+from padel_wizard_bot.services.scoring_state import ScoringState
+
+RANDOM_PATHS = 2000
+
+
+def _experience(level: Level) -> PlayerExperience:
+    return PlayerExperience(
+        q1_months=0.0,
+        q2_months=0.0,
+        total_months=0.0,
+        level=level,
+        primary_racket_sport=None,
+    )
+
+
+@pytest.fixture
+def restore_rules():
+    rules, table = get_scoring_rules(), get_rating_table()
+    yield
+    install_scoring_rules(rules, table)
+
+
+def test_every_level_tuple_matches_rate_player() -> None:
+    table = get_rating_table()
+    for experience_level, *skills in product(table.experience_levels, *table.skill_levels):
+        skill_ratings = SkillRatings(*skills)
+        expected = rate_player(_experience(experience_level), skill_ratings)
+        actual = table.lookup(experience_level, skill_ratings)
+        assert expected is not None
+        assert actual is not None
+        assert (actual.level, actual.score) == (expected.level, expected.score)
+        assert actual == expected
+
+
+def test_answer_paths_match_calculate_final_rating() -> None:
+    rng = random.Random(16)
+    for _ in range(RANDOM_PATHS):
+        answers: list[dict[str, str]] = []
+        state = ScoringState()
+        question_id = DEFAULT_FLOW.first_question_id
+        while question_id is not None:
+            question = DEFAULT_FLOW.get_question(question_id)
+            option = rng.choice(question.options)
+            answers.append({"question_id": question.id, "option_id": option.id})
+            state = state.apply(question.id, option.id)
+            question_id = option.next_question_id
+        assert state.final_rating() == calculate_final_rating(answers)
+
+
+@pytest.mark.parametrize(
+    "skill_ratings",
+    [
+        # Partial: strokes not rated yet.
+        SkillRatings(Level.E, Level.D, Level.C_MINUS, None),
+        # D- is not an option level of q4, so it has no table position.
+        SkillRatings(Level.E, Level.D_MINUS, Level.C_MINUS, Level.D),
+    ],
+)
+def test_tuples_outside_the_table_use_the_reference(
+    monkeypatch: pytest.MonkeyPatch, skill_ratings: SkillRatings
+) -> None:
+    calls = []
+    reference = rating_table._reference_rating
+
+    def spy(experience_level, ratings, rules=None):
+        calls.append((experience_level, ratings))
+        return reference(experience_level, ratings, rules)
+
+    monkeypatch.setattr(rating_table, "_reference_rating", spy)
+    actual = get_rating_table().lookup(Level.D, skill_ratings)
+    assert calls == [(Level.D, skill_ratings)]
+    assert actual == rate_player(_experience(Level.D), skill_ratings)
+
+
+def test_changed_rules_rebuild_the_table(tmp_path: Path, restore_rules: None) -> None:
+    old_table = get_rating_table()
+    document = json.loads(DEFAULT_RULES_PATH.read_text(encoding="utf-8"))
+    document["version"] += 1
+    document["clamp_steps"] = 1
+    path = tmp_path / "scoring_rules.json"
+    path.write_text(json.dumps(document, ensure_ascii=False), encoding="utf-8")
+
+    rules = asyncio.run(reload_scoring_rules(path))
+
+    table = get_rating_table()
+    assert rules.checksum != old_table.checksum
+    assert (table.rules_version, table.checksum) == (rules.version, rules.checksum)
+    assert table.levels != old_table.levels
+    assert rating_table.verify_rating_table(table) == []
+
+
+def test_rules_reloaded_mid_session_score_every_answer(
+    tmp_path: Path, restore_rules: None
+) -> None:
+    old_rules = get_scoring_rules()
+    document = json.loads(DEFAULT_RULES_PATH.read_text(encoding="utf-8"))
+    document["version"] += 1
+    document["experience"]["q2_months"] = {
+        option: months * 10 for option, months in document["experience"]["q2_months"].items()
+    }
+    path = tmp_path / "scoring_rules.json"
+    path.write_text(json.dumps(document, ensure_ascii=False), encoding="utf-8")
+
+    old_table = get_rating_table()
+    new_rules = asyncio.run(reload_scoring_rules(path))
+    new_table = get_rating_table()
+
+    rng = random.Random(20)
+    changed = 0
+    for _ in range(200):
+        answers: list[dict[str, str]] = []
+        state = ScoringState()
+        install_scoring_rules(old_rules, old_table)
+        question_id = DEFAULT_FLOW.first_question_id
+        while question_id is not None:
+            question = DEFAULT_FLOW.get_question(question_id)
+            if question.id == "q4":
+                install_scoring_rules(new_rules, new_table)
+            option = rng.choice(question.options)
+            answers.append({"question_id": question.id, "option_id": option.id})
+            state = ScoringState.from_dict(state.to_dict()).apply(question.id, option.id)
+            question_id = option.next_question_id
+        expected = calculate_final_rating(answers, new_rules)
+        assert state.final_rating() == expected
+        assert state.final_rating(old_rules) == calculate_final_rating(answers, old_rules)
+        changed += expected != calculate_final_rating(answers, old_rules)
+    assert changed
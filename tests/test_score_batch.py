@@ -0,0 +1,113 @@
+"""``score_batch`` against the scalar scoring functions, row by row."""
+from __future__ import annotations
+
+import math
+from itertools import product
+from typing import Any
+
+import pytest
+
+from padel_wizard_bot.services.experience import calculate_player_experience
+from padel_wizard_bot.services.final_rating import (
+    BATCH_COLUMNS,
+    MISSING_OPTION,
+    NO_LEVEL,
+    _score_to_level,
+    calculate_final_rating,
+    encode_answers,
+    score_batch,
+)
+from padel_wizard_bot.services.questionnaire_flow import DEFAULT_FLOW
+from padel_wizard_bot.services.scoring_rules import get_scoring_rules
+
+np = pytest.importorskip("numpy")
+
+# Question behind each column of BATCH_COLUMNS.
+COLUMN_QUESTIONS = ("q1.1", "q1.sports", "q2", "q3", "q4", "q5", "q6")
+
+
+def _codes(question_id: str) -> range:
+    return range(MISSING_OPTION, len(DEFAULT_FLOW.get_question(question_id).options))
+
+
+EXPERIENCE_ROWS = list(product(*(_codes(question_id) for question_id in COLUMN_QUESTIONS[:3])))
+SKILL_ROWS = list(product(*(_codes(question_id) for question_id in COLUMN_QUESTIONS[3:])))
+
+
+def _decode(row: tuple[int, ...]) -> list[dict[str, str]]:
+    answers = []
+    for question_id, code in zip(COLUMN_QUESTIONS, row):
+        if code != MISSING_OPTION:
+            option = DEFAULT_FLOW.get_question(question_id).options[code]
+            answers.append({"question_id": question_id, "option_id": option.id})
+    return answers
+
+
+def _scalar(row: tuple[int, ...]) -> tuple[Any, ...]:
+    answers = _decode(row)
+    experience = calculate_player_experience(answers)
+    rating = calculate_final_rating(answers)
+    return (
+        int(rating.level) if rating is not None else NO_LEVEL,
+        rating.score if rating is not None else None,
+        int(experience.level) if experience is not None else NO_LEVEL,
+        experience.total_months if experience is not None else None,
+        rating is not None
+        and rating.level != _score_to_level(rating.score, get_scoring_rules()),
+    )
+
+
+def _assert_rows_match(rows: list[tuple[int, ...]]) -> None:
+    batch = score_batch(np.array(rows, dtype=np.int64))
+    columns = zip(
+        batch.level_codes.tolist(),
+        batch.scores.tolist(),
+        batch.experience_level_codes.tolist(),
+        batch.total_months.tolist(),
+        batch.clamped.tolist(),
+    )
+    for row, (level, score, experience_level, total_months, clamped) in zip(rows, columns):
+        actual = (
+            level,
+            None if math.isnan(score) else score,
+            experience_level,
+            None if math.isnan(total_months) else total_months,
+            clamped,
+        )
+        assert actual == _scalar(row), row
+
+
+def test_every_experience_row() -> None:
+    skill_rows = [
+        (MISSING_OPTION,) * 4,
+        (0, 0, 0, 0),
+        tuple(
+            len(DEFAULT_FLOW.get_question(question_id).options) - 1
+            for question_id in COLUMN_QUESTIONS[3:]
+        ),
+        (2, 1, MISSING_OPTION, 3),
+    ]
+    _assert_rows_match(
+        [experience + skills for experience in EXPERIENCE_ROWS for skills in skill_rows]
+    )
+
+
+def test_every_skill_row_at_every_experience_level() -> None:
+    # The first three columns only reach the rating through the experience
+    # level, so one row per level (and one without q2) stands in for all.
+    representatives: dict[int, tuple[int, ...]] = {}
+    for experience in EXPERIENCE_ROWS:
+        result = calculate_player_experience(_decode(experience))
+        level = int(result.level) if result is not None else NO_LEVEL
+        representatives.setdefault(level, experience)
+    assert len(representatives) > 2
+    _assert_rows_match(
+        [experience + skills for experience in representatives.values() for skills in SKILL_ROWS]
+    )
+
+
+def test_encode_answers_round_trips() -> None:
+    for row in EXPERIENCE_ROWS:
+        full = row + (0, 1, 2, 3)
+        assert tuple(encode_answers(_decode(full))) == full
+    assert len(BATCH_COLUMNS) == len(COLUMN_QUESTIONS)